@@ -0,0 +1,8 @@
+import os
+
+import django
+
+# Benchmarks run against the test settings, so that they can be run directly
+# from a checkout of the repository.
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'tests.settings')
+django.setup()
@@ -0,0 +1,93 @@
+"""
+Benchmark the per-job cost of dequeuing from `ReliableRedisBackend`.
+
+Compares the current dequeue against the previous implementation which checked
+for a pause and for a job left in the processing queue with separate commands.
+
+Run from the root of the repository:
+
+    python -m benchmarks.reliable_redis_dequeue [--redis-url=redis://...]
+"""
+
+from typing import Optional
+
+from django_lightweight_queue.job import Job
+from django_lightweight_queue.types import QueueName, WorkerNumber
+from django_lightweight_queue.backends.reliable_redis import (
+    ReliableRedisBackend,
+)
+
+from .utils import (
+    measure,
+    get_client,
+    print_header,
+    patched_client,
+    get_argument_parser,
+)
+
+QUEUE = QueueName('benchmark-reliable-dequeue')
+WORKER_NUMBER = WorkerNumber(1)
+
+
+def legacy_dequeue(
+    backend: ReliableRedisBackend,
+    queue: QueueName,
+    worker_number: WorkerNumber,
+    timeout: int,
+) -> Optional[Job]:
+    if backend.is_paused(queue):
+        return None
+
+    processing_queue_key = backend._processing_key(queue, worker_number)
+
+    data = backend.client.lindex(processing_queue_key, -1)
+    if data:
+        return Job.from_json(data.decode('utf-8'))
+
+    data = backend.client.brpoplpush(
+        backend._key(queue),
+        processing_queue_key,
+        timeout,
+    )
+    if data:
+        return Job.from_json(data.decode('utf-8'))
+
+    return None
+
+
+def main() -> None:
+    args = get_argument_parser(__doc__).parse_args()
+
+    client = get_client(args.redis_url)
+    with patched_client(client):
+        backend = ReliableRedisBackend()
+
+    def setup() -> None:
+        backend.clear(QUEUE)
+        client.delete(backend._processing_key(QUEUE, WORKER_NUMBER))
+        backend.bulk_enqueue(
+            [Job('path', (i,), {}) for i in range(args.jobs)],
+            QUEUE,
+        )
+
+    def run_legacy() -> None:
+        for _ in range(args.jobs):
+            job = legacy_dequeue(backend, QUEUE, WORKER_NUMBER, 1)
+            assert job is not None
+            backend.processed_job(QUEUE, WORKER_NUMBER, job)
+
+    def run_current() -> None:
+        for _ in range(args.jobs):
+            job = backend.dequeue(QUEUE, WORKER_NUMBER, 1)
+            assert job is not None
+            backend.processed_job(QUEUE, WORKER_NUMBER, job)
+
+    print_header()
+    measure("legacy dequeue + ack", args.jobs, run_legacy, setup)
+    measure("dequeue + ack", args.jobs, run_current, setup)
+
+    backend.clear(QUEUE)
+
+
+if __name__ == '__main__':
+    main()
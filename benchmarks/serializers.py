@@ -0,0 +1,162 @@
+"""
+Benchmark the cost of storing jobs with each of the built-in serializers.
+
+Measures the time to encode and decode a job, the time to decode only the
+fields other than the job's arguments (as when looking at the created time of
+a job) and the size of the stored jobs.
+When run against a real redis server the memory redis uses to store a queue of
+the jobs is also measured; both are scaled to a million jobs. Each serializer
+is also measured with compression, which is worthwhile for jobs with large
+arguments (see `--ids`).
+
+Run from the root of the repository:
+
+    python -m benchmarks.serializers [--redis-url=redis://...]
+"""
+
+import time
+from typing import List, Optional
+
+import redis
+
+from django.test import override_settings
+
+from django_lightweight_queue.job import Job
+from django_lightweight_queue.compression import compress, decompress
+from django_lightweight_queue.serializers import (
+    BaseSerializer,
+    JSONSerializer,
+    MsgpackSerializer,
+)
+
+from .utils import get_client, get_argument_parser
+
+KEY = 'django_lightweight_queue:benchmark-serializers'
+
+
+class CompressingSerializer(BaseSerializer):
+    def __init__(self, serializer: BaseSerializer) -> None:
+        self.serializer = serializer
+
+    def dumps(self, job: Job) -> bytes:
+        return compress(self.serializer.dumps(job))
+
+    def loads(self, data: bytes) -> Job:
+        return self.serializer.loads(decompress(data))
+
+
+def describe(serializer: BaseSerializer) -> str:
+    if isinstance(serializer, CompressingSerializer):
+        return "{}+zlib".format(describe(serializer.serializer))
+    return type(serializer).__name__
+
+
+SERIALIZERS = (
+    JSONSerializer(),
+    MsgpackSerializer(),
+    CompressingSerializer(JSONSerializer()),
+    CompressingSerializer(MsgpackSerializer()),
+)
+
+
+def create_jobs(num_jobs: int, num_ids: int) -> List[Job]:
+    return [
+        Job(
+            'app.tasks.send_notification',
+            (list(range(i, i + num_ids)),),
+            {'user_id': i * 7, 'template': 'welcome'},
+            timeout=60,
+        )
+        for i in range(num_jobs)
+    ]
+
+
+def memory_usage(
+    client: 'redis.StrictRedis[bytes]',
+    all_data: List[bytes],
+) -> Optional[int]:
+    client.delete(KEY)
+    client.rpush(KEY, *all_data)
+
+    try:
+        return client.memory_usage(KEY, samples=0)
+    except redis.ResponseError:
+        # fakeredis doesn't support MEMORY USAGE
+        return None
+    finally:
+        client.delete(KEY)
+
+
+def measure(
+    serializer: BaseSerializer,
+    jobs: List[Job],
+    client: 'redis.StrictRedis[bytes]',
+) -> None:
+    num_jobs = len(jobs)
+
+    start = time.perf_counter()
+    all_data = [serializer.dumps(job) for job in jobs]
+    encode_duration = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for data in all_data:
+        job = serializer.loads(data)
+        job.args
+        job.created_time
+    decode_duration = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for data in all_data:
+        serializer.loads(data).created_time
+    header_duration = time.perf_counter() - start
+
+    payload_size = sum(len(x) for x in all_data)
+    redis_size = memory_usage(client, all_data)
+
+    print("{:<26} {:>10.1f} {:>10.1f} {:>10.1f} {:>12.0f} {:>12}".format(
+        describe(serializer),
+        encode_duration / num_jobs * 1e6,
+        decode_duration / num_jobs * 1e6,
+        header_duration / num_jobs * 1e6,
+        payload_size / num_jobs * 1e6 / 2 ** 20,
+        (
+            "{:.0f}".format(redis_size / num_jobs * 1e6 / 2 ** 20)
+            if redis_size is not None
+            else "-"
+        ),
+    ))
+
+
+def main() -> None:
+    parser = get_argument_parser(__doc__)
+    parser.add_argument(
+        '--ids',
+        type=int,
+        default=1,
+        help="Number of IDs in the arguments of each job.",
+    )
+    args = parser.parse_args()
+
+    client = get_client(args.redis_url)
+    jobs = create_jobs(args.jobs, args.ids)
+
+    print("{:<26} {:>10} {:>10} {:>10} {:>12} {:>12}".format(
+        "",
+        "encode µs",
+        "decode µs",
+        "header µs",
+        "MiB/M jobs",
+        "redis MiB/M",
+    ))
+    for serializer in SERIALIZERS:
+        # Ensure each serializer does the work, rather than returning the
+        # representation cached on the job by the previous one.
+        for job in jobs:
+            job._json = None
+
+        with override_settings(LIGHTWEIGHT_QUEUE_COMPRESSION_THRESHOLD=0):
+            measure(serializer, jobs, client)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+import time
+import argparse
+import contextlib
+from typing import Any, Callable, Iterator, Optional
+from unittest import mock
+
+import redis
+
+from django_lightweight_queue.backends.redis_utils import (
+    get_redis_client,
+    get_shared_redis_client,
+)
+
+
+def get_argument_parser(description: str) -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument(
+        '--redis-url',
+        default=None,
+        help="URL of a real redis server to benchmark against (for example "
+             "redis://localhost:6379/15). Defaults to an in-process fakeredis, "
+             "which gives accurate round trip counts but meaningless latencies. "
+             "Note: the benchmark will delete the keys it creates.",
+    )
+    parser.add_argument(
+        '--jobs',
+        type=int,
+        default=1000,
+        help="Number of jobs to run through the queue.",
+    )
+    return parser
+
+
+def get_client(redis_url: Optional[str]) -> 'redis.StrictRedis[bytes]':
+    if redis_url is None:
+        import fakeredis
+        return fakeredis.FakeStrictRedis()
+
+    return redis.StrictRedis.from_url(redis_url)
+
+
+@contextlib.contextmanager
+def patched_client(client: 'redis.StrictRedis[bytes]') -> Iterator[None]:
+    """
+    Arrange for backends constructed within this context to use the given client.
+
+    The client is left in the shared client cache so that backends continue to
+    use it for all queues after the context exits.
+    """
+    get_shared_redis_client.cache_clear()
+    with mock.patch('redis.StrictRedis', return_value=client):
+        get_redis_client()
+        yield
+
+
+class RoundTripCounter:
+    """
+    Count the number of network writes made to redis, which (since redis-py
+    always waits for replies before sending more) equals the round trips made.
+    """
+
+    def __init__(self) -> None:
+        self.count = 0
+
+    @contextlib.contextmanager
+    def counting(self) -> Iterator[None]:
+        original = redis.connection.Connection.send_packed_command
+
+        def send_packed_command(connection: Any, *args: Any, **kwargs: Any) -> None:
+            self.count += 1
+            original(connection, *args, **kwargs)
+
+        with mock.patch.object(
+            redis.connection.Connection,
+            'send_packed_command',
+            send_packed_command,
+        ):
+            yield
+
+
+def measure(
+    name: str,
+    num_jobs: int,
+    fn: Callable[[], None],
+    setup: Callable[[], None] = lambda: None,
+) -> None:
+    setup()
+
+    counter = RoundTripCounter()
+    with counter.counting():
+        start = time.perf_counter()
+        fn()
+        duration = time.perf_counter() - start
+
+    print("{:<30} {:>16.2f} {:>10.1f}".format(
+        name,
+        counter.count / num_jobs,
+        duration / num_jobs * 1e6,
+    ))
+
+
+def print_header() -> None:
+    print("{:<30} {:>16} {:>10}".format("", "round trips/job", "µs/job"))
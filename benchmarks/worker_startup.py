@@ -0,0 +1,140 @@
+"""
+Benchmark starting workers as new processes against forking them from a master
+which has already imported everything.
+
+Reports how long each worker takes to be ready to dequeue jobs and the
+proportional set size (PSS) of each worker, which counts memory shared with
+other processes divided between them. Measuring PSS requires Linux.
+
+Run from the root of the repository:
+
+    python -m benchmarks.worker_startup [--workers=4]
+"""
+
+import os
+import sys
+import time
+import signal
+import argparse
+import tempfile
+import subprocess
+from typing import List, Tuple, Callable
+
+from django_lightweight_queue.types import QueueName, WorkerNumber
+from django_lightweight_queue.utils import load_extra_settings
+from django_lightweight_queue.runner import fork_worker, WorkerProcess
+from django_lightweight_queue.backends.synchronous import SynchronousBackend
+
+QUEUE = QueueName('benchmark-worker-startup')
+
+READY_DIR_VARIABLE = 'BENCHMARK_WORKER_READY_DIR'
+
+EXTRA_SETTINGS = """
+LIGHTWEIGHT_QUEUE_BACKEND = 'benchmarks.worker_startup.ReadyBackend'
+"""
+
+
+class ReadyBackend(SynchronousBackend):
+    """
+    Records when each worker first asks for a job, by when it is ready.
+    """
+
+    def dequeue(self, queue: QueueName, worker_num: WorkerNumber, timeout: float) -> None:
+        path = os.path.join(os.environ[READY_DIR_VARIABLE], str(worker_num))
+        if not os.path.exists(path):
+            with open(path, 'w'):
+                pass
+
+        super().dequeue(queue, worker_num, timeout)
+
+
+def pss_kilobytes(pid: int) -> int:
+    with open('/proc/{}/smaps_rollup'.format(pid)) as f:
+        for line in f:
+            if line.startswith('Pss:'):
+                return int(line.split()[1])
+
+    raise ValueError("No PSS reported for process {}".format(pid))
+
+
+def measure(
+    name: str,
+    num_workers: int,
+    ready_dir: str,
+    start: Callable[[WorkerNumber], WorkerProcess],
+) -> None:
+    workers = []  # type: List[Tuple[WorkerProcess, float]]
+
+    for worker_num in range(1, num_workers + 1):
+        path = os.path.join(ready_dir, str(worker_num))
+
+        started = time.perf_counter()
+        worker = start(WorkerNumber(worker_num))
+        while not os.path.exists(path):
+            if worker.poll() is not None:
+                raise RuntimeError("Worker exited with {}".format(worker.returncode))
+            time.sleep(0.001)
+
+        workers.append((worker, time.perf_counter() - started))
+
+    pss = [pss_kilobytes(worker.pid) for worker, _ in workers]
+
+    for worker, _ in workers:
+        worker.send_signal(signal.SIGKILL)
+        worker.wait()
+    for worker_num in range(1, num_workers + 1):
+        os.unlink(os.path.join(ready_dir, str(worker_num)))
+
+    print("{:<20} {:>12.1f} {:>14.1f}".format(
+        name,
+        sum(duration for _, duration in workers) / num_workers * 1e3,
+        sum(pss) / num_workers / 1024,
+    ))
+
+
+def main(num_workers: int) -> None:
+    with tempfile.TemporaryDirectory() as ready_dir:
+        os.environ[READY_DIR_VARIABLE] = ready_dir
+
+        extra_settings = os.path.join(ready_dir, 'extra_settings.py')
+        with open(extra_settings, 'w') as f:
+            f.write(EXTRA_SETTINGS)
+
+        # As the runner does before starting workers.
+        load_extra_settings(extra_settings)
+
+        print("{:<20} {:>12} {:>14}".format("", "ms to ready", "PSS MiB/worker"))
+
+        measure(
+            "new process",
+            num_workers,
+            ready_dir,
+            lambda worker_num: subprocess.Popen([
+                sys.executable,
+                '-m',
+                'django',
+                'queue_worker',
+                QUEUE,
+                str(worker_num),
+                '--extra-settings',
+                extra_settings,
+            ]),
+        )
+
+        measure(
+            "fork",
+            num_workers,
+            ready_dir,
+            lambda worker_num: fork_worker(QUEUE, worker_num, 0, None),
+        )
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=4,
+        help="Number of workers to start in each way.",
+    )
+    main(parser.parse_args().workers)
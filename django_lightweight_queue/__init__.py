@@ -2,6 +2,7 @@ import django
 
 from .task import task, TaskWrapper
 from .utils import contribute_implied_queue_name
+from .batching import batch, abatch
 
 if django.VERSION < (3, 2):
     default_app_config = 'django_lightweight_queue.apps.DjangoLightweightQueueConfig'
@@ -9,5 +10,7 @@ if django.VERSION < (3, 2):
 __all__ = (
     'task',
     'TaskWrapper',
+    'batch',
+    'abatch',
     'contribute_implied_queue_name',
 )
@@ -33,6 +33,18 @@ class Settings(Protocol):
     BACKEND_OVERRIDES: Dict[QueueName, str]
     MIDDLEWARE: Sequence[str]
 
+    # The format jobs are stored in by the redis backends. Jobs stored in any
+    # of the built-in formats can always be read.
+    SERIALIZER: str
+    # Jobs whose serialized size is at least this many bytes are compressed by
+    # the redis backends. Jobs can always be read whether compressed or not.
+    COMPRESSION_THRESHOLD: Optional[int]
+    # The arguments of jobs whose serialized size is at least this many bytes
+    # are stored once under a separate key by the redis backends, with only a
+    # reference to them in the queue. They are fetched when the job is run and
+    # deleted once it has been processed.
+    OFFLOAD_THRESHOLD: Optional[int]
+
     # Apps to ignore when looking for tasks. Apps must be specified as the dotted
     # name used in `INSTALLED_APPS`. This is expected to be useful when you need to
     # have a file called `tasks.py` within an app, but don't want
@@ -45,12 +57,116 @@ class Settings(Protocol):
     REDIS_PASSWORD: Optional[str]
     REDIS_DATABASE: int
     REDIS_PREFIX: str
+    REDIS_UNIX_SOCKET_PATH: Optional[str]
+    # Note: this must be larger than the time for which workers block waiting
+    # for jobs (currently 15 seconds).
+    REDIS_SOCKET_TIMEOUT: Optional[float]
+    REDIS_SOCKET_CONNECT_TIMEOUT: Optional[float]
+    REDIS_SOCKET_KEEPALIVE: bool
+    # Limit on the size of each process' pool of connections to each server.
+    REDIS_MAX_CONNECTIONS: Optional[int]
+    # Dotted path to the redis-py parser class, for example
+    # 'redis.connection.HiredisParser'. Defaults to redis-py's choice, which is
+    # hiredis when that is installed.
+    REDIS_PARSER_CLASS: Optional[str]
+
+    # Allow per-queue overrides of the redis connection settings, given as a
+    # mapping of setting names without the 'REDIS_' prefix to values, for
+    # example {'queue1': {'HOST': 'other-redis', 'PORT': 6380}}.
+    REDIS_OVERRIDES: Dict[QueueName, Dict[str, Any]]
+
+    # Allow per-queue opt-in to the list based redis backends spreading the
+    # queue's jobs over several lists, each of which is consumed by a share of
+    # the queue's workers. Either the number of shards, or a sequence of
+    # per-shard overrides of the redis connection settings (as for
+    # `REDIS_OVERRIDES`) to put shards on other redis servers.
+    SHARDS: Dict[QueueName, Union[int, Sequence[Dict[str, Any]]]]
+
+    # Allow per-queue opt-in to the list based redis backends running jobs in
+    # order of their priority, given as the number of priority levels. Jobs
+    # have priorities from zero (the default) to one less than this; higher
+    # priorities are clamped to the highest level.
+    PRIORITIES: Dict[QueueName, int]
+    # Allow per-queue opt-in to jobs being run ahead of those with higher
+    # priorities once they have waited for this many seconds, so that lower
+    # priority jobs are not starved.
+    PRIORITY_AGING: Dict[QueueName, float]
+
+    # Workers are told when queues are paused or resumed, so only re-check
+    # whether a queue is paused after this many seconds in case they missed
+    # being told.
+    PAUSE_STATE_MAX_AGE: float
+
+    # Jobs which have been delivered to a worker by the redis streams backend
+    # but not acknowledged after this many seconds are assumed to belong to a
+    # dead worker and are delivered to another. This must be longer than the
+    # longest running job.
+    STREAMS_RECLAIM_IDLE_TIME: float
 
     ENABLE_PROMETHEUS: bool
     # Workers will export metrics on this port, and ports following it
     PROMETHEUS_START_PORT: int
 
     ATOMIC_JOBS: bool
+    # Keep database connections open between jobs, as Django does between
+    # requests, rather than closing them all after each job. Connections are
+    # then closed according to the databases' CONN_MAX_AGE settings.
+    REUSE_DB_CONNECTIONS: bool
+
+    # Allow per-queue opt-in to workers fetching up to this many jobs from the
+    # backend at once, running them from a local buffer. Defaults to 1.
+    PREFETCH_COUNTS: Dict[QueueName, int]
+
+    # Allow per-queue opt-in to each worker running up to this many jobs at
+    # once, each in its own thread. Defaults to 1, i.e. running jobs in the
+    # worker's main thread.
+    THREADS: Dict[QueueName, int]
+
+    # Allow per-queue opt-in to workers running jobs in an asyncio event loop,
+    # up to this many at once. Intended for queues of `async def` tasks.
+    ASYNC_CONCURRENCY: Dict[QueueName, int]
+
+    # Start workers by forking the master process, which has already imported
+    # Django, the project and its tasks, rather than by running a new Python
+    # process for each. Makes starting and restarting workers much quicker and
+    # lets workers share the memory of the master's imports.
+    FORK_WORKERS: bool
+
+    # Allow several queues to be served by the same workers, given as a
+    # mapping of the name of each group of queues to the weights of its queues,
+    # for example {'small-queues': {'queue1': 3, 'queue2': 1}}. Groups are
+    # given workers in `WORKERS` as though they were queues (defaulting to
+    # one), and their queues don't have their own workers. When several of a
+    # group's queues have jobs waiting, its workers take jobs from each in
+    # proportion to its weight. Only supported by the redis backends.
+    QUEUE_GROUPS: Dict[QueueName, Dict[QueueName, int]]
+
+    # Allow per-queue (or per-group) opt-in to the runner scaling the number of
+    # workers between that given in `WORKERS` and this many, depending on the
+    # length of the queue. Workers are added while there are more than
+    # `AUTOSCALE_BACKLOG_PER_WORKER` jobs waiting for each worker, and removed
+    # one at a time once the queue has been empty for
+    # `AUTOSCALE_DOWN_COOLDOWN` seconds. After each change the runner waits
+    # for `AUTOSCALE_UP_COOLDOWN` seconds before adding more workers, or
+    # `AUTOSCALE_DOWN_COOLDOWN` seconds before removing any. Queue lengths are
+    # checked every `AUTOSCALE_INTERVAL` seconds.
+    MAX_WORKERS: Dict[QueueName, int]
+    AUTOSCALE_BACKLOG_PER_WORKER: int
+    AUTOSCALE_INTERVAL: float
+    AUTOSCALE_UP_COOLDOWN: float
+    AUTOSCALE_DOWN_COOLDOWN: float
+
+    # Allow per-queue configuration of when workers exit so that the runner
+    # restarts them, freeing any memory leaked by their jobs. A value of None
+    # disables the limit. Workers exit after running this many jobs, which
+    # defaults to 1000.
+    MAX_JOBS_PER_WORKER: Dict[QueueName, Optional[int]]
+    # Workers exit after waiting this many seconds for a job, which defaults to
+    # 30 minutes.
+    MAX_WORKER_IDLE_TIME: Dict[QueueName, Optional[float]]
+    # Workers exit once their resident set size exceeds this many bytes, which
+    # is checked between jobs. Only supported on Linux.
+    MAX_WORKER_RSS: Dict[QueueName, Optional[int]]
 
 
 class LayeredSettings(Settings, Protocol):
@@ -66,6 +182,10 @@ class Defaults(Settings):
     BACKEND_OVERRIDES: Dict[QueueName, str] = {}
     MIDDLEWARE = ('django_lightweight_queue.middleware.logging.LoggingMiddleware',)
 
+    SERIALIZER = 'django_lightweight_queue.serializers.JSONSerializer'
+    COMPRESSION_THRESHOLD: Optional[int] = None
+    OFFLOAD_THRESHOLD: Optional[int] = None
+
     IGNORE_APPS: Sequence[str] = ()
 
     REDIS_HOST = '127.0.0.1'
@@ -73,12 +193,48 @@ class Defaults(Settings):
     REDIS_PASSWORD = None
     REDIS_DATABASE = 0
     REDIS_PREFIX = ""
+    REDIS_UNIX_SOCKET_PATH = None
+    REDIS_SOCKET_TIMEOUT = None
+    REDIS_SOCKET_CONNECT_TIMEOUT = None
+    REDIS_SOCKET_KEEPALIVE = False
+    REDIS_MAX_CONNECTIONS = None
+    REDIS_PARSER_CLASS = None
+
+    REDIS_OVERRIDES: Dict[QueueName, Dict[str, Any]] = {}
+
+    SHARDS: Dict[QueueName, Union[int, Sequence[Dict[str, Any]]]] = {}
+
+    PRIORITIES: Dict[QueueName, int] = {}
+    PRIORITY_AGING: Dict[QueueName, float] = {}
+
+    PAUSE_STATE_MAX_AGE = 30
+
+    STREAMS_RECLAIM_IDLE_TIME = 60 * 60
 
     ENABLE_PROMETHEUS = False
 
     PROMETHEUS_START_PORT = 9300
 
     ATOMIC_JOBS = True
+    REUSE_DB_CONNECTIONS = False
+
+    PREFETCH_COUNTS: Dict[QueueName, int] = {}
+    THREADS: Dict[QueueName, int] = {}
+    ASYNC_CONCURRENCY: Dict[QueueName, int] = {}
+
+    FORK_WORKERS = False
+
+    QUEUE_GROUPS: Dict[QueueName, Dict[QueueName, int]] = {}
+
+    MAX_WORKERS: Dict[QueueName, int] = {}
+    AUTOSCALE_BACKLOG_PER_WORKER = 10
+    AUTOSCALE_INTERVAL = 5
+    AUTOSCALE_UP_COOLDOWN = 30
+    AUTOSCALE_DOWN_COOLDOWN = 120
+
+    MAX_JOBS_PER_WORKER: Dict[QueueName, Optional[int]] = {}
+    MAX_WORKER_IDLE_TIME: Dict[QueueName, Optional[float]] = {}
+    MAX_WORKER_RSS: Dict[QueueName, Optional[int]] = {}
 
 
 class AppSettings:
@@ -0,0 +1,220 @@
+import math
+import time
+from typing import Dict, List, Tuple, Callable, Optional, Sequence
+
+from prometheus_client import Gauge, Counter
+
+from .types import Logger, QueueName, WorkerNumber
+from .utils import get_queues, get_backend, get_min_queue_counts
+from .app_settings import app_settings
+from .backends.base import BackendWithPause
+
+if app_settings.ENABLE_PROMETHEUS:
+    autoscaled_workers = Gauge(
+        'autoscaled_workers',
+        "Workers of autoscaled queues which this machine is running",
+        ['queue'],
+    )
+    autoscaling_events = Counter(
+        'autoscaling_events',
+        "Changes to the number of workers of autoscaled queues, by direction",
+        ['queue', 'direction'],
+    )
+
+
+class QueueScaling:
+    """
+    The scaling state of an autoscaled queue.
+
+    Worker numbers are shared by all the machines in a pool, so the workers
+    which should be running are tracked as a count across the pool, of which
+    this machine runs those it has.
+    """
+
+    def __init__(self, queue: QueueName, worker_numbers: List[WorkerNumber]) -> None:
+        self.queue = queue
+        # The workers of this queue which this machine runs, if enabled.
+        self.worker_numbers = worker_numbers
+
+        self.minimum = get_min_queue_counts().get(queue, 0)
+        self.maximum = max(self.minimum, app_settings.MAX_WORKERS[queue])
+
+        # Workers up to this number should be running. Workers are added in
+        # order and removed in reverse.
+        self.active = self.minimum
+        self.last_scaled = -math.inf
+        # When the queue was first seen to be empty, if it still is.
+        self.idle_since = None  # type: Optional[float]
+
+    @property
+    def running_workers(self) -> int:
+        return len([x for x in self.worker_numbers if self.is_enabled(x)])
+
+    def is_enabled(self, worker_num: WorkerNumber) -> bool:
+        return worker_num <= self.active
+
+
+class Autoscaler:
+    """
+    Decides which of the workers of autoscaled queues (see `MAX_WORKERS`) the
+    runner should run, based on the lengths of the queues.
+
+    Workers are added quickly, as soon as the queue has a backlog, and removed
+    slowly, once it has been empty for a while. The different conditions and
+    the cooldowns between changes stop the number of workers flapping.
+    """
+
+    def __init__(
+        self,
+        worker_names: Sequence[Tuple[QueueName, WorkerNumber]],
+        logger: Logger,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.logger = logger
+        self.clock = clock
+        self.next_sample = -math.inf
+
+        worker_numbers = {}  # type: Dict[QueueName, List[WorkerNumber]]
+        for queue, worker_num in worker_names:
+            if queue in app_settings.MAX_WORKERS:
+                worker_numbers.setdefault(queue, []).append(worker_num)
+
+        self.scaling = {
+            queue: QueueScaling(queue, sorted(numbers))
+            for queue, numbers in worker_numbers.items()
+        }
+
+        if app_settings.ENABLE_PROMETHEUS:
+            for scaling in self.scaling.values():
+                autoscaled_workers.labels(scaling.queue).set(scaling.running_workers)
+
+    def is_enabled(self, queue: QueueName, worker_num: WorkerNumber) -> bool:
+        """
+        Whether the runner should currently run the given worker.
+        """
+        scaling = self.scaling.get(queue)
+        return scaling is None or scaling.is_enabled(worker_num)
+
+    def is_scaled(self, queue: QueueName, worker_num: WorkerNumber) -> bool:
+        """
+        Whether the given worker is only run while its queue is scaled up.
+        """
+        scaling = self.scaling.get(queue)
+        return scaling is not None and worker_num > scaling.minimum
+
+    def update(self) -> List[Tuple[QueueName, WorkerNumber]]:
+        """
+        Check the lengths of the autoscaled queues (at most every
+        `AUTOSCALE_INTERVAL` seconds) and scale their workers accordingly.
+        Returns the workers which have been removed, which the runner should
+        ask to stop.
+        """
+        now = self.clock()
+        if now < self.next_sample:
+            return []
+
+        self.next_sample = now + app_settings.AUTOSCALE_INTERVAL
+
+        removed = []  # type: List[Tuple[QueueName, WorkerNumber]]
+        for scaling in self.scaling.values():
+            try:
+                length, paused = self.sample(scaling.queue)
+            except Exception:
+                self.logger.exception(
+                    "Failed to check the length of {}".format(scaling.queue),
+                    extra={'queue': scaling.queue},
+                )
+                continue
+
+            removed.extend(
+                (scaling.queue, worker_num)
+                for worker_num in self.scale(scaling, length, paused, now)
+            )
+
+        return removed
+
+    def sample(self, queue: QueueName) -> Tuple[int, bool]:
+        """
+        The number of jobs waiting in the given queue (or group of queues), and
+        whether it is paused (all of the group's queues are).
+        """
+        length = 0
+        paused = True
+
+        for member in get_queues(queue):
+            backend = get_backend(member)
+            length += backend.length(member)
+            paused = paused and isinstance(backend, BackendWithPause) and backend.is_paused(member)
+
+        return length, paused
+
+    def scale(
+        self,
+        scaling: QueueScaling,
+        length: int,
+        paused: bool,
+        now: float,
+    ) -> List[WorkerNumber]:
+        """
+        Scale the workers of a queue of the given length. Returns those of this
+        machine's workers which have been removed.
+        """
+        if length:
+            scaling.idle_since = None
+        elif scaling.idle_since is None:
+            scaling.idle_since = now
+
+        # Jobs can't be taken from paused queues, so more workers wouldn't help.
+        wanted = 0 if paused else math.ceil(
+            length / app_settings.AUTOSCALE_BACKLOG_PER_WORKER,
+        )
+        wanted = min(wanted, scaling.maximum)
+
+        if (
+            wanted > scaling.active and
+            now - scaling.last_scaled >= app_settings.AUTOSCALE_UP_COOLDOWN
+        ):
+            self.record(scaling, 'up', wanted, length, now)
+            return []
+
+        if (
+            scaling.active > scaling.minimum and
+            scaling.idle_since is not None and
+            now - scaling.idle_since >= app_settings.AUTOSCALE_DOWN_COOLDOWN and
+            now - scaling.last_scaled >= app_settings.AUTOSCALE_DOWN_COOLDOWN
+        ):
+            removed = WorkerNumber(scaling.active)
+            self.record(scaling, 'down', scaling.active - 1, length, now)
+            return [removed] if removed in scaling.worker_numbers else []
+
+        return []
+
+    def record(
+        self,
+        scaling: QueueScaling,
+        direction: str,
+        active: int,
+        length: int,
+        now: float,
+    ) -> None:
+        scaling.active = active
+        scaling.last_scaled = now
+
+        self.logger.info(
+            "Scaling {} {} to {} workers ({} jobs waiting)".format(
+                scaling.queue,
+                direction,
+                active,
+                length,
+            ),
+            extra={
+                'queue': scaling.queue,
+                'direction': direction,
+                'workers': active,
+                'queue_length': length,
+            },
+        )
+
+        if app_settings.ENABLE_PROMETHEUS:
+            autoscaled_workers.labels(scaling.queue).set(scaling.running_workers)
+            autoscaling_events.labels(scaling.queue, direction).inc()
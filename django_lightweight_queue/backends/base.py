@@ -1,6 +1,17 @@
 import datetime
 from abc import ABCMeta, abstractmethod
-from typing import Tuple, TypeVar, Optional, Collection
+from typing import (
+    Dict,
+    List,
+    Tuple,
+    Mapping,
+    TypeVar,
+    Optional,
+    Sequence,
+    Collection,
+)
+
+from asgiref.sync import sync_to_async
 
 from ..job import Job
 from ..types import QueueName, WorkerNumber
@@ -15,6 +26,16 @@ class BaseBackend(metaclass=ABCMeta):
     def startup(self, queue: QueueName) -> None:
         pass
 
+    def bulk_startup(self, queues: Collection[QueueName]) -> None:
+        """
+        Run the on-startup logic for a number of queues in one pass.
+
+        Backends are strongly encouraged to override this with a more efficient
+        implementation if their startup logic is non-trivial.
+        """
+        for queue in queues:
+            self.startup(queue)
+
     @abstractmethod
     def enqueue(self, job: Job, queue: QueueName) -> None:
         raise NotImplementedError()
@@ -31,10 +52,94 @@ class BaseBackend(metaclass=ABCMeta):
         for job in jobs:
             self.enqueue(job, queue)
 
+    def bulk_enqueue_many(self, jobs_by_queue: Mapping[QueueName, Collection[Job]]) -> None:
+        """
+        Enqueue jobs into a number of queues in one pass.
+
+        The jobs for each queue will be inserted in the order provided.
+
+        Backends are encouraged to override this with a more efficient
+        implementation if they can.
+        """
+        for queue, jobs in jobs_by_queue.items():
+            self.bulk_enqueue(jobs, queue)
+
+    async def aenqueue(self, job: Job, queue: QueueName) -> None:
+        """
+        Enqueue a job from async code, without blocking the event loop.
+
+        Backends without native async support enqueue from a thread.
+        """
+        await sync_to_async(self.enqueue)(job, queue)
+
+    async def abulk_enqueue_many(
+        self,
+        jobs_by_queue: Mapping[QueueName, Collection[Job]],
+    ) -> None:
+        """
+        Async counterpart of `bulk_enqueue_many`, see `aenqueue`.
+        """
+        await sync_to_async(self.bulk_enqueue_many)(jobs_by_queue)
+
     @abstractmethod
     def dequeue(self, queue: QueueName, worker_num: WorkerNumber, timeout: int) -> Optional[Job]:
         raise NotImplementedError()
 
+    def bulk_dequeue(
+        self,
+        queue: QueueName,
+        worker_num: WorkerNumber,
+        timeout: int,
+        count: int,
+        *,
+        recover: bool = True
+    ) -> List[Job]:
+        """
+        Dequeue up to `count` jobs in one pass, blocking for up to `timeout`
+        seconds if none are available.
+
+        The jobs are returned in the order in which they should be run. Callers
+        must report each job to `processed_job` (or `bulk_processed_jobs`) once
+        it has run, in any order.
+
+        Jobs which were dequeued by the same worker but never reported as
+        processed (for example because the worker crashed) may be returned
+        again, ahead of any others and all at once, whatever `count`. Callers
+        which dequeue more jobs while some are still running must pass
+        `recover=False`, so that those aren't.
+
+        Backends are strongly encouraged to override this with a more efficient
+        implementation if they can.
+        """
+        job = self.dequeue(queue, worker_num, timeout)
+        if job is None:
+            return []
+        return [job]
+
+    async def abulk_dequeue(
+        self,
+        queue: QueueName,
+        worker_num: WorkerNumber,
+        timeout: int,
+        count: int,
+        *,
+        recover: bool = True
+    ) -> List[Job]:
+        """
+        Async counterpart of `bulk_dequeue`.
+
+        Backends without native async support dequeue from a thread. This isn't
+        Django's thread for synchronous code, which would otherwise be blocked
+        while waiting for jobs.
+        """
+        return await sync_to_async(self.bulk_dequeue, thread_sensitive=False)(
+            queue,
+            worker_num,
+            timeout,
+            count,
+            recover=recover,
+        )
+
     @abstractmethod
     def length(self, queue: QueueName) -> int:
         raise NotImplementedError()
@@ -42,6 +147,33 @@ class BaseBackend(metaclass=ABCMeta):
     def processed_job(self, queue: QueueName, worker_num: WorkerNumber, job: Job) -> None:
         pass
 
+    def bulk_processed_jobs(
+        self,
+        queue: QueueName,
+        worker_num: WorkerNumber,
+        jobs: Collection[Job],
+    ) -> None:
+        """
+        Report that a number of jobs have been processed, in one pass.
+        """
+        for job in jobs:
+            self.processed_job(queue, worker_num, job)
+
+    async def abulk_processed_jobs(
+        self,
+        queue: QueueName,
+        worker_num: WorkerNumber,
+        jobs: Collection[Job],
+    ) -> None:
+        """
+        Async counterpart of `bulk_processed_jobs`, see `abulk_dequeue`.
+        """
+        await sync_to_async(self.bulk_processed_jobs, thread_sensitive=False)(
+            queue,
+            worker_num,
+            jobs,
+        )
+
 
 class BackendWithDeduplicate(BaseBackend, metaclass=ABCMeta):
     @abstractmethod
@@ -60,6 +192,31 @@ class BackendWithClear(BaseBackend, metaclass=ABCMeta):
         raise NotImplementedError()
 
 
+class BackendWithPriorities(BaseBackend, metaclass=ABCMeta):
+    @abstractmethod
+    def length_by_priority(self, queue: QueueName) -> Dict[int, int]:
+        raise NotImplementedError()
+
+
+class BackendWithQueueGroups(BaseBackend, metaclass=ABCMeta):
+    @abstractmethod
+    def dequeue_any(
+        self,
+        queues: Sequence[QueueName],
+        worker_num: WorkerNumber,
+        timeout: int,
+    ) -> Optional[Tuple[QueueName, Job]]:
+        """
+        Dequeue a single job from the first of the given queues which has one,
+        blocking for up to `timeout` seconds if none do, for the workers of a
+        group of queues. Returns the job along with its queue.
+
+        Callers must report the job to `processed_job` for its queue before
+        dequeuing any more.
+        """
+        raise NotImplementedError()
+
+
 class BackendWithPause(BaseBackend, metaclass=ABCMeta):
     @abstractmethod
     def pause(self, queue: QueueName, until: datetime.datetime) -> None:
@@ -74,3 +231,17 @@ class BackendWithPauseResume(BackendWithPause, metaclass=ABCMeta):
     @abstractmethod
     def resume(self, queue: QueueName) -> None:
         raise NotImplementedError()
+
+
+class BackendWithWorkerRecovery(BaseBackend, metaclass=ABCMeta):
+    @abstractmethod
+    def recover_worker_jobs(self, queue: QueueName, worker_num: WorkerNumber) -> None:
+        """
+        Return any jobs which the given worker took from the given queue, but
+        didn't report as processed, to the queue.
+
+        For workers which have exited and won't be restarted, such as those
+        removed by autoscaling, whose jobs would otherwise only be recovered
+        once the worker next runs.
+        """
+        raise NotImplementedError()
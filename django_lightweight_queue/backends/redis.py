@@ -1,86 +1,506 @@
-import datetime
-from typing import Optional, Collection
+import asyncio
+import itertools
+from typing import (
+    Any,
+    Set,
+    Dict,
+    List,
+    Tuple,
+    Mapping,
+    TypeVar,
+    Optional,
+    Sequence,
+    Collection,
+)
 
 import redis
+import redis.asyncio
 
 from ..job import Job
-from .base import BackendWithClear, BackendWithPauseResume
+from .base import (
+    BackendWithClear,
+    BackendWithPriorities,
+    BackendWithDeduplicate,
+    BackendWithPauseResume,
+    BackendWithQueueGroups,
+)
 from ..types import QueueName, WorkerNumber
-from ..utils import block_for_time
+from .redis_utils import (
+    QueueShard,
+    AnyPipeline,
+    GetPipeline,
+    total_length,
+    get_all_lists,
+    delete_matching,
+    group_by_client,
+    PauseStateCache,
+    RedisPauseMixin,
+    deduplicate_list,
+    get_queue_shards,
+    get_redis_client,
+    get_worker_lists,
+    add_push_commands,
+    get_async_clients,
+    get_worker_shards,
+    get_arguments_refs,
+    get_priority_levels,
+    lengths_by_priority,
+    release_unique_jobs,
+    arelease_unique_jobs,
+    get_async_redis_client,
+    offload_large_arguments,
+    defer_offloaded_arguments,
+    afetch_offloaded_arguments,
+)
 from ..app_settings import app_settings
+from ..progress_logger import ProgressLogger, NULL_PROGRESS_LOGGER
 
+# Work around https://github.com/python/mypy/issues/9914. Name needs to match
+# that in progress_logger.py.
+T = TypeVar('T')
 
-class RedisBackend(BackendWithPauseResume, BackendWithClear):
+
+class RedisBackend(
+    RedisPauseMixin,
+    BackendWithPauseResume,
+    BackendWithClear,
+    BackendWithDeduplicate,
+    BackendWithPriorities,
+    BackendWithQueueGroups,
+):
     """
     This backend has at-most-once semantics.
     """
 
     def __init__(self) -> None:
-        self.client = redis.StrictRedis(
-            host=app_settings.REDIS_HOST,
-            port=app_settings.REDIS_PORT,
-            password=app_settings.REDIS_PASSWORD,
-            db=app_settings.REDIS_DATABASE,
-        )
+        # Clients are shared by all the backends in the process which talk to
+        # the same server; this one is for the default server.
+        self.client = get_redis_client()
+        self._clients = {}  # type: Dict[QueueName, redis.StrictRedis[bytes]]
+        # Keyed by the id of the client.
+        self._pause_states = {}  # type: Dict[int, PauseStateCache]
+        self._queue_shards = {}  # type: Dict[QueueName, List[QueueShard]]
+        self._enqueue_counter = itertools.count()
 
     def enqueue(self, job: Job, queue: QueueName) -> None:
         return self.bulk_enqueue([job], queue)
 
     def bulk_enqueue(self, jobs: Collection[Job], queue: QueueName) -> None:
-        self.client.lpush(
-            self._key(queue),
-            *(job.to_json().encode('utf-8') for job in jobs),
-        )
+        self.bulk_enqueue_many({queue: jobs})
 
-    def dequeue(self, queue: QueueName, worker_num: WorkerNumber, timeout: int) -> Optional[Job]:
-        if self.is_paused(queue):
-            # Block for a while to avoid constant polling ...
-            block_for_time(
-                lambda: self.is_paused(queue),
-                timeout=datetime.timedelta(seconds=timeout),
+    def bulk_enqueue_many(self, jobs_by_queue: Mapping[QueueName, Collection[Job]]) -> None:
+        # A single pipeline for each server, shared by all the queues.
+        pipes = {}  # type: Dict[int, redis.client.Pipeline[bytes]]
+
+        def get_pipe(client: 'redis.StrictRedis[bytes]') -> 'redis.client.Pipeline[bytes]':
+            try:
+                return pipes[id(client)]
+            except KeyError:
+                pipe = pipes[id(client)] = client.pipeline(transaction=True)
+                return pipe
+
+        self._add_enqueue_commands(jobs_by_queue, get_pipe)
+
+        for pipe in pipes.values():
+            pipe.execute()
+
+    async def aenqueue(self, job: Job, queue: QueueName) -> None:
+        await self.abulk_enqueue_many({queue: [job]})
+
+    async def abulk_enqueue_many(
+        self,
+        jobs_by_queue: Mapping[QueueName, Collection[Job]],
+    ) -> None:
+        # As `bulk_enqueue_many`, using pipelines of asyncio clients for the
+        # same servers.
+        async_clients = {}  # type: Dict[int, redis.asyncio.StrictRedis[bytes]]
+        for queue in jobs_by_queue:
+            async_clients.update(get_async_clients(queue))
+
+        pipes = {}  # type: Dict[int, redis.asyncio.client.Pipeline[bytes]]
+
+        def get_pipe(client: 'redis.StrictRedis[bytes]') -> 'redis.asyncio.client.Pipeline[bytes]':
+            try:
+                return pipes[id(client)]
+            except KeyError:
+                pipe = pipes[id(client)] = async_clients[id(client)].pipeline(transaction=True)
+                return pipe
+
+        self._add_enqueue_commands(jobs_by_queue, get_pipe)
+
+        await asyncio.gather(*(pipe.execute() for pipe in pipes.values()))
+
+    def _add_enqueue_commands(
+        self,
+        jobs_by_queue: Mapping[QueueName, Collection[Job]],
+        get_pipe: GetPipeline,
+    ) -> None:
+        # Store any offloaded arguments first, atomically with pushing the jobs
+        # which are on the same server.
+        to_push = {}  # type: Dict[QueueName, List[Job]]
+        for queue, jobs in jobs_by_queue.items():
+            to_push[queue], offloaded = offload_large_arguments(jobs, self._arguments_key(queue))
+
+            pipe = get_pipe(self._client(queue))
+            for ref, arguments in offloaded:
+                pipe.set(ref, arguments)
+
+        for queue, jobs in to_push.items():
+            shards = self._shards(queue)
+
+            # Spread the jobs over the queue's shards, starting with the next
+            # shard each time.
+            add_push_commands(
+                get_pipe,
+                jobs,
+                shards,
+                get_priority_levels(queue),
+                start=next(self._enqueue_counter) % len(shards),
+                unique_key=self._unique_key(queue),
             )
-            # ... but always indicate that we did no work
+
+    def dequeue(self, queue: QueueName, worker_num: WorkerNumber, timeout: int) -> Optional[Job]:
+        if self._wait_if_paused(queue, timeout):
+            # Always indicate that we did no work
+            return None
+
+        data = self._pop(queue, worker_num, timeout)
+        if data is None:
             return None
 
-        raw = self.client.brpop(self._key(queue), timeout)
+        return self._read_jobs(queue, [data])[0]
+
+    def bulk_dequeue(
+        self,
+        queue: QueueName,
+        worker_num: WorkerNumber,
+        timeout: int,
+        count: int,
+        *,
+        recover: bool = True
+    ) -> List[Job]:
+        # Jobs are removed from the queue as they're dequeued, so there's never
+        # anything to recover.
+        if self._wait_if_paused(queue, timeout):
+            # Always indicate that we did no work
+            return []
+
+        client = self._home_client(queue, worker_num)
+        lists = self._home_lists(queue, worker_num)
+
+        # Find out how many jobs there are in each list, unless there's only
+        # one, in the order we want to take them.
+        if len(lists) > 1:
+            pipe = client.pipeline(transaction=False)
+            for key in lists:
+                pipe.llen(key)
+            lengths = pipe.execute()
+        else:
+            lengths = [count]
+
+        pipe = client.pipeline(transaction=True)
+        self._add_take_commands(pipe, lists, lengths, count)
+        all_data = self._taken_data(pipe.execute())
+
+        if not all_data:
+            # Otherwise block waiting for a single job.
+            data = self._pop(queue, worker_num, timeout)
+            if data is None:
+                return []
+
+            all_data = [data]
+
+        return self._read_jobs(queue, all_data)
+
+    async def abulk_dequeue(
+        self,
+        queue: QueueName,
+        worker_num: WorkerNumber,
+        timeout: int,
+        count: int,
+        *,
+        recover: bool = True
+    ) -> List[Job]:
+        # As `bulk_dequeue`, using asyncio clients.
+        if await self._await_if_paused(queue, timeout):
+            # Always indicate that we did no work
+            return []
+
+        client = get_async_clients(queue)[id(self._home_client(queue, worker_num))]
+        lists = self._home_lists(queue, worker_num)
+
+        if len(lists) > 1:
+            pipe = client.pipeline(transaction=False)
+            for key in lists:
+                pipe.llen(key)
+            lengths = await pipe.execute()
+        else:
+            lengths = [count]
+
+        pipe = client.pipeline(transaction=True)
+        self._add_take_commands(pipe, lists, lengths, count)
+        all_data = self._taken_data(await pipe.execute())
+
+        if not all_data:
+            # Otherwise block waiting for a single job.
+            data = await self._apop(queue, worker_num, timeout)
+            if data is None:
+                return []
+
+            all_data = [data]
+
+        return await self._aread_jobs(queue, all_data)
+
+    def dequeue_any(
+        self,
+        queues: Sequence[QueueName],
+        worker_num: WorkerNumber,
+        timeout: int,
+    ) -> Optional[Tuple[QueueName, Job]]:
+        unpaused = [x for x in queues if not self._pause_state(x).is_paused(self._pause_key(x))]
+        if not unpaused:
+            self._wait_if_paused(queues[0], timeout)
+            # Always indicate that we did no work
+            return None
+
+        # The lists of all the queues, in the order to take jobs from them.
+        lists = [
+            (queue, priority_list)
+            for queue in unpaused
+            for priority_list in get_worker_lists(queue, self._shards(queue), worker_num)
+        ]
+
+        client = self._home_client(unpaused[0], worker_num)
+        queues_by_key = {
+            priority_list.key.encode(): queue
+            for queue, priority_list in lists
+            if priority_list.client is client
+        }
+
+        # As in `_pop`, lists on other servers are only checked for jobs which
+        # are already there.
+        if len(queues_by_key) < len(lists):
+            for queue, priority_list in lists:
+                data = priority_list.client.rpop(priority_list.key)
+                if data is not None:
+                    return queue, self._read_jobs(queue, [data])[0]
+
+        # BRPOP takes from the first non-empty list, so the order of the queues
+        # decides which has its jobs taken when several have jobs waiting.
+        raw = client.brpop(list(queues_by_key), timeout)
         if raw is None:
             return None
 
-        _, data = raw
-        return Job.from_json(data.decode('utf-8'))
+        key, data = raw
+        queue = queues_by_key[key]
+        return queue, self._read_jobs(queue, [data])[0]
 
-    def length(self, queue: QueueName) -> int:
-        return self.client.llen(self._key(queue))
+    def _home_lists(self, queue: QueueName, worker_num: WorkerNumber) -> List[str]:
+        """
+        The keys of the lists of the queue on the server of the given worker's
+        own shard, in the order it takes jobs from them.
+        """
+        client = self._home_client(queue, worker_num)
+        return [
+            x.key
+            for x in get_worker_lists(queue, self._shards(queue), worker_num)
+            if x.client is client
+        ]
 
-    def pause(self, queue: QueueName, until: datetime.datetime) -> None:
+    def _add_take_commands(
+        self,
+        pipe: AnyPipeline,
+        lists: List[str],
+        lengths: List[int],
+        count: int,
+    ) -> None:
+        # Atomically take up to `count` jobs from the tails of the lists in
+        # order, without blocking. LRANGE returns them newest first, see
+        # `_taken_data`.
+        remaining = count
+        for key, length in zip(lists, lengths):
+            if remaining <= 0:
+                break
+            if length:
+                taken = min(length, remaining)
+                pipe.lrange(key, -taken, -1)
+                pipe.ltrim(key, 0, -taken - 1)
+                remaining -= taken
+
+    def _taken_data(self, results: List[Any]) -> List[bytes]:
+        return [
+            data
+            for chunk in results[::2]
+            for data in reversed(chunk)
+        ]
+
+    def _pop(self, queue: QueueName, worker_num: WorkerNumber, timeout: int) -> Optional[bytes]:
         """
-        Pause the given queue by setting a pause marker.
+        Pop a single job, preferring the highest priority jobs and within that
+        the worker's own shard of the queue, taking jobs from the other shards
+        when that is empty. Blocks for up to `timeout` seconds if there are no
+        jobs.
         """
+        client = self._home_client(queue, worker_num)
+        lists = get_worker_lists(queue, self._shards(queue), worker_num)
+        keys = [x.key for x in lists if x.client is client]
+
+        # BRPOP can only wait on lists on a single server. Shards on other
+        # servers are therefore only checked for jobs which are already there,
+        # before waiting on our own server's shards.
+        if len(keys) < len(lists):
+            for priority_list in lists:
+                data = priority_list.client.rpop(priority_list.key)
+                if data is not None:
+                    return data
+
+        # BRPOP takes from the first non-empty list, i.e. the highest priority
+        # one and our own shard if that has jobs.
+        raw = client.brpop(keys, timeout)
+        if raw is None:
+            return None
+
+        _, data = raw
+        return data
+
+    async def _apop(
+        self,
+        queue: QueueName,
+        worker_num: WorkerNumber,
+        timeout: int,
+    ) -> Optional[bytes]:
+        # As `_pop`, using asyncio clients.
+        async_clients = get_async_clients(queue)
+        home = self._home_client(queue, worker_num)
+        lists = get_worker_lists(queue, self._shards(queue), worker_num)
+        keys = [x.key for x in lists if x.client is home]
+
+        if len(keys) < len(lists):
+            for priority_list in lists:
+                data = await async_clients[id(priority_list.client)].rpop(priority_list.key)
+                if data is not None:
+                    return data
+
+        raw = await async_clients[id(home)].brpop(keys, timeout)
+        if raw is None:
+            return None
+
+        _, data = raw
+        return data
+
+    def _read_jobs(
+        self,
+        queue: QueueName,
+        all_data: List[bytes],
+    ) -> List[Job]:
+        client = self._client(queue)
+        jobs = [Job.from_bytes(x) for x in all_data]
+        defer_offloaded_arguments(client, jobs)
+
+        release_unique_jobs(client, self._unique_key(queue), jobs)
+        return jobs
+
+    async def _aread_jobs(
+        self,
+        queue: QueueName,
+        all_data: List[bytes],
+    ) -> List[Job]:
+        # As `_read_jobs`, using asyncio clients.
+        client = get_async_redis_client(queue)
+        jobs = [Job.from_bytes(x) for x in all_data]
+        await afetch_offloaded_arguments(client, jobs)
+
+        await arelease_unique_jobs(client, self._unique_key(queue), jobs)
+        return jobs
 
-        pause_key = self._pause_key(queue)
+    def processed_job(self, queue: QueueName, worker_num: WorkerNumber, job: Job) -> None:
+        self.bulk_processed_jobs(queue, worker_num, [job])
 
-        now = datetime.datetime.now(datetime.timezone.utc)
-        delta = until - now
+    def bulk_processed_jobs(
+        self,
+        queue: QueueName,
+        worker_num: WorkerNumber,
+        jobs: Collection[Job],
+    ) -> None:
+        # Jobs have already been removed from the queue, only their offloaded
+        # arguments remain.
+        refs = get_arguments_refs(jobs)
+        if refs:
+            self._client(queue).delete(*refs)
 
-        self.client.setex(
-            pause_key,
-            time=int(delta.total_seconds()),
-            # Store the value for debugging, we rely on setex behaviour for
-            # implementation.
-            value=until.isoformat(' '),
-        )
+    async def abulk_processed_jobs(
+        self,
+        queue: QueueName,
+        worker_num: WorkerNumber,
+        jobs: Collection[Job],
+    ) -> None:
+        refs = get_arguments_refs(jobs)
+        if refs:
+            await get_async_redis_client(queue).delete(*refs)
 
-    def resume(self, queue: QueueName) -> None:
+    def length(self, queue: QueueName) -> int:
+        return total_length(get_all_lists(self._shards(queue), get_priority_levels(queue)))
+
+    def length_by_priority(self, queue: QueueName) -> Dict[int, int]:
+        return lengths_by_priority(self._shards(queue), get_priority_levels(queue))
+
+    def deduplicate(
+        self,
+        queue: QueueName,
+        *,
+        progress_logger: ProgressLogger = NULL_PROGRESS_LOGGER
+    ) -> Tuple[int, int]:
         """
-        Resume the given queue by deleting the pause marker (if present).
+        Deduplicate the given queue by comparing the jobs in a manner which
+        ignores their created timestamps.
+
+        See ``deduplicate_list`` for details. Jobs are deduplicated across all
+        the shards and priorities of the queue, keeping those with the highest
+        priority.
+
+        Returns a tuple of (original_size, new_size) of the queue.
         """
-        self.client.delete(self._pause_key(queue))
+        seen_identities: Set[bytes] = set()
+        removed_refs: List[str] = []
+        original_size = new_size = 0
 
-    def is_paused(self, queue: QueueName) -> bool:
-        return bool(self.client.exists(self._pause_key(queue)))
+        for client, key in get_all_lists(self._shards(queue), get_priority_levels(queue)):
+            shard_original_size, shard_new_size = deduplicate_list(
+                client,
+                key,
+                progress_logger=progress_logger,
+                seen_identities=seen_identities,
+                removed_refs=removed_refs,
+            )
+            original_size += shard_original_size
+            new_size += shard_new_size
+
+        if removed_refs:
+            self._client(queue).delete(*removed_refs)
+
+        return original_size, new_size
 
     def clear(self, queue: QueueName) -> None:
-        self.client.delete(self._key(queue))
+        client = self._client(queue)
+        client.delete(self._unique_key(queue))
+        delete_matching(client, self._arguments_key(queue) + ':*')
+        for client, keys in group_by_client(
+            get_all_lists(self._shards(queue), get_priority_levels(queue)),
+        ):
+            client.delete(*keys)
+
+    def _shards(self, queue: QueueName) -> List[QueueShard]:
+        try:
+            return self._queue_shards[queue]
+        except KeyError:
+            shards = self._queue_shards[queue] = get_queue_shards(queue, self._key(queue))
+            return shards
+
+    def _home_client(self, queue: QueueName, worker_num: WorkerNumber) -> 'redis.StrictRedis[bytes]':
+        """
+        The client for the server of the given worker's own shard of the queue.
+        """
+        return get_worker_shards(self._shards(queue), worker_num)[0].client
 
     def _key(self, queue: QueueName) -> str:
         if app_settings.REDIS_PREFIX:
@@ -93,3 +513,9 @@ class RedisBackend(BackendWithPauseResume, BackendWithClear):
 
     def _pause_key(self, queue: QueueName) -> str:
         return self._key(queue) + ':pause'
+
+    def _unique_key(self, queue: QueueName) -> str:
+        return self._key(queue) + ':unique'
+
+    def _arguments_key(self, queue: QueueName) -> str:
+        return self._key(queue) + ':arguments'
@@ -0,0 +1,450 @@
+import time
+import warnings
+import collections
+from typing import (
+    Any,
+    Set,
+    Dict,
+    List,
+    Deque,
+    Tuple,
+    Mapping,
+    TypeVar,
+    Optional,
+    Collection,
+)
+
+import redis
+
+from ..job import Job
+from .base import (
+    BackendWithClear,
+    BackendWithDeduplicate,
+    BackendWithPauseResume,
+)
+from ..types import QueueName, WorkerNumber
+from .redis_utils import (
+    CHUNK_SIZE,
+    PauseStateCache,
+    RedisPauseMixin,
+    get_redis_client,
+)
+from ..app_settings import app_settings
+from ..progress_logger import ProgressLogger, NULL_PROGRESS_LOGGER
+
+# Work around https://github.com/python/mypy/issues/9914. Name needs to match
+# that in progress_logger.py.
+T = TypeVar('T')
+
+# The name of the consumer group which all workers for a queue belong to.
+GROUP_NAME = 'django_lightweight_queue'
+
+# The field of each stream entry which holds the job.
+JOB_FIELD = b'job'
+
+# How often, in seconds, each worker looks for jobs to reclaim from other
+# workers.
+RECLAIM_INTERVAL = 60
+
+# A stream entry, as returned by redis-py: (entry id, fields). The fields are
+# empty for entries which have been deleted since they were delivered, as is
+# the id for such entries when reclaimed from Redis 6.2.
+Entry = Tuple[Optional[bytes], Dict[bytes, bytes]]
+
+
+class ConsumerState:
+    """
+    The state of a single worker's consumption of a queue.
+    """
+
+    def __init__(self) -> None:
+        # The id after which to continue reading the entries which were
+        # delivered to this worker by a previous process but not acknowledged,
+        # or None once those have all been read.
+        self.history_id: Optional[bytes] = b'0'
+
+        # `time.monotonic` value of when jobs were last reclaimed.
+        self.last_reclaimed = float('-inf')
+
+        # Entries which have been returned as jobs but not yet acknowledged,
+        # in the order they were returned, as (entry id, job data).
+        self.pending: Deque[Tuple[bytes, bytes]] = collections.deque()
+
+
+class RedisStreamsBackend(
+    RedisPauseMixin,
+    BackendWithClear,
+    BackendWithDeduplicate,
+    BackendWithPauseResume,
+):
+    """
+    This backend stores each queue as a redis stream, e.g.
+    'django_lightweight_queue:things:stream', which all the workers for the
+    queue read from as members of a single consumer group.
+
+    We enqueue jobs via XADD and workers read them via XREADGROUP, which records
+    each job as pending for that worker until it acknowledges it (via XACK) once
+    the job has been processed. Processed jobs are also deleted from the stream
+    so that it only holds outstanding jobs.
+
+    A worker which restarts first picks up any jobs which were pending for it.
+    Workers also periodically reclaim (via XAUTOCLAIM) jobs which have been
+    pending for another worker for longer than `STREAMS_RECLAIM_IDLE_TIME`, for
+    example because that worker has died or been removed. Unlike the reliable
+    redis backend this doesn't wait for the queue's runner to restart.
+
+    So that live jobs are never reclaimed, each job must have a timeout shorter
+    than `STREAMS_RECLAIM_IDLE_TIME`, and a worker renews its claim (via XCLAIM)
+    on the jobs it still holds each time it acknowledges one.
+
+    This backend has at-least-once semantics. It requires Redis 6.2 or later.
+    Unique jobs and offloading of large arguments are not supported.
+    """
+
+    def __init__(self) -> None:
+        # Clients are shared by all the backends in the process which talk to
+        # the same server; this one is for the default server.
+        self.client = get_redis_client()
+        self._clients = {}  # type: Dict[QueueName, redis.StrictRedis[bytes]]
+        # Keyed by the id of the client.
+        self._pause_states = {}  # type: Dict[int, PauseStateCache]
+        self._consumers = {}  # type: Dict[Tuple[QueueName, WorkerNumber], ConsumerState]
+        self._queues_with_groups = set()  # type: Set[QueueName]
+
+        if app_settings.OFFLOAD_THRESHOLD is not None:
+            warnings.warn(
+                "The Redis Streams backend does not offload large arguments, "
+                "ignoring LIGHTWEIGHT_QUEUE_OFFLOAD_THRESHOLD.",
+                stacklevel=2,
+            )
+
+    def startup(self, queue: QueueName) -> None:
+        self._ensure_group(queue)
+
+    def enqueue(self, job: Job, queue: QueueName) -> None:
+        return self.bulk_enqueue([job], queue)
+
+    def bulk_enqueue(self, jobs: Collection[Job], queue: QueueName) -> None:
+        self.bulk_enqueue_many({queue: jobs})
+
+    def bulk_enqueue_many(self, jobs_by_queue: Mapping[QueueName, Collection[Job]]) -> None:
+        # Check all the jobs first so that none are enqueued if any are invalid.
+        for jobs in jobs_by_queue.values():
+            for job in jobs:
+                self._check_job(job)
+
+        # A single pipeline for each server, shared by all the queues.
+        pipes = {}  # type: Dict[int, redis.client.Pipeline[bytes]]
+        for queue, jobs in jobs_by_queue.items():
+            client = self._client(queue)
+            try:
+                pipe = pipes[id(client)]
+            except KeyError:
+                pipe = pipes[id(client)] = client.pipeline(transaction=False)
+
+            key = self._key(queue)
+            for job in jobs:
+                pipe.xadd(key, {JOB_FIELD: job.to_bytes()})
+
+        for pipe in pipes.values():
+            pipe.execute()
+
+    def dequeue(self, queue: QueueName, worker_number: WorkerNumber, timeout: int) -> Optional[Job]:
+        jobs = self.bulk_dequeue(queue, worker_number, timeout, count=1)
+        if not jobs:
+            return None
+
+        job, = jobs
+        return job
+
+    def bulk_dequeue(
+        self,
+        queue: QueueName,
+        worker_number: WorkerNumber,
+        timeout: int,
+        count: int,
+        *,
+        recover: bool = True
+    ) -> List[Job]:
+        if self._wait_if_paused(queue, timeout):
+            # Always indicate that we did no work
+            return []
+
+        self._ensure_group(queue)
+
+        client = self._client(queue)
+        key = self._key(queue)
+        consumer_name = str(worker_number)
+        consumer = self._consumer(queue, worker_number)
+
+        entries: List[Entry] = []
+
+        # Pick up any jobs which were delivered to this worker but never
+        # acknowledged, e.g. if this worker crashed and has just been restarted.
+        if recover and consumer.history_id is not None:
+            entries = self._read_entries(client.xreadgroup(
+                GROUP_NAME,
+                consumer_name,
+                {key: consumer.history_id},
+                count=count,
+            ))
+            if len(entries) < count:
+                consumer.history_id = None
+            else:
+                consumer.history_id = entries[-1][0] or b'0'
+
+        # Reclaim jobs which have been pending for other workers for too long.
+        now = time.monotonic()
+        if not entries and now - consumer.last_reclaimed > RECLAIM_INTERVAL:
+            consumer.last_reclaimed = now
+
+            # Entries are returned in the second element of the reply; the third
+            # (only present in Redis 7 and later) is ids of deleted entries.
+            entries = client.xautoclaim(
+                key,
+                GROUP_NAME,
+                consumer_name,
+                min_idle_time=int(app_settings.STREAMS_RECLAIM_IDLE_TIME * 1000),
+                count=count,
+            )[1]
+
+        # Otherwise block waiting for new jobs.
+        if not entries:
+            entries = self._read_entries(client.xreadgroup(
+                GROUP_NAME,
+                consumer_name,
+                {key: '>'},
+                count=count,
+                block=timeout * 1000 if timeout else None,
+            ))
+
+        jobs = []
+        deleted_ids = []
+        for entry_id, fields in entries:
+            if not fields:
+                # The entry was removed (e.g. by `clear`) after being delivered.
+                if entry_id is not None:
+                    deleted_ids.append(entry_id)
+                continue
+
+            assert entry_id is not None
+
+            data = fields[JOB_FIELD]
+            consumer.pending.append((entry_id, data))
+            jobs.append(Job.from_bytes(data))
+
+        if deleted_ids:
+            client.xack(key, GROUP_NAME, *deleted_ids)
+
+        return jobs
+
+    def processed_job(self, queue: QueueName, worker_number: WorkerNumber, job: Job) -> None:
+        self.bulk_processed_jobs(queue, worker_number, [job])
+
+    def bulk_processed_jobs(
+        self,
+        queue: QueueName,
+        worker_number: WorkerNumber,
+        jobs: Collection[Job],
+    ) -> None:
+        pending = self._consumer(queue, worker_number).pending
+
+        entry_ids = []
+        for job in jobs:
+            data = job.to_bytes()
+
+            # Jobs are processed in the order they were dequeued, so this is
+            # almost always the first pending entry.
+            for index, (entry_id, pending_data) in enumerate(pending):
+                if pending_data == data:
+                    del pending[index]
+                    entry_ids.append(entry_id)
+                    break
+
+        if not entry_ids:
+            return
+
+        key = self._key(queue)
+
+        pipe = self._client(queue).pipeline(transaction=True)
+        pipe.xack(key, GROUP_NAME, *entry_ids)
+        pipe.xdel(key, *entry_ids)
+        if pending:
+            # Reset the idle time of the jobs which this worker still holds,
+            # e.g. prefetched ones, so that they aren't reclaimed by another
+            # worker while waiting behind the jobs before them.
+            pipe.xclaim(
+                key,
+                GROUP_NAME,
+                str(worker_number),
+                min_idle_time=0,
+                message_ids=[entry_id for entry_id, _ in pending],
+                justid=True,
+            )
+        pipe.execute()
+
+    def length(self, queue: QueueName) -> int:
+        """
+        The number of jobs which have not yet been delivered to a worker.
+        """
+        client = self._client(queue)
+        key = self._key(queue)
+
+        # Delivered jobs remain in the stream until they're acknowledged.
+        pipe = client.pipeline(transaction=True)
+        pipe.xlen(key)
+        pipe.xpending(key, GROUP_NAME)
+        try:
+            length, pending = pipe.execute()
+        except redis.ResponseError:
+            # No consumer group yet, so nothing has been delivered.
+            return client.xlen(key)
+
+        # Jobs removed by `clear` may still be pending until a worker notices.
+        return max(0, length - pending['pending'])
+
+    def deduplicate(
+        self,
+        queue: QueueName,
+        *,
+        progress_logger: ProgressLogger = NULL_PROGRESS_LOGGER
+    ) -> Tuple[int, int]:
+        """
+        Deduplicate the jobs in the given queue which have not yet been
+        delivered to a worker, by comparing the jobs in a manner which ignores
+        their created timestamps. The oldest of each set of equivalent jobs is
+        kept.
+
+        Unlike the list based backends, the stream is not locked while this
+        happens so a worker may pick up a job at the same time as it is found to
+        be a duplicate.
+
+        Returns a tuple of (original_size, new_size) of the undelivered jobs.
+        """
+        client = self._client(queue)
+        key = self._key(queue)
+
+        group = self._group_info(queue)
+        last_delivered_id = group['last-delivered-id'] if group else b'0-0'
+
+        seen_identities: Set[bytes] = set()
+        duplicate_ids: List[bytes] = []
+        original_size = 0
+
+        progress_logger.info("Collecting jobs")
+
+        start = b'(' + last_delivered_id
+        while True:
+            chunk = client.xrange(key, min=start, count=CHUNK_SIZE)
+            if not chunk:
+                break
+
+            for entry_id, fields in chunk:
+                original_size += 1
+
+                job_identity = Job.from_bytes(fields[JOB_FIELD]).identity
+
+                if job_identity in seen_identities:
+                    duplicate_ids.append(entry_id)
+                else:
+                    seen_identities.add(job_identity)
+
+            start = b'(' + chunk[-1][0]
+
+        progress_logger.info("Removing duplicate jobs")
+
+        pipe = client.pipeline(transaction=False)
+        for index in range(0, len(duplicate_ids), CHUNK_SIZE):
+            pipe.xdel(key, *duplicate_ids[index:index + CHUNK_SIZE])
+        pipe.execute()
+
+        return original_size, original_size - len(duplicate_ids)
+
+    def clear(self, queue: QueueName) -> None:
+        # Trim, rather than delete, the stream so that the consumer group (and
+        # thus the workers' view of the queue) survives. Jobs which have been
+        # delivered but not acknowledged are removed too.
+        self._client(queue).xtrim(self._key(queue), maxlen=0, approximate=False)
+
+    def _check_job(self, job: Job) -> None:
+        if job.unique:
+            raise ValueError(
+                "The Redis Streams backend does not support unique jobs "
+                "({}).".format(job.path),
+            )
+
+        # Jobs which are still running once they've been held for this long
+        # would be reclaimed, and so run again, by another worker.
+        if job.timeout is None or job.timeout >= app_settings.STREAMS_RECLAIM_IDLE_TIME:
+            raise ValueError(
+                "Jobs for the Redis Streams backend must have a timeout of "
+                "less than LIGHTWEIGHT_QUEUE_STREAMS_RECLAIM_IDLE_TIME "
+                "({} has timeout {}).".format(job.path, job.timeout),
+            )
+
+    def _ensure_group(self, queue: QueueName) -> None:
+        if queue in self._queues_with_groups:
+            return
+
+        try:
+            # Creates the stream too if needed. Jobs which were enqueued before
+            # the group existed will be delivered.
+            self._client(queue).xgroup_create(
+                self._key(queue),
+                GROUP_NAME,
+                id='0',
+                mkstream=True,
+            )
+        except redis.ResponseError as e:
+            if not str(e).startswith('BUSYGROUP'):
+                raise
+
+        self._queues_with_groups.add(queue)
+
+    def _group_info(self, queue: QueueName) -> Optional[Dict[str, Any]]:
+        try:
+            groups = self._client(queue).xinfo_groups(self._key(queue))
+        except redis.ResponseError:
+            # No such stream
+            return None
+
+        for group in groups:
+            if group['name'] == GROUP_NAME.encode():
+                return group
+
+        return None
+
+    def _read_entries(self, response: Any) -> List[Entry]:
+        # XREADGROUP replies with [[stream key, [entry, ...]]], or an empty
+        # reply if it timed out.
+        if not response:
+            return []
+
+        (_, entries), = response
+        return entries
+
+    def _consumer(self, queue: QueueName, worker_number: WorkerNumber) -> ConsumerState:
+        try:
+            return self._consumers[queue, worker_number]
+        except KeyError:
+            consumer = self._consumers[queue, worker_number] = ConsumerState()
+            return consumer
+
+    def _key(self, queue: QueueName) -> str:
+        key = 'django_lightweight_queue:{}:stream'.format(queue)
+
+        return self._prefix_key(key)
+
+    def _pause_key(self, queue: QueueName) -> str:
+        # Shared with the list based backends, so that pausing is unaffected
+        # by switching between them.
+        return self._prefix_key('django_lightweight_queue:{}:pause'.format(queue))
+
+    def _prefix_key(self, key: str) -> str:
+        if app_settings.REDIS_PREFIX:
+            return '{}:{}'.format(
+                app_settings.REDIS_PREFIX,
+                key,
+            )
+
+        return key
@@ -0,0 +1,926 @@
+"""
+Helpers shared between the redis-based backends.
+"""
+
+import time
+import uuid
+import asyncio
+import weakref
+import datetime
+from typing import (
+    Any,
+    Set,
+    Dict,
+    List,
+    Tuple,
+    Union,
+    Mapping,
+    TypeVar,
+    Callable,
+    Iterable,
+    Optional,
+    Sequence,
+    Collection,
+    NamedTuple,
+)
+from functools import partial, lru_cache
+
+import redis
+import redis.asyncio
+
+from ..job import Job
+from ..types import QueueName, WorkerNumber
+from ..utils import get_path, get_serializer, get_serializer_for
+from ..compression import compress, decompress
+from ..app_settings import app_settings
+from ..progress_logger import ProgressLogger, NULL_PROGRESS_LOGGER
+
+# Work around https://github.com/python/mypy/issues/9914. Name needs to match
+# that in progress_logger.py.
+T = TypeVar('T')
+
+# How many jobs to fetch from or push to redis in a single command during bulk
+# operations. Large enough to amortise round trips, small enough not to block
+# the redis server for any noticeable time.
+CHUNK_SIZE = 1000
+
+# Mapping of the (suffixes of the) redis settings to the corresponding arguments
+# to `redis.StrictRedis`.
+CONNECTION_SETTINGS = {
+    'HOST': 'host',
+    'PORT': 'port',
+    'PASSWORD': 'password',
+    'DATABASE': 'db',
+    'UNIX_SOCKET_PATH': 'unix_socket_path',
+    'SOCKET_TIMEOUT': 'socket_timeout',
+    'SOCKET_CONNECT_TIMEOUT': 'socket_connect_timeout',
+    'SOCKET_KEEPALIVE': 'socket_keepalive',
+    'MAX_CONNECTIONS': 'max_connections',
+    'PARSER_CLASS': 'parser_class',
+}
+
+ConnectionOptions = Tuple[Tuple[str, Any], ...]
+
+# Pushes a unique job unless an identical one is already waiting, see
+# `add_push_unique_command`. KEYS are the set of the identities of waiting
+# jobs, the list to push onto and optionally the job's offloaded arguments;
+# ARGV are the job's identity, the job and the command to push it with.
+PUSH_UNIQUE_SCRIPT = """
+if redis.call('SADD', KEYS[1], ARGV[1]) == 1 then
+    return redis.call(ARGV[3], KEYS[2], ARGV[2])
+end
+if KEYS[3] then
+    redis.call('DEL', KEYS[3])
+end
+return 0
+"""
+
+# How often, in seconds, async workers check whether a paused queue has been
+# resumed.
+ASYNC_POLL_INTERVAL = 1
+
+# Pipelines which the commands to enqueue jobs can be added to, which are
+# executed either synchronously or asynchronously.
+AnyPipeline = Union['redis.client.Pipeline[bytes]', 'redis.asyncio.client.Pipeline[bytes]']
+GetPipeline = Callable[['redis.StrictRedis[bytes]'], AnyPipeline]
+
+# Asyncio clients can only be used within the event loop they were first used
+# in, so are shared per event loop, then by their connection options.
+AsyncClients = Dict[ConnectionOptions, 'redis.asyncio.StrictRedis[bytes]']
+_async_clients = (
+    weakref.WeakKeyDictionary()
+)  # type: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncClients]
+
+
+def get_connection_options(
+    queue: Optional[QueueName] = None,
+    extra_overrides: Optional[Mapping[str, Any]] = None,
+) -> ConnectionOptions:
+    """
+    Determine the options for connecting to the redis server for the given
+    queue, or the default server if no queue is given.
+
+    Per-queue values from ``REDIS_OVERRIDES`` take precedence over the global
+    ``REDIS_*`` settings; the given extra overrides (e.g. those for a shard of
+    the queue) take precedence over both.
+    """
+    overrides = dict(app_settings.REDIS_OVERRIDES.get(queue, {}) if queue else {})
+    overrides.update(extra_overrides or {})
+
+    unexpected_names = set(overrides.keys()) - set(CONNECTION_SETTINGS.keys())
+    if unexpected_names:
+        raise ValueError(
+            "Unexpected redis override(s) {} for queue {}.".format(
+                ", ".join(sorted(unexpected_names)),
+                queue,
+            ),
+        )
+
+    return tuple(
+        (
+            argument,
+            overrides[name] if name in overrides else getattr(app_settings, 'REDIS_' + name),
+        )
+        for name, argument in sorted(CONNECTION_SETTINGS.items())
+    )
+
+
+def get_redis_client(
+    queue: Optional[QueueName] = None,
+    extra_overrides: Optional[Mapping[str, Any]] = None,
+) -> 'redis.StrictRedis[bytes]':
+    """
+    Get a client for the redis server for the given queue, or the default
+    server if no queue is given.
+
+    Clients, and thus their connection pools, are shared by all the users of
+    the same redis server within a process.
+    """
+    return get_shared_redis_client(get_connection_options(queue, extra_overrides))
+
+
+@lru_cache()
+def get_shared_redis_client(options: ConnectionOptions) -> 'redis.StrictRedis[bytes]':
+    kwargs = dict(options)
+    parser_class = kwargs.pop('parser_class')
+
+    client: 'redis.StrictRedis[bytes]' = redis.StrictRedis(**kwargs)
+
+    # The parser is an option of the connections, rather than of the client,
+    # so is passed through via the pool.
+    if parser_class is not None:
+        client.connection_pool.connection_kwargs['parser_class'] = get_path(parser_class)
+
+    return client
+
+
+def get_async_redis_client(
+    queue: Optional[QueueName] = None,
+    extra_overrides: Optional[Mapping[str, Any]] = None,
+) -> 'redis.asyncio.StrictRedis[bytes]':
+    """
+    Get an asyncio client for the redis server for the given queue, or the
+    default server if no queue is given, for use within the running event loop.
+
+    Asyncio clients have their own connection pools, which are shared by all
+    the users of the same redis server within the event loop.
+    """
+    options = get_connection_options(queue, extra_overrides)
+    clients = _async_clients.setdefault(asyncio.get_running_loop(), {})
+
+    try:
+        return clients[options]
+    except KeyError:
+        pass
+
+    kwargs = dict(options)
+    # The parser classes for synchronous connections can't be used by asyncio
+    # connections, which pick their own.
+    kwargs.pop('parser_class')
+
+    client = clients[options] = redis.asyncio.StrictRedis(**kwargs)
+    return client
+
+
+def get_async_clients(queue: QueueName) -> Dict[int, 'redis.asyncio.StrictRedis[bytes]']:
+    """
+    Map the ids of the clients for the given queue and each of its shards to
+    asyncio clients for the same redis servers.
+    """
+    clients = {id(get_redis_client(queue)): get_async_redis_client(queue)}
+    for overrides in get_shard_overrides(queue):
+        clients[id(get_redis_client(queue, overrides))] = get_async_redis_client(queue, overrides)
+    return clients
+
+
+class QueueShard(NamedTuple):
+    client: 'redis.StrictRedis[bytes]'
+    key: str
+
+
+def get_queue_shards(queue: QueueName, key: str) -> List[QueueShard]:
+    """
+    Get the shards of the given queue, whose unsharded list is stored at the
+    given key, as configured by the ``SHARDS`` setting.
+
+    The first shard is always the unsharded list, so that a queue's existing
+    jobs are still processed when it becomes sharded.
+    """
+    return [
+        QueueShard(
+            client=get_redis_client(queue, overrides),
+            key=key if shard_number == 0 else '{}:shard:{}'.format(key, shard_number),
+        )
+        for shard_number, overrides in enumerate(get_shard_overrides(queue))
+    ]
+
+
+def get_shard_overrides(queue: QueueName) -> Sequence[Mapping[str, Any]]:
+    """
+    Get the redis overrides for each of the shards of the given queue.
+    """
+    shards = app_settings.SHARDS.get(queue, 1)
+
+    shard_overrides: Sequence[Mapping[str, Any]]
+    if isinstance(shards, int):
+        shard_overrides = [{}] * shards
+    else:
+        shard_overrides = shards
+
+    if not shard_overrides:
+        raise ValueError("Queue {} must have at least one shard.".format(queue))
+
+    return shard_overrides
+
+
+def get_worker_shards(
+    shards: Sequence[QueueShard],
+    worker_number: WorkerNumber,
+) -> List[QueueShard]:
+    """
+    Order the given shards for the given worker to consume from: its own shard
+    first, followed by the others which it may take jobs from when its own is
+    empty. Workers are spread evenly over the shards.
+    """
+    home = (worker_number - 1) % len(shards)
+    return [*shards[home:], *shards[:home]]
+
+
+def group_by_client(
+    shards: Sequence[QueueShard],
+) -> List[Tuple['redis.StrictRedis[bytes]', List[str]]]:
+    """
+    Group the keys of the given shards by the redis server they're on,
+    preserving their order.
+    """
+    groups = {}  # type: Dict[int, Tuple[redis.StrictRedis[bytes], List[str]]]
+    for shard in shards:
+        _, keys = groups.setdefault(id(shard.client), (shard.client, []))
+        keys.append(shard.key)
+    return list(groups.values())
+
+
+def list_lengths(shards: Sequence[QueueShard]) -> List[int]:
+    """
+    The lengths of the lists of the given shards, in order, in a single round
+    trip to each server.
+    """
+    lengths = {}  # type: Dict[Tuple[int, str], int]
+    for client, keys in group_by_client(shards):
+        pipe = client.pipeline(transaction=False)
+        for key in keys:
+            pipe.llen(key)
+        for key, length in zip(keys, pipe.execute()):
+            lengths[id(client), key] = length
+    return [lengths[id(shard.client), shard.key] for shard in shards]
+
+
+def total_length(shards: Sequence[QueueShard]) -> int:
+    """
+    The total length of the lists of the given shards, in a single round trip
+    to each server.
+    """
+    return sum(list_lengths(shards))
+
+
+def split_for_shards(
+    items: Sequence[T],
+    num_shards: int,
+    start: int,
+) -> List[Tuple[int, Sequence[T]]]:
+    """
+    Split the given items into contiguous runs, one for each shard, beginning
+    with the given shard. Returns (shard index, items) tuples for the non-empty
+    runs.
+    """
+    runs = []
+    run_length, remainder = divmod(len(items), num_shards)
+    offset = 0
+    for index in range(num_shards):
+        length = run_length + (1 if index < remainder else 0)
+        if length:
+            runs.append(((start + index) % num_shards, items[offset:offset + length]))
+        offset += length
+    return runs
+
+
+def get_priority_levels(queue: QueueName) -> int:
+    return app_settings.PRIORITIES.get(queue, 1)
+
+
+def get_priority(job: Job, levels: int) -> int:
+    """
+    The priority level of the given job, limited to the available levels.
+    """
+    return min(max(job.priority, 0), levels - 1)
+
+
+def get_priority_lists(shards: Sequence[QueueShard], priority: int) -> List[QueueShard]:
+    """
+    The lists of the given shards which hold jobs of the given priority.
+    """
+    # The lowest priority uses the shards' own lists, so that existing jobs are
+    # still processed when a queue gains priorities.
+    if priority == 0:
+        return list(shards)
+
+    return [
+        shard._replace(key='{}:priority:{}'.format(shard.key, priority))
+        for shard in shards
+    ]
+
+
+def lengths_by_priority(shards: Sequence[QueueShard], levels: int) -> Dict[int, int]:
+    """
+    The total length of the lists of each priority of the given shards, in a
+    single round trip to each server.
+    """
+    lists = [
+        (priority, priority_list)
+        for priority in range(levels)
+        for priority_list in get_priority_lists(shards, priority)
+    ]
+
+    lengths = dict.fromkeys(range(levels), 0)
+    for (priority, _), length in zip(lists, list_lengths([x for _, x in lists])):
+        lengths[priority] += length
+    return lengths
+
+
+def get_all_lists(shards: Sequence[QueueShard], levels: int) -> List[QueueShard]:
+    """
+    All the lists of the given shards, highest priority first.
+    """
+    return [
+        priority_list
+        for priority in reversed(range(levels))
+        for priority_list in get_priority_lists(shards, priority)
+    ]
+
+
+def get_worker_lists(
+    queue: QueueName,
+    shards: Sequence[QueueShard],
+    worker_number: WorkerNumber,
+) -> List[QueueShard]:
+    """
+    The lists of the given queue for the given worker to take jobs from, in
+    order: highest priority first and within that the worker's own shard first.
+
+    If the queue has priority aging configured, the lists whose oldest job has
+    waited for longer than that are moved to the front, oldest first. This costs
+    a round trip to each server.
+    """
+    levels = get_priority_levels(queue)
+    lists = get_all_lists(get_worker_shards(shards, worker_number), levels)
+
+    max_wait = app_settings.PRIORITY_AGING.get(queue)
+    if max_wait is None or levels == 1:
+        return lists
+
+    pipes = {}  # type: Dict[int, Tuple[redis.client.Pipeline[bytes], List[QueueShard]]]
+    for priority_list in lists:
+        pipe, pipe_lists = pipes.setdefault(
+            id(priority_list.client),
+            (priority_list.client.pipeline(transaction=False), []),
+        )
+        pipe.lindex(priority_list.key, -1)
+        pipe_lists.append(priority_list)
+
+    now = datetime.datetime.utcnow()
+    starved = []  # type: List[Tuple[datetime.datetime, int, QueueShard]]
+    for pipe, pipe_lists in pipes.values():
+        for priority_list, data in zip(pipe_lists, pipe.execute()):
+            if data is None:
+                continue
+
+            created_time = Job.from_bytes(data).created_time
+            if (now - created_time).total_seconds() > max_wait:
+                starved.append((created_time, lists.index(priority_list), priority_list))
+
+    starved_lists = [priority_list for _, _, priority_list in sorted(starved)]
+    return [
+        *starved_lists,
+        *(x for x in lists if x not in starved_lists),
+    ]
+
+
+def group_for_enqueue(
+    jobs: Collection[Job],
+    shards: Sequence[QueueShard],
+    levels: int,
+    start: int,
+) -> List[Tuple[QueueShard, List[Job]]]:
+    """
+    Group the given jobs by the list they should be pushed onto: that of their
+    priority, spreading them over the shards beginning with the given shard.
+    """
+    by_priority = {}  # type: Dict[int, List[Job]]
+    for job in jobs:
+        by_priority.setdefault(get_priority(job, levels), []).append(job)
+
+    grouped = []
+    for priority, priority_jobs in by_priority.items():
+        priority_lists = get_priority_lists(shards, priority)
+        for index, run in split_for_shards(priority_jobs, len(priority_lists), start):
+            grouped.append((priority_lists[index], list(run)))
+
+    return grouped
+
+
+def add_push_commands(
+    get_pipe: GetPipeline,
+    jobs: Collection[Job],
+    shards: Sequence[QueueShard],
+    levels: int,
+    start: int,
+    unique_key: str,
+) -> None:
+    """
+    Add the commands to push the given jobs onto the lists of the given shards
+    (see `group_for_enqueue`) to the pipelines for the shards' servers.
+
+    Unique jobs are pushed by `add_push_unique_command`, whose set of the
+    identities of waiting jobs at the given key is on the server of the first
+    shard, so they're only spread over the shards on that server.
+    """
+    for (client, key), run in group_for_enqueue(
+        [job for job in jobs if not job.unique],
+        shards,
+        levels,
+        start,
+    ):
+        get_pipe(client).lpush(key, *(job.to_bytes() for job in run))
+
+    unique_jobs = [job for job in jobs if job.unique]
+    if not unique_jobs:
+        return
+
+    unique_shards = [x for x in shards if x.client is shards[0].client]
+    for (client, key), run in group_for_enqueue(
+        unique_jobs,
+        unique_shards,
+        levels,
+        start,
+    ):
+        pipe = get_pipe(client)
+        for job in run:
+            add_push_unique_command(pipe, unique_key, key, job)
+
+
+def add_push_unique_command(
+    pipe: AnyPipeline,
+    unique_key: str,
+    key: str,
+    job: Job,
+    command: str = 'LPUSH',
+) -> None:
+    """
+    Add the command to push the given unique job onto the list at the given key
+    using the given command, unless an identical job is already waiting.
+
+    The identities of waiting unique jobs are kept in the set at the given
+    unique key, which must be on the same server as the list. A job's identity
+    is added and it's pushed in a single script, so that checking for and
+    pushing the job are atomic. Any offloaded arguments of a job which isn't
+    pushed are deleted.
+    """
+    keys = [unique_key, key]
+    if job.arguments_ref is not None:
+        keys.append(job.arguments_ref)
+
+    pipe.eval(PUSH_UNIQUE_SCRIPT, len(keys), *keys, job.identity, job.to_bytes(), command)
+
+
+def release_unique_jobs(
+    client: 'redis.StrictRedis[bytes]',
+    key: str,
+    jobs: Iterable[Job],
+) -> None:
+    """
+    Release the identities of the given just dequeued jobs which are unique
+    from the set at the given key, so that identical jobs can be enqueued
+    again.
+    """
+    identities = [job.identity for job in jobs if job.unique]
+    if identities:
+        client.srem(key, *identities)
+
+
+async def arelease_unique_jobs(
+    client: 'redis.asyncio.StrictRedis[bytes]',
+    key: str,
+    jobs: Iterable[Job],
+) -> None:
+    """
+    Async counterpart of `release_unique_jobs`.
+    """
+    identities = [job.identity for job in jobs if job.unique]
+    if identities:
+        await client.srem(key, *identities)
+
+
+def offload_large_arguments(
+    jobs: Iterable[Job],
+    prefix: str,
+) -> Tuple[List[Job], List[Tuple[str, bytes]]]:
+    """
+    Move the arguments of those of the given jobs which are at least as large
+    as the configured threshold out of the jobs, to be stored separately under
+    keys starting with the given prefix.
+
+    Returns a tuple of (jobs to push, list of (key, data) to store).
+    """
+    threshold = app_settings.OFFLOAD_THRESHOLD
+    if threshold is None:
+        return list(jobs), []
+
+    to_push = []
+    offloaded = []
+    for job in jobs:
+        if job.arguments_ref is not None or len(job.to_bytes()) < threshold:
+            to_push.append(job)
+            continue
+
+        ref = '{}:{}'.format(prefix, uuid.uuid4().hex)
+        data = get_serializer().dumps_arguments(job.args, job.kwargs)
+        offloaded.append((ref, compress(data)))
+        to_push.append(job.with_arguments_ref(ref))
+
+    return to_push, offloaded
+
+
+def load_offloaded_arguments(
+    client: 'redis.StrictRedis[bytes]',
+    ref: str,
+) -> Tuple[Any, Any]:
+    return decode_offloaded_arguments(ref, client.get(ref))
+
+
+def decode_offloaded_arguments(ref: str, data: Optional[bytes]) -> Tuple[Any, Any]:
+    if data is None:
+        raise ValueError("Job arguments missing from {}".format(ref))
+
+    data = decompress(data)
+    return get_serializer_for(data).loads_arguments(data)
+
+
+def defer_offloaded_arguments(
+    client: 'redis.StrictRedis[bytes]',
+    jobs: Iterable[Job],
+) -> None:
+    """
+    Arrange for the arguments of those of the given jobs which were offloaded
+    to be fetched when they are used, usually when the job is run.
+    """
+    for job in jobs:
+        if job.arguments_ref is not None:
+            job.defer_arguments(partial(load_offloaded_arguments, client, job.arguments_ref))
+
+
+async def afetch_offloaded_arguments(
+    client: 'redis.asyncio.StrictRedis[bytes]',
+    jobs: Iterable[Job],
+) -> None:
+    """
+    Fetch the arguments of those of the given jobs which were offloaded, for
+    use within an event loop, which fetching them lazily would block. They're
+    still only decoded when they are used.
+    """
+    jobs = [job for job in jobs if job.arguments_ref is not None]
+    if not jobs:
+        return
+
+    refs = get_arguments_refs(jobs)
+    for job, ref, data in zip(jobs, refs, await client.mget(refs)):
+        job.defer_arguments(partial(decode_offloaded_arguments, ref, data))
+
+
+def get_arguments_refs(jobs: Iterable[Job]) -> List[str]:
+    return [job.arguments_ref for job in jobs if job.arguments_ref is not None]
+
+
+def delete_matching(client: 'redis.StrictRedis[bytes]', pattern: str) -> None:
+    keys = list(client.scan_iter(match=pattern, count=CHUNK_SIZE))
+    for start in range(0, len(keys), CHUNK_SIZE):
+        client.delete(*keys[start:start + CHUNK_SIZE])
+
+
+class PauseStateCache:
+    """
+    A process-local cache of whether queues are paused, for use by workers.
+
+    The backends publish a message on a channel named after a queue's pause key
+    whenever they pause or resume it, which invalidates the cached state. If the
+    server has keyspace notifications enabled then changes to the pause key from
+    elsewhere (including it expiring) do so too. Cached state is otherwise
+    trusted until the pause expires or for at most ``max_age`` seconds, so that
+    missed messages (for example while reconnecting) are eventually noticed.
+
+    Waiting for a queue to be resumed blocks on the subscription, so costs no
+    redis commands and returns as soon as the queue is resumed.
+    """
+
+    def __init__(self, client: 'redis.StrictRedis[bytes]', max_age: float) -> None:
+        self.client = client
+        self.max_age = max_age
+
+        self._pubsub: Optional[redis.client.PubSub] = None
+        # Mapping of subscribed channels to the pause keys they relate to.
+        self._channels: Dict[bytes, str] = {}
+        # Mapping of pause keys to a tuple of (paused until, valid until), as
+        # `time.monotonic` values; paused until is None if the queue is not
+        # paused.
+        self._states: Dict[str, Tuple[Optional[float], float]] = {}
+
+    def is_paused(self, pause_key: str) -> bool:
+        self._handle_messages(timeout=0)
+
+        now = time.monotonic()
+
+        state = self._states.get(pause_key)
+        if state is None or now >= state[1]:
+            state = self._load(pause_key, now)
+
+        paused_until, _ = state
+        return paused_until is not None and now < paused_until
+
+    def wait(self, pause_key: str, timeout: float) -> None:
+        """
+        Block until the queue with the given pause key may have been resumed,
+        or for at most the given timeout.
+        """
+        end = time.monotonic() + timeout
+
+        while self.is_paused(pause_key):
+            paused_until, valid_until = self._states[pause_key]
+            assert paused_until is not None
+
+            remaining = min(end, paused_until, valid_until) - time.monotonic()
+            if remaining <= 0:
+                return
+
+            self._handle_messages(timeout=remaining)
+
+    async def async_wait(self, pause_key: str, timeout: float) -> None:
+        """
+        Async counterpart of `wait`, which polls the cached state (so notices
+        the queue being resumed within `ASYNC_POLL_INTERVAL`) rather than
+        blocking on the subscription.
+        """
+        end = time.monotonic() + timeout
+
+        while await self.async_is_paused(pause_key):
+            paused_until, valid_until = self._states[pause_key]
+            assert paused_until is not None
+
+            remaining = min(end, paused_until, valid_until) - time.monotonic()
+            if remaining <= 0:
+                return
+
+            await asyncio.sleep(min(remaining, ASYNC_POLL_INTERVAL))
+
+    async def async_is_paused(self, pause_key: str) -> bool:
+        """
+        Async counterpart of `is_paused`. The cache uses a synchronous client,
+        so is checked in the event loop's default executor so as not to block
+        the loop when it needs to read from redis.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.is_paused, pause_key)
+
+    def _load(self, pause_key: str, now: float) -> Tuple[Optional[float], float]:
+        # Subscribe before reading the state so that we can't miss a change.
+        self._subscribe(pause_key)
+
+        ttl = self.client.pttl(pause_key)
+        if ttl == -2:
+            # No such key
+            paused_until = None
+        elif ttl == -1:
+            # No expiry
+            paused_until = float('inf')
+        else:
+            paused_until = now + ttl / 1000
+
+        state = self._states[pause_key] = (paused_until, now + self.max_age)
+        return state
+
+    def _subscribe(self, pause_key: str) -> None:
+        if pause_key in self._channels.values():
+            return
+
+        if self._pubsub is None:
+            self._pubsub = self.client.pubsub()
+
+        database = self.client.connection_pool.connection_kwargs.get('db', 0)
+        channels = (
+            pause_key.encode(),
+            '__keyspace@{}__:{}'.format(database, pause_key).encode(),
+        )
+
+        self._pubsub.subscribe(*channels)
+        for channel in channels:
+            self._channels[channel] = pause_key
+
+    def _handle_messages(self, timeout: float) -> None:
+        if self._pubsub is None:
+            return
+
+        message = self._pubsub.get_message(timeout=timeout)
+        while message is not None:
+            if message['type'] == 'message':
+                self._states.pop(self._channels[message['channel']], None)
+
+            message = self._pubsub.get_message(timeout=0)
+
+
+class RedisPauseMixin:
+    """
+    Pausing and resuming of queues for the redis-based backends, which mark a
+    queue as paused by setting its pause key (see `_pause_key`) with an expiry.
+
+    Workers check the pause state through a `PauseStateCache` shared by all the
+    queues on the same server, see `_wait_if_paused`.
+    """
+
+    _clients: Dict[QueueName, 'redis.StrictRedis[bytes]']
+    # Keyed by the id of the client.
+    _pause_states: Dict[int, PauseStateCache]
+
+    def pause(self, queue: QueueName, until: datetime.datetime) -> None:
+        """
+        Pause the given queue by setting a pause marker.
+        """
+
+        pause_key = self._pause_key(queue)
+
+        now = datetime.datetime.now(datetime.timezone.utc)
+        delta = until - now
+
+        pipe = self._client(queue).pipeline(transaction=True)
+        pipe.setex(
+            pause_key,
+            time=int(delta.total_seconds()),
+            # Store the value for debugging, we rely on setex behaviour for
+            # implementation.
+            value=until.isoformat(' '),
+        )
+        # Tell any waiting workers, see `PauseStateCache`.
+        pipe.publish(pause_key, 'paused')
+        pipe.execute()
+
+    def resume(self, queue: QueueName) -> None:
+        """
+        Resume the given queue by deleting the pause marker (if present).
+        """
+        pause_key = self._pause_key(queue)
+
+        pipe = self._client(queue).pipeline(transaction=True)
+        pipe.delete(pause_key)
+        # Tell any waiting workers, see `PauseStateCache`.
+        pipe.publish(pause_key, 'resumed')
+        pipe.execute()
+
+    def is_paused(self, queue: QueueName) -> bool:
+        return bool(self._client(queue).exists(self._pause_key(queue)))
+
+    def _client(self, queue: QueueName) -> 'redis.StrictRedis[bytes]':
+        try:
+            return self._clients[queue]
+        except KeyError:
+            client = self._clients[queue] = get_redis_client(queue)
+            return client
+
+    def _pause_state(self, queue: QueueName) -> PauseStateCache:
+        client = self._client(queue)
+        try:
+            return self._pause_states[id(client)]
+        except KeyError:
+            pause_state = self._pause_states[id(client)] = PauseStateCache(
+                client,
+                max_age=app_settings.PAUSE_STATE_MAX_AGE,
+            )
+            return pause_state
+
+    def _wait_if_paused(self, queue: QueueName, timeout: int) -> bool:
+        """
+        If the given queue is paused then block until it is resumed, or for at
+        most the given timeout. Returns whether the queue was paused.
+
+        Unlike `is_paused`, this uses a cached pause state which is updated by
+        push notifications, so costs nothing while the queue is paused and
+        usually doesn't need a round trip to redis when it isn't.
+        """
+        pause_key = self._pause_key(queue)
+        pause_state = self._pause_state(queue)
+
+        if not pause_state.is_paused(pause_key):
+            return False
+
+        pause_state.wait(pause_key, timeout)
+        return True
+
+    async def _await_if_paused(self, queue: QueueName, timeout: int) -> bool:
+        """
+        Async counterpart of `_wait_if_paused`.
+        """
+        pause_key = self._pause_key(queue)
+        pause_state = self._pause_state(queue)
+
+        if not await pause_state.async_is_paused(pause_key):
+            return False
+
+        await pause_state.async_wait(pause_key, timeout)
+        return True
+
+    def _pause_key(self, queue: QueueName) -> str:
+        raise NotImplementedError()
+
+
+def deduplicate_list(
+    client: 'redis.StrictRedis[bytes]',
+    key: str,
+    *,
+    progress_logger: ProgressLogger = NULL_PROGRESS_LOGGER,
+    chunk_size: int = CHUNK_SIZE,
+    seen_identities: Optional[Set[bytes]] = None,
+    removed_refs: Optional[List[str]] = None
+) -> Tuple[int, int]:
+    """
+    Deduplicate the queue list stored at the given key, in a single pass.
+
+    Jobs are compared by ``Job.identity``, keeping the oldest
+    of each set of equivalent jobs in its original position.
+
+    The queue is first atomically moved aside to a staging list, which is then
+    read in chunks starting from the oldest job. The surviving jobs are pushed
+    back onto the tail of the queue (so that they remain ahead of any jobs
+    enqueued meanwhile) at the same time as the staging list is deleted. Until
+    then workers (and anything measuring the length of the queue) will only see
+    newly enqueued jobs, and the jobs being kept are held in memory.
+
+    If a previous deduplication was interrupted, its staging list is processed
+    instead of the queue.
+
+    Passing the same set of ``seen_identities`` to successive calls removes
+    jobs which duplicate those in previously deduplicated lists, e.g. for the
+    shards of a queue.
+
+    The references to the offloaded arguments of removed jobs are appended to
+    ``removed_refs`` if given, so that the caller can delete them.
+
+    Returns a tuple of (original_size, new_size) of the deduplicated jobs.
+    """
+
+    staging_key = key + ':deduplicating'
+
+    try:
+        # Note: only renames if the staging list doesn't already exist.
+        if not client.renamenx(key, staging_key):
+            progress_logger.info("Resuming interrupted deduplication")
+    except redis.ResponseError:
+        # The queue doesn't exist, though there may still be a staging list
+        # left over from an interrupted deduplication.
+        pass
+
+    original_size = client.llen(staging_key)
+
+    if not original_size:
+        return 0, 0
+
+    if seen_identities is None:
+        seen_identities = set()
+
+    # Jobs to keep, ordered from oldest to newest.
+    kept: List[bytes] = []
+
+    progress_logger.info("Collecting jobs")
+
+    # Jobs are pushed onto the head of the list, so we work backwards from the
+    # tail in order to see the oldest of each job first.
+    for end in progress_logger.progress(range(-1, -original_size - 1, -chunk_size)):
+        chunk = client.lrange(staging_key, end - chunk_size + 1, end)
+
+        for raw_data in reversed(chunk):
+            job = Job.from_bytes(raw_data)
+            job_identity = job.identity
+
+            if job_identity not in seen_identities:
+                seen_identities.add(job_identity)
+                kept.append(raw_data)
+            elif removed_refs is not None and job.arguments_ref is not None:
+                removed_refs.append(job.arguments_ref)
+
+    progress_logger.info("Restoring deduplicated jobs")
+
+    # RPUSH from newest to oldest, so that the oldest ends up at the tail.
+    kept.reverse()
+
+    pipe = client.pipeline(transaction=True)
+    for start in range(0, len(kept), chunk_size):
+        pipe.rpush(key, *kept[start:start + chunk_size])
+    pipe.delete(staging_key)
+    pipe.execute()
+
+    return original_size, len(kept)
@@ -1,16 +1,58 @@
-import datetime
-from typing import Dict, List, Tuple, TypeVar, Optional, Collection
+import asyncio
+import itertools
+from typing import (
+    Set,
+    Dict,
+    List,
+    Tuple,
+    Mapping,
+    TypeVar,
+    Optional,
+    Sequence,
+    Collection,
+)
 
 import redis
+import redis.asyncio
 
 from ..job import Job
 from .base import (
     BackendWithClear,
+    BackendWithPriorities,
     BackendWithDeduplicate,
     BackendWithPauseResume,
+    BackendWithQueueGroups,
+    BackendWithWorkerRecovery,
 )
 from ..types import QueueName, WorkerNumber
-from ..utils import block_for_time, get_worker_numbers
+from ..utils import get_queue_group, get_worker_numbers
+from .redis_utils import (
+    QueueShard,
+    AnyPipeline,
+    get_priority,
+    total_length,
+    get_all_lists,
+    delete_matching,
+    PauseStateCache,
+    RedisPauseMixin,
+    deduplicate_list,
+    get_queue_shards,
+    get_redis_client,
+    get_worker_lists,
+    add_push_commands,
+    get_worker_shards,
+    get_arguments_refs,
+    get_priority_lists,
+    get_priority_levels,
+    lengths_by_priority,
+    release_unique_jobs,
+    arelease_unique_jobs,
+    get_async_redis_client,
+    add_push_unique_command,
+    offload_large_arguments,
+    defer_offloaded_arguments,
+    afetch_offloaded_arguments,
+)
 from ..app_settings import app_settings
 from ..progress_logger import ProgressLogger, NULL_PROGRESS_LOGGER
 
@@ -18,8 +60,23 @@ from ..progress_logger import ProgressLogger, NULL_PROGRESS_LOGGER
 # that in progress_logger.py.
 T = TypeVar('T')
 
+# The number of keys to ask redis to look at in each iteration of a SCAN.
+SCAN_COUNT = 1000
+
+# The maximum number of outstanding wake ups for the workers of a queue with
+# several lists, see `_move_job`.
+MAX_WAKE_UPS = 100
+
 
-class ReliableRedisBackend(BackendWithClear, BackendWithDeduplicate, BackendWithPauseResume):
+class ReliableRedisBackend(
+    RedisPauseMixin,
+    BackendWithClear,
+    BackendWithDeduplicate,
+    BackendWithPauseResume,
+    BackendWithPriorities,
+    BackendWithQueueGroups,
+    BackendWithWorkerRecovery,
+):
     """
     This backend manages a per-queue-per-worker 'processing' queue. E.g. if we
     had a queue called 'django_lightweight_queue:things', and two workers, we
@@ -42,30 +99,87 @@ class ReliableRedisBackend(BackendWithClear, BackendWithDeduplicate, BackendWith
     """
 
     def __init__(self) -> None:
-        self.client = redis.StrictRedis(
-            host=app_settings.REDIS_HOST,
-            port=app_settings.REDIS_PORT,
-            password=app_settings.REDIS_PASSWORD,
-            db=app_settings.REDIS_DATABASE,
-        )
+        # Clients are shared by all the backends in the process which talk to
+        # the same server; this one is for the default server.
+        self.client = get_redis_client()
+        self._clients = {}  # type: Dict[QueueName, redis.StrictRedis[bytes]]
+        # Keyed by the id of the client.
+        self._pause_states = {}  # type: Dict[int, PauseStateCache]
+        self._queue_shards = {}  # type: Dict[QueueName, List[QueueShard]]
+        self._enqueue_counter = itertools.count()
 
     def startup(self, queue: QueueName) -> None:
-        main_queue_key = self._key(queue)
+        self.bulk_startup([queue])
 
-        pattern = self._prefix_key(
-            'django_lightweight_queue:{}:processing:*'.format(queue),
-        )
+    def bulk_startup(self, queues: Collection[QueueName]) -> None:
+        # Queues may be spread across several redis servers.
+        queues_by_client = {}  # type: Dict[int, Tuple[redis.StrictRedis[bytes], Set[QueueName]]]
+        for queue in queues:
+            client = self._client(queue)
+            _, client_queues = queues_by_client.setdefault(id(client), (client, set()))
+            client_queues.add(queue)
+
+        for client, client_queues in queues_by_client.values():
+            self._startup_on_client(client, client_queues)
+
+    def _startup_on_client(
+        self,
+        client: 'redis.StrictRedis[bytes]',
+        queues: Set[QueueName],
+    ) -> None:
+        # Find the processing queues for all the given queues in a single
+        # incremental pass over the keyspace. Unlike KEYS, SCAN doesn't block
+        # the redis server while it runs, which matters when the server holds
+        # a large number of keys.
+        key_prefix = self._prefix_key('django_lightweight_queue:')
+        pattern = key_prefix + '*:processing:*'
+
+        current_processing_queue_keys: Dict[QueueName, Set[bytes]] = {}
+        for key in client.scan_iter(match=pattern, count=SCAN_COUNT):
+            queue_and_worker = key.decode()[len(key_prefix):]
+            queue = QueueName(queue_and_worker.rsplit(':processing:', 1)[0])
+            if queue in queues:
+                current_processing_queue_keys.setdefault(queue, set()).add(key)
 
         # Work out which processing queues no longer have associated workers.
         # Without this the startup process can end up racing against workers on
         # other machines which are validly re-populating their processing queues
         # as they work on jobs.
-        current_processing_queue_keys = set(self.client.keys(pattern))
-        expected_processing_queue_keys = set(
-            self._processing_key(queue, worker_number).encode()
-            for worker_number in get_worker_numbers(queue)
+        processing_queue_keys: Dict[QueueName, List[bytes]] = {}
+        for queue, current_keys in current_processing_queue_keys.items():
+            expected_keys = set(
+                self._processing_key(queue, worker_number).encode()
+                for worker_number in get_worker_numbers(queue)
+            )
+            orphaned_keys = current_keys - expected_keys
+            if orphaned_keys:
+                processing_queue_keys[queue] = sorted(orphaned_keys)
+
+        self._restore_processing_jobs(client, processing_queue_keys)
+
+    def recover_worker_jobs(self, queue: QueueName, worker_num: WorkerNumber) -> None:
+        self._restore_processing_jobs(
+            self._client(queue),
+            {queue: [self._processing_key(queue, worker_num).encode()]},
         )
-        processing_queue_keys = current_processing_queue_keys - expected_processing_queue_keys
+
+    def _restore_processing_jobs(
+        self,
+        client: 'redis.StrictRedis[bytes]',
+        processing_queue_keys: Dict[QueueName, List[bytes]],
+    ) -> None:
+        """
+        Move the jobs in the given processing queues back onto the fronts of
+        their queues, atomically.
+        """
+        if not processing_queue_keys:
+            return
+
+        all_keys = [
+            key
+            for keys in processing_queue_keys.values()
+            for key in keys
+        ]
 
         def move_processing_jobs_to_main(pipe: 'redis.StrictRedis[bytes]') -> None:
             # Note: the `pipe` argument here is actually a Pipeline (strictly
@@ -75,84 +189,511 @@ class ReliableRedisBackend(BackendWithClear, BackendWithDeduplicate, BackendWith
             # to get the type checking to *mostly* work. See typeshed issue
             # https://github.com/python/typeshed/issues/6028 for more details.
 
-            # Collect all the data we need to add, before adding the data back
-            # to the main queue of and clearing the processing queues
-            # atomically, so if this crashes, we don't lose jobs
-            all_data: List[bytes] = []
-            for key in processing_queue_keys:
-                all_data.extend(pipe.lrange(key, 0, -1))
-
-            if all_data or processing_queue_keys:
-                pipe.multi()  # type: ignore[attr-defined] # see explanation above
-
-            # NB we RPUSH, which means these jobs will get processed next
-            if all_data:
-                pipe.rpush(main_queue_key, *all_data)
-
-            if processing_queue_keys:
-                pipe.delete(*processing_queue_keys)
-
-        # Will run the above function, WATCH-ing the processing_queue_keys. If
+            # Collect all the data we need to add (in a single round trip),
+            # before adding the data back to the main queues and clearing the
+            # processing queues atomically, so if this crashes, we don't lose
+            # jobs. The keys are WATCH-ed from before this read.
+            reads = client.pipeline(transaction=False)
+            for key in all_keys:
+                reads.lrange(key, 0, -1)
+            all_data = iter(reads.execute())
+
+            pipe.multi()  # type: ignore[attr-defined] # see explanation above
+
+            for queue, keys in processing_queue_keys.items():
+                queue_data: List[bytes] = []
+                for _ in keys:
+                    queue_data.extend(next(all_data))
+
+                # NB we RPUSH, which means these jobs will get processed next
+                for priority_key, key_data in self._group_by_priority_key(queue, queue_data).items():
+                    jobs = [Job.from_bytes(data) for data in key_data]
+                    if not any(job.unique for job in jobs):
+                        pipe.rpush(priority_key, *key_data)
+                        continue
+
+                    # Unique jobs released their identities when they were
+                    # dequeued, so are pushed only if no identical job has been
+                    # enqueued since. See `add_push_unique_command`.
+                    for job in jobs:
+                        if job.unique:
+                            add_push_unique_command(
+                                pipe,  # type: ignore[arg-type] # see explanation above
+                                self._unique_key(queue),
+                                priority_key,
+                                job,
+                                command='RPUSH',
+                            )
+                        else:
+                            pipe.rpush(priority_key, job.to_bytes())
+
+            pipe.delete(*all_keys)
+
+        # Will run the above function, WATCH-ing the processing queue keys. If
         # any of them change prior to transaction execution, it will abort and
         # retry.
-        self.client.transaction(
+        client.transaction(
             move_processing_jobs_to_main,
-            *processing_queue_keys,
+            *all_keys,
         )
 
     def enqueue(self, job: Job, queue: QueueName) -> None:
         return self.bulk_enqueue([job], queue)
 
     def bulk_enqueue(self, jobs: Collection[Job], queue: QueueName) -> None:
-        self.client.lpush(
-            self._key(queue),
-            *(job.to_json().encode('utf-8') for job in jobs),
+        self.bulk_enqueue_many({queue: jobs})
+
+    def bulk_enqueue_many(self, jobs_by_queue: Mapping[QueueName, Collection[Job]]) -> None:
+        # A single transaction for each server, shared by all the queues.
+        pipes = {}  # type: Dict[int, redis.client.Pipeline[bytes]]
+        for queue, jobs in jobs_by_queue.items():
+            client = self._client(queue)
+            try:
+                pipe = pipes[id(client)]
+            except KeyError:
+                pipe = pipes[id(client)] = client.pipeline(transaction=True)
+
+            self._add_enqueue_commands(pipe, jobs, queue)
+
+        for pipe in pipes.values():
+            pipe.execute()
+
+    async def aenqueue(self, job: Job, queue: QueueName) -> None:
+        await self.abulk_enqueue_many({queue: [job]})
+
+    async def abulk_enqueue_many(
+        self,
+        jobs_by_queue: Mapping[QueueName, Collection[Job]],
+    ) -> None:
+        # As `bulk_enqueue_many`, using asyncio clients.
+        pipes = {}  # type: Dict[int, redis.asyncio.client.Pipeline[bytes]]
+        for queue, jobs in jobs_by_queue.items():
+            client = get_async_redis_client(queue)
+            try:
+                pipe = pipes[id(client)]
+            except KeyError:
+                pipe = pipes[id(client)] = client.pipeline(transaction=True)
+
+            self._add_enqueue_commands(pipe, jobs, queue)
+
+        await asyncio.gather(*(pipe.execute() for pipe in pipes.values()))
+
+    def _add_enqueue_commands(
+        self,
+        pipe: AnyPipeline,
+        jobs: Collection[Job],
+        queue: QueueName,
+    ) -> None:
+        shards = self._shards(queue)
+
+        # Store any offloaded arguments ahead of the jobs which refer to them.
+        to_push, offloaded = offload_large_arguments(jobs, self._arguments_key(queue))
+        for ref, arguments in offloaded:
+            pipe.set(ref, arguments)
+
+        # Spread the jobs over the queue's shards, starting with the next shard
+        # each time. The shards are all on the same server.
+        add_push_commands(
+            lambda client: pipe,
+            to_push,
+            shards,
+            get_priority_levels(queue),
+            start=next(self._enqueue_counter) % len(shards),
+            unique_key=self._unique_key(queue),
         )
 
+        # Wake up workers waiting for jobs in any list, see `_move_job` and
+        # `dequeue_any`.
+        if self._uses_wake_ups(queue) and jobs:
+            wake_up_key = self._wake_up_key(queue)
+            pipe.lpush(wake_up_key, *([b''] * min(len(jobs), MAX_WAKE_UPS)))
+            pipe.ltrim(wake_up_key, 0, MAX_WAKE_UPS - 1)
+
     def dequeue(self, queue: QueueName, worker_number: WorkerNumber, timeout: int) -> Optional[Job]:
-        main_queue_key = self._key(queue)
+        client = self._client(queue)
         processing_queue_key = self._processing_key(queue, worker_number)
 
-        if self.is_paused(queue):
-            # Block for a while to avoid constant polling ...
-            block_for_time(
-                lambda: self.is_paused(queue),
-                timeout=datetime.timedelta(seconds=timeout),
-            )
-            # ... but always indicate that we did no work
+        if self._wait_if_paused(queue, timeout):
+            # Always indicate that we did no work
             return None
 
-        # Get any jobs off our 'processing' queue - but do not block doing so -
+        # Get any job off our 'processing' queue - but do not block doing so -
         # this is to catch the fact there may be a job already in our
         # processing queue if this worker crashed and has just been restarted.
         # NB different purpose than 'startup' method above.
-        data = self.client.lindex(processing_queue_key, -1)
+        data = client.lindex(processing_queue_key, -1)
         if data:
-            return Job.from_json(data.decode('utf-8'))
+            return self._read_jobs(queue, [data])[0]
 
         # Otherwise, block trying to move a job from the main queue into our
         # processing queue, and process it.
-        data = self.client.brpoplpush(
-            main_queue_key,
-            processing_queue_key,
-            timeout,
-        )
+        data = self._move_job(queue, worker_number, timeout)
         if data:
-            return Job.from_json(data.decode('utf-8'))
+            return self._release_unique_jobs(queue, self._read_jobs(queue, [data]))[0]
 
         return None
 
+    def bulk_dequeue(
+        self,
+        queue: QueueName,
+        worker_number: WorkerNumber,
+        timeout: int,
+        count: int,
+        *,
+        recover: bool = True
+    ) -> List[Job]:
+        client = self._client(queue)
+        processing_queue_key = self._processing_key(queue, worker_number)
+
+        if self._wait_if_paused(queue, timeout):
+            # Always indicate that we did no work
+            return []
+
+        # As in `dequeue`, but picking up all the jobs which may be left in our
+        # processing queue from a previous batch, unless they may be jobs which
+        # are still running.
+        if recover:
+            existing = client.lrange(processing_queue_key, 0, -1)
+            if existing:
+                # The oldest job is at the tail.
+                return self._read_jobs(queue, existing[::-1])
+
+        # Otherwise atomically move up to `count` jobs from our shard of the
+        # main queue into our processing queue, without blocking, taking them
+        # from its lists in priority order.
+        lists = self._own_lists(queue, worker_number)
+        if len(lists) > 1:
+            pipe = client.pipeline(transaction=False)
+            for key in lists:
+                pipe.llen(key)
+            lengths = pipe.execute()
+        else:
+            lengths = [count]
+
+        pipe = client.pipeline(transaction=True)
+        self._add_move_commands(pipe, lists, lengths, count, processing_queue_key)
+        moved = [x for x in pipe.execute() if x]
+
+        if not moved:
+            # Otherwise block waiting for a single job.
+            data = self._move_job(queue, worker_number, timeout)
+            if not data:
+                return []
+
+            moved = [data]
+
+        return self._release_unique_jobs(queue, self._read_jobs(queue, moved))
+
+    async def abulk_dequeue(
+        self,
+        queue: QueueName,
+        worker_number: WorkerNumber,
+        timeout: int,
+        count: int,
+        *,
+        recover: bool = True
+    ) -> List[Job]:
+        # As `bulk_dequeue`, using asyncio clients.
+        client = get_async_redis_client(queue)
+        processing_queue_key = self._processing_key(queue, worker_number)
+
+        if await self._await_if_paused(queue, timeout):
+            # Always indicate that we did no work
+            return []
+
+        if recover:
+            existing = await client.lrange(processing_queue_key, 0, -1)
+            if existing:
+                return await self._aread_jobs(queue, existing[::-1])
+
+        lists = self._own_lists(queue, worker_number)
+        if len(lists) > 1:
+            pipe = client.pipeline(transaction=False)
+            for key in lists:
+                pipe.llen(key)
+            lengths = await pipe.execute()
+        else:
+            lengths = [count]
+
+        pipe = client.pipeline(transaction=True)
+        self._add_move_commands(pipe, lists, lengths, count, processing_queue_key)
+        moved = [x for x in await pipe.execute() if x]
+
+        if not moved:
+            # Otherwise block waiting for a single job.
+            data = await self._amove_job(queue, worker_number, timeout)
+            if not data:
+                return []
+
+            moved = [data]
+
+        return await self._arelease_unique_jobs(queue, await self._aread_jobs(queue, moved))
+
+    def dequeue_any(
+        self,
+        queues: Sequence[QueueName],
+        worker_number: WorkerNumber,
+        timeout: int,
+    ) -> Optional[Tuple[QueueName, Job]]:
+        unpaused = [x for x in queues if not self._pause_state(x).is_paused(self._pause_key(x))]
+        if not unpaused:
+            self._wait_if_paused(queues[0], timeout)
+            # Always indicate that we did no work
+            return None
+
+        # Jobs are moved atomically into the processing queues, and we wait
+        # for jobs in any of the queues, both of which can only happen within
+        # a single redis server.
+        client = self._client(unpaused[0])
+        if any(self._client(x) is not client for x in unpaused):
+            raise ValueError(
+                "The queues in a group must all be on the same redis server to "
+                "use the reliable redis backend.",
+            )
+
+        # As in `dequeue`, pick up any job left in our processing queues.
+        pipe = client.pipeline(transaction=False)
+        for queue in unpaused:
+            pipe.lindex(self._processing_key(queue, worker_number), -1)
+        for queue, data in zip(unpaused, pipe.execute()):
+            if data:
+                return queue, self._read_jobs(queue, [data])[0]
+
+        # The lists of all the queues, in the order to take jobs from them.
+        lists = [
+            (queue, priority_list)
+            for queue in unpaused
+            for priority_list in get_worker_lists(queue, self._shards(queue), worker_number)
+        ]
+
+        moved = self._move_first_available_job_of(client, lists, worker_number)
+        if moved is None:
+            # Wait to be woken up by the next enqueue to any of the queues, see
+            # `_move_job`.
+            wake_up_keys = [self._wake_up_key(x) for x in unpaused]
+            if client.brpop(wake_up_keys, timeout) is None:
+                return None
+
+            moved = self._move_first_available_job_of(client, lists, worker_number)
+            if moved is None:
+                return None
+
+        queue, data = moved
+        return queue, self._release_unique_jobs(queue, self._read_jobs(queue, [data]))[0]
+
+    def _move_first_available_job_of(
+        self,
+        client: 'redis.StrictRedis[bytes]',
+        lists: List[Tuple[QueueName, QueueShard]],
+        worker_number: WorkerNumber,
+    ) -> Optional[Tuple[QueueName, bytes]]:
+        # As `_move_first_available_job`, for the lists of several queues.
+        pipe = client.pipeline(transaction=False)
+        for _, priority_list in lists:
+            pipe.llen(priority_list.key)
+
+        for (queue, priority_list), length in zip(lists, pipe.execute()):
+            if length:
+                data = client.rpoplpush(
+                    priority_list.key,
+                    self._processing_key(queue, worker_number),
+                )
+                if data:
+                    return queue, data
+
+        return None
+
+    def _own_lists(self, queue: QueueName, worker_number: WorkerNumber) -> List[str]:
+        """
+        The keys of the lists of the given worker's own shard of the queue, in
+        priority order.
+        """
+        own_shard = get_worker_shards(self._shards(queue), worker_number)[:1]
+        own_keys = {
+            priority_list.key
+            for priority in range(get_priority_levels(queue))
+            for priority_list in get_priority_lists(own_shard, priority)
+        }
+        return [
+            priority_list.key
+            for priority_list in get_worker_lists(queue, self._shards(queue), worker_number)
+            if priority_list.key in own_keys
+        ]
+
+    def _add_move_commands(
+        self,
+        pipe: AnyPipeline,
+        lists: List[str],
+        lengths: List[int],
+        count: int,
+        processing_queue_key: str,
+    ) -> None:
+        # Each job is pushed onto the head of the processing queue, so the
+        # first moved (and thus first to be run) ends up at the tail.
+        remaining = count
+        for key, length in zip(lists, lengths):
+            for _ in range(min(length, remaining)):
+                pipe.rpoplpush(key, processing_queue_key)
+            remaining -= min(length, remaining)
+
+    def _move_job(
+        self,
+        queue: QueueName,
+        worker_number: WorkerNumber,
+        timeout: int,
+    ) -> Optional[bytes]:
+        """
+        Move a single job into our processing queue, preferring the highest
+        priority jobs and within that our own shard of the main queue, taking
+        jobs from the other shards when that is empty. Blocks for up to
+        `timeout` seconds if there are no jobs.
+        """
+        client = self._client(queue)
+        processing_queue_key = self._processing_key(queue, worker_number)
+        lists = get_worker_lists(queue, self._shards(queue), worker_number)
+
+        if len(lists) == 1:
+            return client.brpoplpush(lists[0].key, processing_queue_key, timeout)
+
+        data = self._move_first_available_job(lists, processing_queue_key)
+        if data:
+            return data
+
+        # BRPOPLPUSH can only wait on a single list, so instead we wait to be
+        # woken up by the next enqueue (or for jobs which are left behind by
+        # another worker, by an earlier one).
+        if client.brpop(self._wake_up_key(queue), timeout) is None:
+            return None
+
+        return self._move_first_available_job(lists, processing_queue_key)
+
+    async def _amove_job(
+        self,
+        queue: QueueName,
+        worker_number: WorkerNumber,
+        timeout: int,
+    ) -> Optional[bytes]:
+        # As `_move_job`, using asyncio clients.
+        client = get_async_redis_client(queue)
+        processing_queue_key = self._processing_key(queue, worker_number)
+        keys = [x.key for x in get_worker_lists(queue, self._shards(queue), worker_number)]
+
+        if len(keys) == 1:
+            return await client.brpoplpush(keys[0], processing_queue_key, timeout)
+
+        data = await self._amove_first_available_job(client, keys, processing_queue_key)
+        if data:
+            return data
+
+        if await client.brpop(self._wake_up_key(queue), timeout) is None:
+            return None
+
+        return await self._amove_first_available_job(client, keys, processing_queue_key)
+
+    async def _amove_first_available_job(
+        self,
+        client: 'redis.asyncio.StrictRedis[bytes]',
+        keys: List[str],
+        processing_queue_key: str,
+    ) -> Optional[bytes]:
+        pipe = client.pipeline(transaction=False)
+        for key in keys:
+            pipe.llen(key)
+
+        for key, length in zip(keys, await pipe.execute()):
+            if length:
+                data = await client.rpoplpush(key, processing_queue_key)
+                if data:
+                    return data
+
+        return None
+
+    def _move_first_available_job(
+        self,
+        lists: List[QueueShard],
+        processing_queue_key: str,
+    ) -> Optional[bytes]:
+        client = lists[0].client
+
+        pipe = client.pipeline(transaction=False)
+        for priority_list in lists:
+            pipe.llen(priority_list.key)
+
+        for priority_list, length in zip(lists, pipe.execute()):
+            if length:
+                data = client.rpoplpush(priority_list.key, processing_queue_key)
+                if data:
+                    return data
+
+        return None
+
+    def _read_jobs(self, queue: QueueName, all_data: List[bytes]) -> List[Job]:
+        jobs = [Job.from_bytes(x) for x in all_data]
+        defer_offloaded_arguments(self._client(queue), jobs)
+        return jobs
+
+    async def _aread_jobs(self, queue: QueueName, all_data: List[bytes]) -> List[Job]:
+        jobs = [Job.from_bytes(x) for x in all_data]
+        await afetch_offloaded_arguments(get_async_redis_client(queue), jobs)
+        return jobs
+
+    def _release_unique_jobs(self, queue: QueueName, jobs: List[Job]) -> List[Job]:
+        # Jobs picked up again from a processing queue have already been
+        # released, so this is only for newly moved jobs.
+        release_unique_jobs(self._client(queue), self._unique_key(queue), jobs)
+        return jobs
+
+    async def _arelease_unique_jobs(self, queue: QueueName, jobs: List[Job]) -> List[Job]:
+        await arelease_unique_jobs(get_async_redis_client(queue), self._unique_key(queue), jobs)
+        return jobs
+
     def processed_job(self, queue: QueueName, worker_number: WorkerNumber, job: Job) -> None:
-        data = job.to_json().encode('utf-8')
+        self.bulk_processed_jobs(queue, worker_number, [job])
 
-        self.client.lrem(
-            self._processing_key(queue, worker_number),
-            count=1,
-            value=data,
-        )
+    def bulk_processed_jobs(
+        self,
+        queue: QueueName,
+        worker_number: WorkerNumber,
+        jobs: Collection[Job],
+    ) -> None:
+        pipe = self._client(queue).pipeline(transaction=True)
+        self._add_processed_commands(pipe, jobs, self._processing_key(queue, worker_number))
+        pipe.execute()
+
+    async def abulk_processed_jobs(
+        self,
+        queue: QueueName,
+        worker_number: WorkerNumber,
+        jobs: Collection[Job],
+    ) -> None:
+        # As `bulk_processed_jobs`, using asyncio clients.
+        pipe = get_async_redis_client(queue).pipeline(transaction=True)
+        self._add_processed_commands(pipe, jobs, self._processing_key(queue, worker_number))
+        await pipe.execute()
+
+    def _add_processed_commands(
+        self,
+        pipe: AnyPipeline,
+        jobs: Collection[Job],
+        processing_queue_key: str,
+    ) -> None:
+        # Jobs are run from the tail of our processing queue (see `dequeue` and
+        # `bulk_dequeue`), so searching for each job from the tail finds it
+        # straight away when jobs finish in the order they were dequeued, while
+        # still finding those which finish out of order (e.g. in threads).
+        for job in jobs:
+            pipe.lrem(processing_queue_key, -1, job.to_bytes())
+
+        # Offloaded arguments are deleted along with their jobs.
+        refs = get_arguments_refs(jobs)
+        if refs:
+            pipe.delete(*refs)
 
     def length(self, queue: QueueName) -> int:
-        return self.client.llen(self._key(queue))
+        return total_length(get_all_lists(self._shards(queue), get_priority_levels(queue)))
+
+    def length_by_priority(self, queue: QueueName) -> Dict[int, int]:
+        return lengths_by_priority(self._shards(queue), get_priority_levels(queue))
 
     def deduplicate(
         self,
@@ -164,77 +705,94 @@ class ReliableRedisBackend(BackendWithClear, BackendWithDeduplicate, BackendWith
         Deduplicate the given queue by comparing the jobs in a manner which
         ignores their created timestamps.
 
-        We use ``Job.identity_without_created`` to collect up jobs which would
-        be identical when run but potentially different by timestamp. We then
-        remove all but the first (oldest) of those jobs one at a time.
+        See ``deduplicate_list`` for details. Jobs are deduplicated across all
+        the shards and priorities of the queue, keeping those with the highest
+        priority.
 
         Returns a tuple of (original_size, new_size) of the queue.
         """
+        seen_identities: Set[bytes] = set()
+        removed_refs: List[str] = []
+        original_size = new_size = 0
 
-        main_queue_key = self._key(queue)
-
-        original_size = self.client.llen(main_queue_key)
+        for client, key in get_all_lists(self._shards(queue), get_priority_levels(queue)):
+            shard_original_size, shard_new_size = deduplicate_list(
+                client,
+                key,
+                progress_logger=progress_logger,
+                seen_identities=seen_identities,
+                removed_refs=removed_refs,
+            )
+            original_size += shard_original_size
+            new_size += shard_new_size
 
-        if not original_size:
-            return 0, 0
+        if removed_refs:
+            self._client(queue).delete(*removed_refs)
 
-        # A mapping of job_identity -> list of raw_job data; the entries in the
-        # latter list are ordered from newest to oldest
-        jobs = {}  # type: Dict[str, List[bytes]]
+        return original_size, new_size
 
-        progress_logger.info("Collecting jobs")
+    def clear(self, queue: QueueName) -> None:
+        delete_matching(self._client(queue), self._arguments_key(queue) + ':*')
+        self._client(queue).delete(
+            self._unique_key(queue),
+            self._wake_up_key(queue),
+            *(
+                priority_list.key
+                for priority_list in get_all_lists(self._shards(queue), get_priority_levels(queue))
+            ),
+        )
 
-        for raw_data in progress_logger.progress(self.client.lrange(main_queue_key, 0, -1)):
-            job_identity = Job.from_json(
-                raw_data.decode('utf-8'),
-            ).identity_without_created()
+    def _shards(self, queue: QueueName) -> List[QueueShard]:
+        try:
+            return self._queue_shards[queue]
+        except KeyError:
+            pass
 
-            jobs.setdefault(job_identity, []).append(raw_data)
+        shards = get_queue_shards(queue, self._key(queue))
 
-        progress_logger.info("Removing duplicate jobs")
+        # Jobs are moved atomically from the shards into the processing queues,
+        # which can only happen within a single redis server.
+        if any(shard.client is not self._client(queue) for shard in shards):
+            raise ValueError(
+                "The shards of queue {} must all be on the same redis server "
+                "to use the reliable redis backend.".format(queue),
+            )
 
-        for raw_jobs in progress_logger.progress(jobs.values()):
-            # Leave the oldest in the queue
-            for raw_data in raw_jobs[:-1]:
-                # Remove only one instance of this data (thus coping with
-                # unlikely but possible non-unique entries)
-                self.client.lrem(
-                    main_queue_key,
-                    value=raw_data,
-                    count=1,
-                )
+        self._queue_shards[queue] = shards
+        return shards
 
-        return original_size, self.client.llen(main_queue_key)
+    def _has_several_lists(self, queue: QueueName) -> bool:
+        return len(self._shards(queue)) > 1 or get_priority_levels(queue) > 1
 
-    def pause(self, queue: QueueName, until: datetime.datetime) -> None:
+    def _uses_wake_ups(self, queue: QueueName) -> bool:
         """
-        Pause the given queue by setting a pause marker.
+        Whether workers waiting for jobs in the given queue wait to be woken up
+        by enqueues, rather than waiting on its list. This is the case when the
+        queue has several lists, or its workers also serve other queues.
         """
+        return self._has_several_lists(queue) or get_queue_group(queue) is not None
 
-        pause_key = self._pause_key(queue)
-
-        now = datetime.datetime.now(datetime.timezone.utc)
-        delta = until - now
-
-        self.client.setex(
-            pause_key,
-            time=int(delta.total_seconds()),
-            # Store the value for debugging, we rely on setex behaviour for
-            # implementation.
-            value=until.isoformat(' '),
-        )
-
-    def resume(self, queue: QueueName) -> None:
+    def _group_by_priority_key(
+        self,
+        queue: QueueName,
+        all_data: List[bytes],
+    ) -> Dict[str, List[bytes]]:
         """
-        Resume the given queue by deleting the pause marker (if present).
+        Group the given jobs by the list of the first shard of the queue which
+        holds jobs of their priority, preserving their order.
         """
-        self.client.delete(self._pause_key(queue))
+        levels = get_priority_levels(queue)
+        keys = [
+            get_priority_lists(self._shards(queue)[:1], priority)[0].key
+            for priority in range(levels)
+        ]
 
-    def is_paused(self, queue: QueueName) -> bool:
-        return bool(self.client.exists(self._pause_key(queue)))
+        grouped = {}  # type: Dict[str, List[bytes]]
+        for data in all_data:
+            priority = get_priority(Job.from_bytes(data), levels) if levels > 1 else 0
+            grouped.setdefault(keys[priority], []).append(data)
 
-    def clear(self, queue: QueueName) -> None:
-        self.client.delete(self._key(queue))
+        return grouped
 
     def _key(self, queue: QueueName) -> str:
         key = 'django_lightweight_queue:{}'.format(queue)
@@ -244,6 +802,15 @@ class ReliableRedisBackend(BackendWithClear, BackendWithDeduplicate, BackendWith
     def _pause_key(self, queue: QueueName) -> str:
         return self._key(queue) + ':pause'
 
+    def _unique_key(self, queue: QueueName) -> str:
+        return self._key(queue) + ':unique'
+
+    def _wake_up_key(self, queue: QueueName) -> str:
+        return self._key(queue) + ':wake-up'
+
+    def _arguments_key(self, queue: QueueName) -> str:
+        return self._key(queue) + ':arguments'
+
     def _processing_key(self, queue: QueueName, worker_number: WorkerNumber) -> str:
         key = 'django_lightweight_queue:{}:processing:{}'.format(
             queue,
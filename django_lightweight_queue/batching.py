@@ -0,0 +1,151 @@
+import asyncio
+import contextlib
+import contextvars
+from typing import (
+    Dict,
+    List,
+    Type,
+    Tuple,
+    Callable,
+    Iterator,
+    Optional,
+    AsyncIterator,
+)
+
+from django.db import transaction
+from django.http import HttpRequest, HttpResponse
+
+from .job import Job
+from .types import QueueName
+from .utils import get_backend
+from .backends.base import BaseBackend
+
+JobsByQueue = Dict[QueueName, List[Job]]
+
+# The jobs enqueued within the current batch, if there is one.
+_current_batch = contextvars.ContextVar(
+    'django_lightweight_queue_batch',
+    default=None,
+)  # type: contextvars.ContextVar[Optional[List[Tuple[QueueName, Job]]]]
+
+
+@contextlib.contextmanager
+def batch(*, on_commit: bool = False, using: Optional[str] = None) -> Iterator[None]:
+    """
+    Buffer the jobs enqueued by calling tasks within this context, and enqueue
+    them all together when it exits. The jobs for all the queues which use the
+    same backend are enqueued in one pass, which for the redis backends means a
+    single round trip to each server.
+
+        with batch():
+            send_email(user_id=42)
+            update_search_index(user_id=42)
+
+    If `on_commit` is given, the jobs are only enqueued once the current
+    database transaction (of the `using` database) commits, and not at all if
+    it is rolled back.
+
+    Batches may be nested, in which case the jobs are enqueued when the
+    outermost batch exits. Nested batches with `on_commit` keep their own jobs
+    until the transaction commits, when they join the batch which is then open
+    (if any).
+    """
+    if not on_commit and _current_batch.get() is not None:
+        yield
+        return
+
+    jobs = []  # type: List[Tuple[QueueName, Job]]
+    token = _current_batch.set(jobs)
+    try:
+        yield
+    finally:
+        _current_batch.reset(token)
+
+        if on_commit:
+            transaction.on_commit(lambda: enqueue_batch(jobs), using=using)
+        else:
+            enqueue_batch(jobs)
+
+
+@contextlib.asynccontextmanager
+async def abatch() -> AsyncIterator[None]:
+    """
+    Async counterpart of `batch`, which enqueues the buffered jobs without
+    blocking the event loop. Jobs enqueued by both calling and awaiting
+    `aenqueue` on tasks are buffered.
+
+        async with abatch():
+            await send_email.aenqueue(user_id=42)
+            update_search_index(user_id=42)
+
+    Batches may be nested, including within those made by `batch`.
+    """
+    if _current_batch.get() is not None:
+        yield
+        return
+
+    jobs = []  # type: List[Tuple[QueueName, Job]]
+    token = _current_batch.set(jobs)
+    try:
+        yield
+    finally:
+        _current_batch.reset(token)
+        await aenqueue_batch(jobs)
+
+
+def add_to_batch(job: Job, queue: QueueName) -> bool:
+    """
+    Add the given job to the current batch, if there is one. Returns whether
+    there was a batch.
+    """
+    jobs = _current_batch.get()
+    if jobs is None:
+        return False
+
+    jobs.append((queue, job))
+    return True
+
+
+def enqueue_batch(jobs: List[Tuple[QueueName, Job]]) -> None:
+    # The jobs of a batch which waited for a commit join any batch which is
+    # open when it happens.
+    current_jobs = _current_batch.get()
+    if current_jobs is not None:
+        current_jobs.extend(jobs)
+        return
+
+    for backend, jobs_by_queue in group_by_backend(jobs):
+        backend.bulk_enqueue_many(jobs_by_queue)
+
+
+async def aenqueue_batch(jobs: List[Tuple[QueueName, Job]]) -> None:
+    await asyncio.gather(*(
+        backend.abulk_enqueue_many(jobs_by_queue)
+        for backend, jobs_by_queue in group_by_backend(jobs)
+    ))
+
+
+def group_by_backend(jobs: List[Tuple[QueueName, Job]]) -> List[Tuple[BaseBackend, JobsByQueue]]:
+    # Group the jobs by the type of their queue's backend, as any instance can
+    # enqueue jobs for all the queues which use that type.
+    by_backend_type = {}  # type: Dict[Type[BaseBackend], Tuple[BaseBackend, JobsByQueue]]
+    for queue, job in jobs:
+        backend = get_backend(queue)
+        _, jobs_by_queue = by_backend_type.setdefault(type(backend), (backend, {}))
+        jobs_by_queue.setdefault(queue, []).append(job)
+
+    return list(by_backend_type.values())
+
+
+class BatchEnqueueMiddleware:
+    """
+    Django middleware which enqueues all the jobs created while handling each
+    request together, once the response is ready. See `batch`.
+    """
+
+    def __init__(self, get_response: Callable[[HttpRequest], HttpResponse]) -> None:
+        self.get_response = get_response
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        with batch():
+            return self.get_response(request)
@@ -0,0 +1,69 @@
+"""
+Compression of large jobs, applied to the data produced by the serializers.
+
+Compressed jobs start with `COMPRESSED_TAG` followed by a byte identifying the
+codec, so that they can be told apart from uncompressed jobs (whose first byte
+is the tag of their serializer) and decompressed whatever the configuration.
+"""
+
+import zlib
+from typing import Dict, Tuple, Callable
+from functools import lru_cache
+
+from prometheus_client import Summary
+
+from .app_settings import app_settings
+
+COMPRESSED_TAG = b'\x02'
+
+ZLIB = b'z'
+
+CODECS = {
+    ZLIB: (zlib.compress, zlib.decompress),
+}  # type: Dict[bytes, Tuple[Callable[[bytes], bytes], Callable[[bytes], bytes]]]
+
+
+def compress(data: bytes) -> bytes:
+    """
+    Compress the given job data if it's at least as large as the configured
+    threshold and compressing it makes it smaller.
+    """
+    threshold = app_settings.COMPRESSION_THRESHOLD
+    if threshold is None or len(data) < threshold:
+        return data
+
+    compress_fn, _ = CODECS[ZLIB]
+    compressed = COMPRESSED_TAG + ZLIB + compress_fn(data)
+
+    if app_settings.ENABLE_PROMETHEUS:
+        get_compression_ratio_metric().labels('zlib').observe(len(compressed) / len(data))
+
+    if len(compressed) >= len(data):
+        return data
+
+    return compressed
+
+
+def decompress(data: bytes) -> bytes:
+    """
+    Decompress the given job data, if it was compressed.
+    """
+    if data[:1] != COMPRESSED_TAG:
+        return data
+
+    codec = data[1:2]
+    try:
+        _, decompress_fn = CODECS[codec]
+    except KeyError:
+        raise ValueError("Unknown job compression codec {!r}".format(codec)) from None
+
+    return decompress_fn(data[2:])
+
+
+@lru_cache()
+def get_compression_ratio_metric() -> Summary:
+    return Summary(
+        'job_compression_ratio',
+        "Ratio of compressed to original size of jobs large enough to compress",
+        ['codec'],
+    )
@@ -9,6 +9,11 @@ from prometheus_client.exposition import MetricsHandler
 from .types import QueueName, WorkerNumber
 from .app_settings import app_settings
 
+# Held by the master's metrics server while it serves a request, and by the
+# runner while forking a worker, so that workers aren't forked while the
+# metrics server holds the locks of the metrics (which the workers share).
+fork_lock = threading.Lock()
+
 
 def get_config_response(
     worker_queue_and_counts: Sequence[Tuple[QueueName, WorkerNumber]],
@@ -53,7 +58,8 @@ def metrics_http_server(
 
                 return self.wfile.write(config_response)
 
-            return super(RequestHandler, self).do_GET()
+            with fork_lock:
+                return super(RequestHandler, self).do_GET()
 
     class MetricsServer(threading.Thread):
         def __init__(self, *args, **kwargs):
@@ -1,14 +1,19 @@
 import sys
 import json
 import time
+import asyncio
+import hashlib
 import datetime
 import warnings
 from typing import Any, Dict, Tuple, Callable, Optional, TYPE_CHECKING
 
+from asgiref.sync import async_to_sync, sync_to_async
+
 from django.db import transaction
 
 from .types import QueueName, WorkerNumber
-from .utils import get_path, get_middleware
+from .utils import get_path, get_middleware, get_serializer, get_serializer_for
+from .compression import compress, decompress
 
 if TYPE_CHECKING:
     from .task import TaskWrapper
@@ -16,7 +21,51 @@ if TYPE_CHECKING:
 TIME_FORMAT = '%Y-%m-%d %H:%M:%S.%f'
 
 
+def parse_time(value: str) -> datetime.datetime:
+    """
+    Parse a time in `TIME_FORMAT`.
+    """
+    # fromisoformat is much faster than strptime and handles all the times
+    # which strftime produces for TIME_FORMAT, but not every time which
+    # strptime accepts for it.
+    try:
+        return datetime.datetime.fromisoformat(value)
+    except ValueError:
+        return datetime.datetime.strptime(value, TIME_FORMAT)
+
+
+def encode_identity_value(value: Any) -> Any:
+    """
+    Encode values which JSON doesn't support but serializers other than JSON
+    do (such as msgpack's support for bytes) when computing a job's identity.
+    """
+    if isinstance(value, bytes):
+        return {'__bytes__': value.hex()}
+    raise TypeError("Object of type {} is not JSON serializable".format(
+        value.__class__.__name__,
+    ))
+
+
 class Job:
+    # Jobs are created in bulk when dequeuing and deduplicating, so avoid the
+    # overhead of a __dict__ for each.
+    __slots__ = (
+        'path',
+        'timeout',
+        'sigkill_on_stop',
+        'priority',
+        'unique',
+        'arguments_ref',
+        '_args',
+        '_kwargs',
+        '_load_arguments',
+        '_created_time',
+        '_created_time_str',
+        '_identity',
+        '_json',
+        '_bytes',
+    )
+
     def __init__(
         self,
         path: str,
@@ -24,17 +73,42 @@ class Job:
         kwargs: Dict[str, Any],
         timeout: Optional[int] = None,
         sigkill_on_stop: bool = False,
+        priority: int = 0,
+        identity: Optional[bytes] = None,
+        unique: bool = False,
+        arguments_ref: Optional[str] = None,
     ) -> None:
         self.path = path
-        self.args = args
-        self.kwargs = kwargs
+        self._args = args
+        self._kwargs = kwargs
+        self._load_arguments = None  # type: Optional[Callable[[], Tuple[Any, Any]]]
         self.timeout = timeout
         self.sigkill_on_stop = sigkill_on_stop
-        self.created_time = datetime.datetime.utcnow()
+        self.priority = priority
+        self.unique = unique
+        # Where the arguments of jobs with large arguments are stored instead,
+        # see `with_arguments_ref`.
+        self.arguments_ref = arguments_ref
+
+        self._created_time = datetime.datetime.utcnow()  # type: Optional[datetime.datetime]
+        # Set instead of `_created_time` for jobs which have been read, so that
+        # it is only parsed if needed.
+        self._created_time_str = None  # type: Optional[str]
+
+        self._identity = identity
 
         self._json = None  # type: Optional[str]
+        self._bytes = None  # type: Optional[bytes]
 
     def __repr__(self) -> str:
+        if self.arguments_ref is not None and self._load_arguments is not None:
+            # Avoid fetching large arguments just to show them.
+            return "<Job: {}(<arguments at {}>) @ {}>".format(
+                self.path,
+                self.arguments_ref,
+                self.created_time_str,
+            )
+
         return "<Job: {}(*{!r}, **{!r}) @ {}>".format(
             self.path,
             self.args,
@@ -49,21 +123,139 @@ class Job:
         # Historic jobs won't have a created_time, so have a default
         created_time = as_dict.pop('created_time', None)
 
+        identity = as_dict.pop('identity', None)
+        if identity is not None:
+            as_dict['identity'] = bytes.fromhex(identity)
+
         job = cls(**as_dict)
         if created_time is not None:
-            job.created_time = datetime.datetime.strptime(
-                created_time,
-                TIME_FORMAT,
-            )
+            job._created_time = None
+            job._created_time_str = created_time
 
         # Ensures that Job.from_json(x).to_json() == x
         job._json = val
 
         return job
 
+    @classmethod
+    def with_lazy_arguments(
+        cls,
+        path: str,
+        load_arguments: Callable[[], Tuple[Any, Any]],
+        timeout: Optional[int],
+        sigkill_on_stop: bool,
+        priority: int,
+        created_time: datetime.datetime,
+        identity: Optional[bytes] = None,
+        unique: bool = False,
+        arguments_ref: Optional[str] = None,
+    ) -> 'Job':
+        """
+        Create a job whose args and kwargs are only decoded, by calling
+        `load_arguments`, when they are first used. This allows serializers to
+        make the other fields of jobs available cheaply.
+        """
+        job = cls(
+            path,
+            (),
+            {},
+            timeout,
+            sigkill_on_stop,
+            priority,
+            identity,
+            unique,
+            arguments_ref,
+        )
+        job._load_arguments = load_arguments
+        job.created_time = created_time
+        return job
+
+    def with_arguments_ref(self, arguments_ref: str) -> 'Job':
+        """
+        Returns a copy of this job whose arguments are stored separately, under
+        the given reference, rather than with the job. Backends fetch them by
+        calling `defer_arguments` for the jobs they read.
+        """
+        job = type(self)(
+            self.path,
+            (),
+            {},
+            self.timeout,
+            self.sigkill_on_stop,
+            self.priority,
+            self.identity,
+            self.unique,
+            arguments_ref,
+        )
+        job.created_time = self.created_time
+        return job
+
+    def defer_arguments(self, load_arguments: Callable[[], Tuple[Any, Any]]) -> None:
+        """
+        Arrange for the job's args and kwargs to be loaded by calling
+        `load_arguments` when they are first used.
+        """
+        self._load_arguments = load_arguments
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'Job':
+        """
+        Read a job stored by a backend, in whichever format it was stored and
+        whether or not it was compressed.
+        """
+        serialized = decompress(data)
+        job = get_serializer_for(serialized).loads(serialized)
+
+        # Ensures that Job.from_bytes(x).to_bytes() == x, whatever the
+        # configured serializer.
+        job._bytes = data
+
+        return job
+
+    @property
+    def args(self) -> Tuple[Any, ...]:
+        self._decode_arguments()
+        return self._args
+
+    @args.setter
+    def args(self, value: Tuple[Any, ...]) -> None:
+        self._decode_arguments()
+        self._args = value
+        self._identity = None
+
+    @property
+    def kwargs(self) -> Dict[str, Any]:
+        self._decode_arguments()
+        return self._kwargs
+
+    @kwargs.setter
+    def kwargs(self, value: Dict[str, Any]) -> None:
+        self._decode_arguments()
+        self._kwargs = value
+        self._identity = None
+
+    def _decode_arguments(self) -> None:
+        if self._load_arguments is not None:
+            self._args, self._kwargs = self._load_arguments()
+            self._load_arguments = None
+
+    @property
+    def created_time(self) -> datetime.datetime:
+        if self._created_time is None:
+            assert self._created_time_str is not None
+            self._created_time = parse_time(self._created_time_str)
+        return self._created_time
+
+    @created_time.setter
+    def created_time(self, value: datetime.datetime) -> None:
+        self._created_time = value
+        self._created_time_str = None
+
     @property
     def created_time_str(self) -> str:
-        return self.created_time.strftime(TIME_FORMAT)
+        if self._created_time_str is None:
+            self._created_time_str = self.created_time.strftime(TIME_FORMAT)
+        return self._created_time_str
 
     def run(self, *, queue: QueueName, worker_num: WorkerNumber) -> bool:
         """
@@ -80,13 +272,7 @@ class Job:
                 instance.process_job(self, queue, worker_num)
 
         try:
-            task = self.get_task_instance()
-
-            if task.atomic:
-                with transaction.atomic():
-                    result = task.fn(*self.args, **self.kwargs)
-            else:
-                result = task.fn(*self.args, **self.kwargs)
+            result = self._run_task(self.get_task_instance())
 
             time_taken = time.time() - start
 
@@ -109,11 +295,67 @@ class Job:
 
         return True
 
+    async def arun(self, *, queue: QueueName, worker_num: WorkerNumber) -> bool:
+        """
+        Async counterpart of `run`, for running jobs within an event loop.
+
+        Tasks which are coroutine functions are awaited, others are run in
+        Django's thread for synchronous code. Middleware may provide async
+        counterparts of its hooks, prefixed with `a` (e.g. `aprocess_job`),
+        which are used in preference to the synchronous hooks.
+        """
+
+        start = time.time()
+
+        middleware = get_middleware()
+
+        for instance in middleware:
+            await call_middleware(instance, 'process_job', self, queue, worker_num)
+
+        try:
+            task = self.get_task_instance()
+
+            if asyncio.iscoroutinefunction(task.fn):
+                result = await task.fn(*self.args, **self.kwargs)
+            else:
+                result = await sync_to_async(self._run_task)(task)
+
+            time_taken = time.time() - start
+
+            for instance in reversed(middleware):
+                await call_middleware(instance, 'process_result', self, result, time_taken)
+        except Exception:
+            time_taken = time.time() - start
+
+            exc_info = sys.exc_info()
+
+            for instance in reversed(middleware):
+                try:
+                    await call_middleware(instance, 'process_exception', self, time_taken, *exc_info)
+                except Exception:
+                    pass
+
+            return False
+
+        return True
+
+    def _run_task(self, task: 'TaskWrapper[Callable[..., Any]]') -> Any:
+        if asyncio.iscoroutinefunction(task.fn):
+            # Django's transactions can't be used from async code, so atomic
+            # doesn't apply to coroutine functions.
+            return async_to_sync(task.fn)(*self.args, **self.kwargs)
+
+        if task.atomic:
+            with transaction.atomic():
+                return task.fn(*self.args, **self.kwargs)
+
+        return task.fn(*self.args, **self.kwargs)
+
     def validate(self) -> None:
         # Ensure these execute without exception so that we cannot enqueue
         # things that are impossible to dequeue.
         self.get_task_instance()
-        self.to_json()
+        self.to_bytes()
 
     def get_task_instance(self) -> 'TaskWrapper[Callable[..., Any]]':
         return get_path(self.path)
@@ -126,7 +368,7 @@ class Job:
         return self.get_task_instance()
 
     def as_dict(self) -> Dict[str, Any]:
-        return {
+        as_dict = {
             'path': self.path,
             'args': self.args,
             'kwargs': self.kwargs,
@@ -135,13 +377,74 @@ class Job:
             'created_time': self.created_time_str,
         }
 
+        # Only include a priority or uniqueness if set, so that jobs without
+        # them can still be run by workers which predate them.
+        if self.priority:
+            as_dict['priority'] = self.priority
+        if self.unique:
+            as_dict['unique'] = self.unique
+        if self.arguments_ref is not None:
+            # The identity of the job can't be computed without its arguments.
+            as_dict['arguments_ref'] = self.arguments_ref
+            as_dict['identity'] = self.identity.hex()
+
+        return as_dict
+
     def to_json(self) -> str:
         if self._json is None:
             self._json = json.dumps(self.as_dict())
         return self._json
 
+    def to_bytes(self) -> bytes:
+        """
+        The job as stored by the backends, using the configured serializer and
+        compressed if it's large.
+        """
+        if self._bytes is None:
+            self._bytes = compress(get_serializer().dumps(self))
+        return self._bytes
+
     def identity_without_created(self) -> str:
         """Returns an object which can be used to identify equivalent jobs"""
         self_dict = self.as_dict()
         del self_dict['created_time']
-        return json.dumps(self_dict, sort_keys=True)
+        # Jobs which only differ in priority are duplicates of each other.
+        self_dict.pop('priority', None)
+        self_dict.pop('unique', None)
+        self_dict.pop('arguments_ref', None)
+        self_dict.pop('identity', None)
+        return json.dumps(self_dict, sort_keys=True, default=encode_identity_value)
+
+    @property
+    def identity(self) -> bytes:
+        """
+        A fixed size digest of `identity_without_created`, which is cheaper to
+        compare and hold in memory.
+
+        This is computed once for each job and then stored with it by
+        serializers which support that, so that it's available without
+        decoding the job's arguments when the job is read.
+        """
+        if self._identity is None:
+            self._identity = hashlib.blake2b(
+                self.identity_without_created().encode('utf-8'),
+                digest_size=16,
+            ).digest()
+        return self._identity
+
+
+async def call_middleware(instance: Any, hook: str, *args: Any) -> None:
+    """
+    Call the given hook of the given middleware from async code, preferring its
+    async counterpart if it has one. Synchronous hooks are run in Django's
+    thread for synchronous code, as synchronous tasks are, so that they can use
+    the ORM.
+    """
+    async_method = getattr(instance, 'a' + hook, None)
+    if async_method is not None:
+        await async_method(*args)
+        return
+
+    method = getattr(instance, hook, None)
+    if method is not None:
+        await sync_to_async(method)(*args)
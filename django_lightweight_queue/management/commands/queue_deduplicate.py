@@ -1,3 +1,4 @@
+import time
 from typing import Any, TypeVar
 
 from django.core.management.base import (
@@ -15,7 +16,14 @@ T = TypeVar('T')
 
 
 class Command(BaseCommand):
-    help = "Command to deduplicate tasks in a redis-backed queue"  # noqa:A003 # inherited name
+    help = """
+    Command to deduplicate tasks in a redis-backed queue.
+
+    The queue's jobs are moved aside while they are deduplicated, so until the
+    command finishes the queue appears empty to workers, to monitoring and to
+    autoscaling, though new jobs can still be added. The jobs which are kept
+    are held in memory until they are restored to the queue.
+    """  # noqa:A003 # inherited name
 
     def add_arguments(self, parser: CommandParser) -> None:
         parser.add_argument(
@@ -35,11 +43,15 @@ class Command(BaseCommand):
                 ),
             )
 
+        start = time.time()
+
         original_size, new_size = backend.deduplicate(
             queue,
             progress_logger=self.get_progress_logger(),
         )
 
+        duration = time.time() - start
+
         if original_size == new_size:
             self.stdout.write(
                 "No duplicate jobs detected (queue length remains {})".format(
@@ -54,6 +66,14 @@ class Command(BaseCommand):
                 ),
             )
 
+        self.stdout.write(
+            "Processed {} jobs in {:.2f}s ({:.0f} jobs/s)".format(
+                original_size,
+                duration,
+                original_size / duration if duration else 0,
+            ),
+        )
+
     def get_progress_logger(self) -> ProgressLogger:
         try:
             import tqdm
@@ -1,13 +1,23 @@
+import gc
+import os
 import sys
 import time
 import signal
+import traceback
 import subprocess
-from typing import Dict, Tuple, Callable, Optional
+from typing import Dict, List, Type, Tuple, Union, Callable, Optional
+
+from prometheus_client import Counter
+
+from django.db import connections
 
 from .types import Logger, QueueName, WorkerNumber
-from .utils import get_backend, set_process_title
-from .exposition import metrics_http_server
+from .utils import get_queues, get_backend, set_process_title
+from .worker import Worker, RECYCLE_EXIT_CODES
+from .exposition import fork_lock, metrics_http_server
+from .autoscaling import Autoscaler
 from .app_settings import app_settings
+from .backends.base import BaseBackend, BackendWithWorkerRecovery
 from .machine_types import Machine
 from .cron_scheduler import (
     CronScheduler,
@@ -15,6 +25,169 @@ from .cron_scheduler import (
     ensure_queue_workers_for_config,
 )
 
+if app_settings.ENABLE_PROMETHEUS:
+    worker_restarts = Counter(
+        'worker_restarts',
+        "Workers restarted after exiting, by the reason they exited",
+        ['queue', 'reason'],
+    )
+
+RECYCLE_REASONS = {
+    code: reason for reason, code in RECYCLE_EXIT_CODES.items()
+}  # type: Dict[Optional[int], str]
+
+
+def worker_command(
+    queue: QueueName,
+    worker_num: WorkerNumber,
+    prometheus_port: int,
+    touch_filename: Optional[str],
+    extra_settings_filename: Optional[str],
+) -> List[str]:
+    args = [
+        sys.executable,
+        # manage.py
+        sys.argv[0],
+        'queue_worker',
+        queue,
+        str(worker_num),
+        '--prometheus-port',
+        str(prometheus_port),
+    ]
+
+    if touch_filename is not None:
+        args.extend([
+            '--touch-file',
+            touch_filename,
+        ])
+
+    if extra_settings_filename is not None:
+        args.extend([
+            '--extra-settings',
+            extra_settings_filename,
+        ])
+
+    return args
+
+
+class ForkedWorker:
+    """
+    A worker process forked from the master, providing the parts of the
+    interface of `subprocess.Popen` which the runner uses.
+    """
+
+    def __init__(self, pid: int) -> None:
+        self.pid = pid
+        self.returncode = None  # type: Optional[int]
+
+    def poll(self) -> Optional[int]:
+        if self.returncode is None:
+            pid, status = os.waitpid(self.pid, os.WNOHANG)
+            if pid:
+                self.returncode = exit_code_from_status(status)
+        return self.returncode
+
+    def wait(self) -> int:
+        if self.returncode is None:
+            _, status = os.waitpid(self.pid, 0)
+            self.returncode = exit_code_from_status(status)
+        return self.returncode
+
+    def send_signal(self, signum: int) -> None:
+        if self.returncode is None:
+            os.kill(self.pid, signum)
+
+
+WorkerProcess = Union['subprocess.Popen[bytes]', ForkedWorker]
+
+
+def exit_code_from_status(status: int) -> int:
+    # As for `subprocess.Popen.returncode`, processes killed by a signal have
+    # the negated signal number as their exit code.
+    if os.WIFSIGNALED(status):
+        return -os.WTERMSIG(status)
+    return os.WEXITSTATUS(status)
+
+
+def fork_worker(
+    queue: QueueName,
+    worker_num: WorkerNumber,
+    prometheus_port: int,
+    touch_filename: Optional[str],
+) -> ForkedWorker:
+    # Database connections can't be shared with the child, and closing them
+    # in the child would also close them for the master.
+    connections.close_all()
+
+    # Move everything the master has allocated into the garbage collector's
+    # permanent generation, so that collections in the workers don't write to
+    # (and so copy) the memory they share with the master.
+    gc.freeze()
+
+    # The master also runs the cron scheduler and the metrics server in
+    # threads, which the worker doesn't inherit. Forking is nonetheless safe,
+    # as the locks which they might hold and which the worker uses are reset
+    # in the worker (those of logging and of the import system, and redis'
+    # connection pools) or aren't held while forking (see `fork_lock`).
+    with fork_lock:
+        pid = os.fork()
+
+    if pid:
+        # The master's garbage is collected as normal again, otherwise that
+        # allocated between forks would never be freed.
+        gc.unfreeze()
+        return ForkedWorker(pid)
+
+    # In the worker. The redis clients inherited from the master notice that
+    # they have been forked and open their own connections.
+    exit_code = 1
+    try:
+        Worker(
+            queue=queue,
+            worker_num=worker_num,
+            prometheus_port=prometheus_port,
+            touch_filename=touch_filename or '',
+        ).run()
+        exit_code = 0
+    except SystemExit as e:
+        exit_code = e.code if isinstance(e.code, int) else 1
+    except BaseException:
+        traceback.print_exc()
+    finally:
+        # Never return to the master's loop, nor run the master's exit
+        # handlers.
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os._exit(exit_code)
+
+
+def recover_worker_jobs(
+    queue: QueueName,
+    worker_num: WorkerNumber,
+    logger: Logger,
+) -> None:
+    """
+    Return the unfinished jobs of a worker which has exited and won't be
+    restarted, such as one removed by autoscaling. Workers which were asked to
+    stop may still have been killed mid-job (see `sigkill_on_stop`), and their
+    jobs would otherwise wait until the worker next runs.
+    """
+    for member in get_queues(queue):
+        backend = get_backend(member)
+        if not isinstance(backend, BackendWithWorkerRecovery):
+            continue
+
+        try:
+            backend.recover_worker_jobs(member, worker_num)
+        except Exception:
+            logger.exception(
+                "Failed to recover the jobs of worker #{} for {}".format(worker_num, member),
+                extra={
+                    'worker': worker_num,
+                    'queue': member,
+                },
+            )
+
 
 def runner(
     touch_filename_fn: Callable[[QueueName], Optional[str]],
@@ -32,15 +205,26 @@ def runner(
 
     running = True
 
-    # Some backends may require on-startup logic per-queue, initialise a dummy
-    # backend per queue to do so. Note: we need to do this after any potential
-    # calls to `ensure_queue_workers_for_config` so that all the workers
-    # (including the implicit cron ones) have been configured.
-    queues_to_startup = set(queue for queue, _ in machine.worker_names)
+    # Some backends may require on-startup logic per-queue, run that for all
+    # the queues handled by each type of backend in a single pass. Note: we
+    # need to do this after any potential calls to
+    # `ensure_queue_workers_for_config` so that all the workers (including the
+    # implicit cron ones) have been configured. The workers of groups of
+    # queues need startup for each of their queues.
+    queues_to_startup = sorted(set(
+        queue
+        for queue_or_group, _ in machine.worker_names
+        for queue in get_queues(queue_or_group)
+    ))
+    backends_to_startup = {}  # type: Dict[Type[BaseBackend], Tuple[BaseBackend, List[QueueName]]]
     for queue in queues_to_startup:
-        logger.debug("Running startup for queue {}".format(queue))
         backend = get_backend(queue)
-        backend.startup(queue)
+        _, queues = backends_to_startup.setdefault(type(backend), (backend, []))
+        queues.append(queue)
+
+    for backend, queues in backends_to_startup.values():
+        logger.debug("Running startup for queues {}".format(", ".join(queues)))
+        backend.bulk_startup(queues)
 
     # Note: we deliberately configure our handling of SIGTERM _after_ the
     # startup processes have happened; this ensures that the startup processes
@@ -63,14 +247,54 @@ def runner(
     workers = {
         x: (None, "{}/{}".format(*x))
         for x in machine.worker_names
-    }  # type: Dict[Tuple[QueueName, WorkerNumber], Tuple[Optional[subprocess.Popen[bytes]], str]]
+    }  # type: Dict[Tuple[QueueName, WorkerNumber], Tuple[Optional[WorkerProcess], str]]
+
+    # Workers removed by the autoscaler which are finishing their current job.
+    # They aren't restarted until they have exited.
+    stopping = {}  # type: Dict[Tuple[QueueName, WorkerNumber], Tuple[WorkerProcess, str]]
+
+    autoscaler = Autoscaler(machine.worker_names, logger)
 
     if app_settings.ENABLE_PROMETHEUS:
         metrics_server = metrics_http_server(machine.worker_names)
         metrics_server.start()
 
     while running:
+        for key in autoscaler.update():
+            worker, worker_name = workers[key]
+            workers[key] = (None, worker_name)
+
+            if worker is None or worker.poll() is not None:
+                continue
+
+            logger.info(
+                "Stopping worker {} after scaling down".format(worker_name),
+                extra={
+                    'worker': key[1],
+                    'queue': key[0],
+                },
+            )
+
+            # Ask the worker to exit gracefully, as on shutdown.
+            try:
+                worker.send_signal(signal.SIGUSR2)
+            except OSError:
+                pass
+
+            stopping[key] = (worker, worker_name)
+
+        for key, (worker, _) in list(stopping.items()):
+            if worker.poll() is not None:
+                del stopping[key]
+                recover_worker_jobs(*key, logger)
+
         for index, (queue, worker_num) in enumerate(machine.worker_names, start=1):
+            if (
+                not autoscaler.is_enabled(queue, worker_num) or
+                (queue, worker_num) in stopping
+            ):
+                continue
+
             worker, worker_name = workers[(queue, worker_num)]
 
             # Ensure that all workers are now running (idempotent)
@@ -88,52 +312,57 @@ def runner(
                         },
                     )
                 else:
+                    # Workers which weren't recycled exited unexpectedly.
+                    reason = RECYCLE_REASONS.get(worker.returncode, 'unexpected')
+
                     logger.info(
-                        "Starting missing worker {} (exit code was: {})".format(
+                        "Starting missing worker {} (exit code was: {}, reason: {})".format(
                             worker_name,
                             worker.returncode,
+                            reason,
                         ),
                         extra={
                             'worker': worker_num,
                             'queue': queue,
                             'exit_code': worker.returncode,
+                            'reason': reason,
                         },
                     )
 
-                args = [
-                    sys.executable,
-                    # manage.py
-                    sys.argv[0],
-                    'queue_worker',
-                    queue,
-                    str(worker_num),
-                    '--prometheus-port',
-                    str(app_settings.PROMETHEUS_START_PORT + index),
-                ]
+                    if app_settings.ENABLE_PROMETHEUS:
+                        worker_restarts.labels(queue, reason).inc()
 
+                prometheus_port = app_settings.PROMETHEUS_START_PORT + index
                 touch_filename = touch_filename_fn(queue)
-                if touch_filename is not None:
-                    args.extend([
-                        '--touch-file',
-                        touch_filename,
-                    ])
 
-                if extra_settings_filename is not None:
-                    args.extend([
-                        '--extra-settings',
+                if app_settings.FORK_WORKERS:
+                    worker = fork_worker(
+                        queue,
+                        worker_num,
+                        prometheus_port,
+                        touch_filename,
+                    )
+                else:
+                    worker = subprocess.Popen(worker_command(
+                        queue,
+                        worker_num,
+                        prometheus_port,
+                        touch_filename,
                         extra_settings_filename,
-                    ])
+                    ))
 
-                worker = subprocess.Popen(args)
                 workers[(queue, worker_num)] = (worker, worker_name)
 
         time.sleep(1)
 
-    def signal_workers(signum: int) -> None:
-        for worker, _ in workers.values():
-            if worker is None:
-                continue
+    remaining = [
+        (key, worker, worker_name)
+        for key, (worker, worker_name) in list(workers.items()) + list(stopping.items())
+        if worker is not None
+    ]
 
+    def signal_workers(signum: int) -> None:
+        for _, worker, _ in remaining:
             try:
                 worker.send_signal(signum)
             except OSError:
@@ -144,11 +373,13 @@ def runner(
     # sort of abuse.
     signal_workers(signal.SIGUSR2)
 
-    for worker, worker_name in workers.values():
-        if worker is None:
-            continue
-
+    for key, worker, worker_name in remaining:
         logger.info("Waiting for {} to terminate".format(worker_name))
         worker.wait()
 
+        # Once restarted the runner won't run the workers of scaled up queues
+        # until they are scaled up again.
+        if autoscaler.is_scaled(*key):
+            recover_worker_jobs(*key, logger)
+
     logger.info("All processes finished")
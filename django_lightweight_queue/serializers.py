@@ -0,0 +1,132 @@
+import json
+import datetime
+from abc import ABCMeta, abstractmethod
+from typing import Any, Dict, Tuple
+
+from .job import Job
+
+EPOCH = datetime.datetime(1970, 1, 1)
+ONE_MICROSECOND = datetime.timedelta(microseconds=1)
+
+
+class BaseSerializer(metaclass=ABCMeta):
+    """
+    Converts jobs to and from the bytes stored by the backends.
+
+    The first byte of all the data produced by a serializer must be its `tag`,
+    which is used to pick the serializer for reading each job. This means that
+    jobs can still be read after the configured serializer is changed.
+    """
+
+    tag: bytes
+
+    @abstractmethod
+    def dumps(self, job: Job) -> bytes:
+        raise NotImplementedError()
+
+    @abstractmethod
+    def loads(self, data: bytes) -> Job:
+        raise NotImplementedError()
+
+    def dumps_arguments(self, args: Tuple[Any, ...], kwargs: Dict[str, Any]) -> bytes:
+        """
+        Serialize just the arguments of a job, for those which are offloaded.
+        As for jobs, the data must start with the serializer's `tag`.
+        """
+        return self.dumps(Job('', args, kwargs))
+
+    def loads_arguments(self, data: bytes) -> Tuple[Any, Any]:
+        job = self.loads(data)
+        return job.args, job.kwargs
+
+
+class JSONSerializer(BaseSerializer):
+    """
+    Stores jobs as JSON objects, as all jobs were historically stored.
+    """
+
+    tag = b'{'
+
+    def dumps(self, job: Job) -> bytes:
+        return job.to_json().encode('utf-8')
+
+    def loads(self, data: bytes) -> Job:
+        return Job.from_json(data.decode('utf-8'))
+
+    def dumps_arguments(self, args: Tuple[Any, ...], kwargs: Dict[str, Any]) -> bytes:
+        return json.dumps({'args': args, 'kwargs': kwargs}).encode('utf-8')
+
+    def loads_arguments(self, data: bytes) -> Tuple[Any, Any]:
+        arguments = json.loads(data.decode('utf-8'))
+        return arguments['args'], arguments['kwargs']
+
+
+class MsgpackSerializer(BaseSerializer):
+    """
+    Stores jobs compactly as a version byte followed by a msgpack array of the
+    job's fields, with the created time as an integer number of microseconds.
+
+    The args and kwargs are packed separately at the end of the array, so that
+    they are only decoded if they're used. The job's identity is stored so that
+    it is available without decoding them.
+
+    Requires the `msgpack` package.
+    """
+
+    tag = b'\x01'
+
+    def dumps(self, job: Job) -> bytes:
+        import msgpack
+
+        return self.tag + msgpack.packb(
+            [
+                job.path,
+                job.timeout,
+                job.sigkill_on_stop,
+                (job.created_time - EPOCH) // ONE_MICROSECOND,
+                job.priority,
+                job.unique,
+                job.identity,
+                job.arguments_ref,
+                msgpack.packb([job.args, job.kwargs], use_bin_type=True),
+            ],
+            use_bin_type=True,
+        )
+
+    def loads(self, data: bytes) -> Job:
+        import msgpack
+
+        (
+            path,
+            timeout,
+            sigkill_on_stop,
+            created_time,
+            priority,
+            unique,
+            identity,
+            arguments_ref,
+            arguments,
+        ) = msgpack.unpackb(data[1:], raw=False)
+
+        return Job.with_lazy_arguments(
+            path,
+            lambda: msgpack.unpackb(arguments, raw=False, strict_map_key=False),
+            timeout,
+            sigkill_on_stop,
+            priority,
+            EPOCH + created_time * ONE_MICROSECOND,
+            identity,
+            unique,
+            arguments_ref,
+        )
+
+    def dumps_arguments(self, args: Tuple[Any, ...], kwargs: Dict[str, Any]) -> bytes:
+        import msgpack
+
+        return self.tag + msgpack.packb([args, kwargs], use_bin_type=True)
+
+    def loads_arguments(self, data: bytes) -> Tuple[Any, Any]:
+        import msgpack
+
+        args, kwargs = msgpack.unpackb(data[1:], raw=False, strict_map_key=False)
+        return args, kwargs
@@ -15,6 +15,7 @@ from typing import (
 from .job import Job
 from .types import QueueName
 from .utils import get_backend, contribute_implied_queue_name
+from .batching import add_to_batch
 from .app_settings import app_settings
 
 TCallable = TypeVar('TCallable', bound=Callable[..., Any])
@@ -27,6 +28,8 @@ class task:
         timeout: Optional[int] = None,
         sigkill_on_stop: bool = False,
         atomic: Optional[bool] = None,
+        priority: int = 0,
+        unique: bool = False,
     ) -> None:
         """
         Define a task to be run.
@@ -37,6 +40,9 @@ class task:
 
             >>> fn("hello", 1)
 
+        Tasks may also be coroutine functions (`async def`), see
+        `ASYNC_CONCURRENCY`.
+
         Note that arguments must be JSON serialisable and, therefore, cannot be
         Django model instances. This is entirely deliberate due to:
 
@@ -60,6 +66,15 @@ class task:
 
             `atomic` -- The task will be run inside a database transaction.
 
+            `priority` -- Jobs with a higher priority will be run before those
+            with a lower one in the same queue, if the queue's backend supports
+            priorities and the queue is configured with enough priority levels
+            (see `PRIORITIES`).
+
+            `unique` -- Enqueuing the task while an identical job (ignoring its
+            created time and priority) is waiting to run has no effect, if the
+            queue's backend supports unique jobs.
+
         For example::
 
             @task(sigkill_on_stop=True, timeout=60)
@@ -79,6 +94,11 @@ class task:
 
         (NB. You cannot yet invent dynamic queue names here; a queue with that
         name must already be running.)
+
+        From async code, such as async views, enqueue jobs without blocking
+        the event loop by awaiting `aenqueue` instead::
+
+            >>> await slow_fn.aenqueue(3)
         """
 
         if atomic is None:
@@ -88,11 +108,21 @@ class task:
         self.timeout = timeout
         self.sigkill_on_stop = sigkill_on_stop
         self.atomic = atomic
+        self.priority = priority
+        self.unique = unique
 
         contribute_implied_queue_name(self.queue)
 
     def __call__(self, fn: TCallable) -> 'TaskWrapper[TCallable]':
-        return TaskWrapper(fn, self.queue, self.timeout, self.sigkill_on_stop, self.atomic)
+        return TaskWrapper(
+            fn,
+            self.queue,
+            self.timeout,
+            self.sigkill_on_stop,
+            self.atomic,
+            self.priority,
+            self.unique,
+        )
 
 
 class BulkEnqueueHelper(Generic[TCallable]):
@@ -145,12 +175,16 @@ class TaskWrapper(Generic[TCallable]):
         timeout: Optional[int],
         sigkill_on_stop: bool,
         atomic: bool,
+        priority: int = 0,
+        unique: bool = False,
     ):
         self.fn = fn
         self.queue = queue
         self.timeout = timeout
         self.sigkill_on_stop = sigkill_on_stop
         self.atomic = atomic
+        self.priority = priority
+        self.unique = unique
 
         self.path = '{}.{}'.format(fn.__module__, fn.__name__)
 
@@ -164,8 +198,18 @@ class TaskWrapper(Generic[TCallable]):
             'django_lightweight_queue_sigkill_on_stop',
             self.sigkill_on_stop,
         )
-
-        job = Job(self.path, args, kwargs, timeout, sigkill_on_stop)
+        priority = kwargs.pop('django_lightweight_queue_priority', self.priority)
+        unique = kwargs.pop('django_lightweight_queue_unique', self.unique)
+
+        job = Job(
+            self.path,
+            args,
+            kwargs,
+            timeout,
+            sigkill_on_stop,
+            priority,
+            unique=unique,
+        )
         job.validate()
 
         return job
@@ -183,7 +227,19 @@ class TaskWrapper(Generic[TCallable]):
         queue = kwargs.pop('django_lightweight_queue_queue', self.queue)
 
         job = self._build_job(args, kwargs)
-        get_backend(queue).enqueue(job, queue)
+        if not add_to_batch(job, queue):
+            get_backend(queue).enqueue(job, queue)
+
+    async def aenqueue(self, *args: Any, **kwargs: Any) -> None:
+        """
+        Enqueue a job for this task from async code, without blocking the event
+        loop. Takes the same arguments as calling the task.
+        """
+        queue = kwargs.pop('django_lightweight_queue_queue', self.queue)
+
+        job = self._build_job(args, kwargs)
+        if not add_to_batch(job, queue):
+            await get_backend(queue).aenqueue(job, queue)
 
     def bulk_enqueue(
         self,
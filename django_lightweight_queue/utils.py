@@ -11,6 +11,7 @@ from typing import (
     Mapping,
     Callable,
     Iterable,
+    Optional,
     Sequence,
     Collection,
     TYPE_CHECKING,
@@ -26,12 +27,20 @@ from .types import Logger, QueueName, WorkerNumber
 from .app_settings import Defaults, app_settings, LongNameAdapter
 
 if TYPE_CHECKING:
+    from .serializers import BaseSerializer
     from .backends.base import BaseBackend
 
 _accepting_implied_queues = True
 
 FIVE_SECONDS = datetime.timedelta(seconds=5)
 
+# Serializers which jobs may have been stored with, in addition to the
+# configured one.
+BUILTIN_SERIALIZERS = (
+    'django_lightweight_queue.serializers.JSONSerializer',
+    'django_lightweight_queue.serializers.MsgpackSerializer',
+)
+
 
 def load_extra_settings(file_path: str) -> None:
     # Based on https://docs.python.org/3/library/importlib.html#importing-a-source-file-directly
@@ -70,10 +79,43 @@ def get_path(path: str) -> Any:
 
 @lru_cache()
 def get_backend(queue: QueueName) -> 'BaseBackend':
-    return get_path(app_settings.BACKEND_OVERRIDES.get(
-        queue,
-        app_settings.BACKEND,
-    ))()
+    # The workers of a group of queues use the backend of its queues.
+    paths = set(
+        app_settings.BACKEND_OVERRIDES.get(x, app_settings.BACKEND)
+        for x in get_queues(queue)
+    )
+    if len(paths) > 1:
+        raise ValueError(
+            "The queues in group {!r} must all use the same backend.".format(queue),
+        )
+
+    return get_path(paths.pop())()
+
+
+def get_serializer() -> 'BaseSerializer':
+    return _get_serializer(app_settings.SERIALIZER)
+
+
+def get_serializer_for(data: bytes) -> 'BaseSerializer':
+    """
+    Returns the serializer which the given job data was stored with.
+    """
+    serializer = get_serializer()
+    tag = data[:1]
+    if serializer.tag == tag:
+        return serializer
+
+    for path in BUILTIN_SERIALIZERS:
+        serializer = _get_serializer(path)
+        if serializer.tag == tag:
+            return serializer
+
+    raise ValueError("Unknown job format {!r}".format(tag))
+
+
+@lru_cache()
+def _get_serializer(path: str) -> 'BaseSerializer':
+    return get_path(path)()
 
 
 @lru_cache()
@@ -115,15 +157,64 @@ def contribute_implied_queue_name(queue: QueueName) -> None:
 
 
 def get_queue_counts() -> Mapping[QueueName, int]:
+    """
+    The number of workers of each queue (or group of queues), including those
+    which are only run while it is scaled up, see `MAX_WORKERS`.
+    """
+    counts = get_min_queue_counts()
+
+    if not app_settings.MAX_WORKERS:
+        return counts
+
+    return {
+        queue: max(count, app_settings.MAX_WORKERS.get(queue, 0))
+        for queue, count in counts.items()
+    }
+
+
+def get_min_queue_counts() -> Mapping[QueueName, int]:
+    """
+    The number of workers of each queue (or group of queues) which always run.
+    """
     refuse_further_implied_queues()
-    return app_settings.WORKERS
+
+    if not app_settings.QUEUE_GROUPS:
+        return app_settings.WORKERS
+
+    # Queues in groups are served by the workers of their group rather than
+    # their own. Groups have a worker unless configured otherwise.
+    counts = {
+        queue: count
+        for queue, count in app_settings.WORKERS.items()
+        if get_queue_group(queue) is None
+    }
+    for group in app_settings.QUEUE_GROUPS:
+        counts.setdefault(group, 1)
+    return counts
 
 
 def get_worker_numbers(queue: QueueName) -> Collection[WorkerNumber]:
-    count = get_queue_counts()[queue]
+    count = get_queue_counts()[get_queue_group(queue) or queue]
     return cast(Collection[WorkerNumber], range(1, count + 1))
 
 
+def get_queue_group(queue: QueueName) -> Optional[QueueName]:
+    """
+    The group (see `QUEUE_GROUPS`) whose workers serve the given queue, if any.
+    """
+    for group, weights in app_settings.QUEUE_GROUPS.items():
+        if queue in weights:
+            return group
+    return None
+
+
+def get_queues(queue_or_group: QueueName) -> List[QueueName]:
+    """
+    The queues served by the workers of the given queue or group of queues.
+    """
+    return list(app_settings.QUEUE_GROUPS.get(queue_or_group, [queue_or_group]))
+
+
 def import_all_submodules(name: str, exclude: Sequence[str] = ()) -> None:
     for app_config in apps.get_app_configs():
         app_module = app_config.module
@@ -3,19 +3,40 @@ import sys
 import math
 import time
 import signal
+import asyncio
 import logging
 import datetime
-import itertools
-from typing import Optional
-
-from prometheus_client import Summary, start_http_server
+import collections
+from typing import Dict, List, Deque, Tuple, Mapping, Optional, Sequence
+from concurrent.futures import (
+    wait,
+    Future,
+    FIRST_COMPLETED,
+    ThreadPoolExecutor,
+)
+
+from asgiref.sync import sync_to_async
+from prometheus_client import (
+    Gauge,
+    Counter,
+    Summary,
+    REGISTRY,
+    start_http_server,
+)
+from prometheus_client.core import GaugeMetricFamily
+from prometheus_client.registry import Collector
 
 from django.db import connections, transaction
 
+from .job import Job
 from .types import QueueName, WorkerNumber
-from .utils import get_logger, get_backend, set_process_title
+from .utils import get_logger, get_queues, get_backend, set_process_title
 from .app_settings import app_settings
-from .backends.base import BaseBackend
+from .backends.base import (
+    BaseBackend,
+    BackendWithPriorities,
+    BackendWithQueueGroups,
+)
 
 if app_settings.ENABLE_PROMETHEUS:
     job_duration = Summary(
@@ -23,6 +44,25 @@ if app_settings.ENABLE_PROMETHEUS:
         "Item processing time",
         ['queue'],
     )
+    worker_rss = Gauge(
+        'worker_rss_bytes',
+        "Resident set size of the worker process",
+        ['queue'],
+    )
+    db_connections = Counter(
+        'db_connections_after_jobs',
+        "Database connections open after jobs, by whether they were kept for reuse",
+        ['alias', 'outcome'],
+    )
+
+# Workers which exit in order to be restarted by the runner use these exit
+# codes, so that it can tell why.
+RECYCLE_EXIT_CODES = {
+    'jobs': 80,
+    'idle': 81,
+    'memory': 82,
+    'timeout': 83,
+}
 
 
 class Worker:
@@ -48,6 +88,47 @@ class Worker:
         self.kill_after = None
         self.sigkill_on_stop = False
 
+        self.prefetch_count = app_settings.PREFETCH_COUNTS.get(queue, 1)
+        # Jobs which have been dequeued but not yet run.
+        self.job_buffer = collections.deque()  # type: Deque[Job]
+
+        self.threads = app_settings.THREADS.get(queue, 1)
+        # The jobs running in the worker's threads, if it has them, by their
+        # futures, with the `time.monotonic` values of when they started and of
+        # their deadlines (if they have timeouts).
+        self.running_jobs = {}  # type: Dict[Future[None], Tuple[Job, float, Optional[float]]]
+
+        self.async_concurrency = app_settings.ASYNC_CONCURRENCY.get(queue)
+        # Likewise the tasks of the jobs running in the worker's event loop, if
+        # it has one.
+        self.running_tasks = {}  # type: Dict[asyncio.Future[None], Tuple[Job, float]]
+
+        # The workers of a group of queues serve all of its queues, taking jobs
+        # from them in weighted order.
+        self.queues = get_queues(queue)
+        group_weights = app_settings.QUEUE_GROUPS.get(queue)
+        self.round_robin = (
+            WeightedRoundRobin(group_weights) if group_weights else None
+        )  # type: Optional[WeightedRoundRobin]
+
+        if self.round_robin is not None and (
+            self.prefetch_count > 1 or
+            self.threads > 1 or
+            self.async_concurrency is not None
+        ):
+            raise ValueError(
+                "Workers of the queue group {!r} must run one job at a time.".format(queue),
+            )
+
+        self.max_jobs = app_settings.MAX_JOBS_PER_WORKER.get(queue, 1000)
+        self.max_idle_time = app_settings.MAX_WORKER_IDLE_TIME.get(queue, 30 * 60)
+        self.max_rss = app_settings.MAX_WORKER_RSS.get(queue)
+
+        # The number of jobs run so far, and why the worker is exiting in order
+        # to be restarted (if it is).
+        self.job_count = 0
+        self.recycle_reason = None  # type: Optional[str]
+
         super().__init__()
 
         # Setup @property.setter on Process
@@ -67,20 +148,54 @@ class Worker:
         backend = get_backend(self.queue)
         self.log(logging.DEBUG, "Loaded backend {}".format(backend))
 
-        time_item_last_processed = datetime.datetime.utcnow()
+        if self.round_robin is not None and not isinstance(backend, BackendWithQueueGroups):
+            raise ValueError(
+                "{} doesn't support groups of queues.".format(type(backend).__name__),
+            )
 
-        self.log(logging.DEBUG, "Worker started")
+        if (
+            app_settings.ENABLE_PROMETHEUS and
+            self.prometheus_port is not None and
+            isinstance(backend, BackendWithPriorities)
+        ):
+            self.export_queue_depth(backend)
 
-        for item_count in itertools.count():
-            if not self.running:
-                break
+        if self.async_concurrency is not None:
+            self.log(logging.DEBUG, "Worker started")
 
-            if self.idle_time_reached(time_item_last_processed):
-                self.log(logging.INFO, "Exiting due to reaching idle time limit")
-                break
+            try:
+                asyncio.run(self.arun(backend))
+            except KeyboardInterrupt:
+                sys.exit(1)
+
+            self.finish()
+            return
+
+        if self.threads > 1:
+            self.log(logging.DEBUG, "Worker started")
+
+            executor = ThreadPoolExecutor(
+                max_workers=self.threads,
+                thread_name_prefix=self.name,
+            )
+            self.run_in_threads(backend, executor)
+
+            # The threads of jobs which timed out can't be waited for, see
+            # `finish`.
+            if self.recycle_reason != 'timeout':
+                executor.shutdown()
 
-            if item_count > 1000:
-                self.log(logging.INFO, "Exiting due to reaching item limit")
+            self.finish()
+            return
+
+        time_item_last_processed = datetime.datetime.utcnow()
+
+        self.log(logging.DEBUG, "Worker started")
+
+        while True:
+            # Always work through any prefetched jobs before exiting, as some
+            # backends won't otherwise deliver them again.
+            if not self.job_buffer and self.should_exit(time_item_last_processed):
                 break
 
             try:
@@ -99,24 +214,139 @@ class Worker:
             except KeyboardInterrupt:
                 sys.exit(1)
 
+        self.finish()
+
+    async def arun(self, backend: BaseBackend) -> None:
+        """
+        Run jobs as tasks within an event loop, at most `async_concurrency` at
+        once, as `run_in_threads` does with threads.
+        """
+        assert self.async_concurrency is not None
+
+        time_item_last_processed = datetime.datetime.utcnow()
+        exiting = False
+
+        while True:
+            exiting = (
+                exiting or
+                self.recycle_reason == 'timeout' or
+                self.should_exit(time_item_last_processed)
+            )
+            if exiting and not self.running_tasks:
+                break
+
+            if not exiting and len(self.running_tasks) < self.async_concurrency:
+                # Dequeuing waits for jobs, so only check on the running ones
+                # afterwards.
+                await self.astart_jobs(backend, self.async_concurrency)
+                timeout = 0
+            else:
+                timeout = 1
+
+            if await self.afinish_jobs(backend, timeout):
+                time_item_last_processed = datetime.datetime.utcnow()
+
+    def run_in_threads(self, backend: BaseBackend, executor: ThreadPoolExecutor) -> None:
+        """
+        Run jobs in the given executor's threads, one per thread at a time, as
+        `run` does for workers which run jobs in their main thread.
+
+        Each thread is given another job as soon as its last one finishes, and
+        each job is reported to the backend as processed as soon as it finishes.
+        Once the worker is due to exit no more jobs are started, but those which
+        are running are waited for.
+        """
+        time_item_last_processed = datetime.datetime.utcnow()
+        exiting = False
+
+        while True:
+            exiting = (
+                exiting or
+                self.recycle_reason == 'timeout' or
+                self.should_exit(time_item_last_processed)
+            )
+            if exiting and not self.running_jobs:
+                break
+
+            try:
+                if not exiting and len(self.running_jobs) < self.threads:
+                    # Dequeuing waits for jobs, so only check on the running
+                    # ones afterwards.
+                    self.start_jobs(backend, executor)
+                    timeout = 0
+                else:
+                    # Timeouts are in whole seconds anyway.
+                    timeout = 1
+
+                if self.finish_jobs(backend, timeout):
+                    time_item_last_processed = datetime.datetime.utcnow()
+
+            except KeyboardInterrupt:
+                sys.exit(1)
+
+    def finish(self) -> None:
         self.log(logging.DEBUG, "Exiting")
 
+        if self.recycle_reason == 'timeout':
+            # Threads can't be stopped, and the interpreter would wait for
+            # those of the jobs which timed out before exiting, so exit
+            # immediately instead.
+            logging.shutdown()
+            os._exit(RECYCLE_EXIT_CODES[self.recycle_reason])
+
+        if self.recycle_reason is not None:
+            sys.exit(RECYCLE_EXIT_CODES[self.recycle_reason])
+
+    def should_exit(self, time_item_last_processed: datetime.datetime) -> bool:
+        if not self.running:
+            return True
+
+        self.recycle_reason = self.get_recycle_reason(time_item_last_processed)
+        return self.recycle_reason is not None
+
+    def get_recycle_reason(self, time_item_last_processed: datetime.datetime) -> Optional[str]:
+        if self.idle_time_reached(time_item_last_processed):
+            self.log(logging.INFO, "Exiting due to reaching idle time limit")
+            return 'idle'
+
+        if self.max_jobs is not None and self.job_count >= self.max_jobs:
+            self.log(logging.INFO, "Exiting due to reaching item limit")
+            return 'jobs'
+
+        if self.max_rss is not None or app_settings.ENABLE_PROMETHEUS:
+            rss = current_rss()
+
+            if rss is not None and app_settings.ENABLE_PROMETHEUS:
+                worker_rss.labels(self.queue).set(rss)
+
+            if rss is not None and self.max_rss is not None and rss > self.max_rss:
+                self.log(logging.INFO, "Exiting due to reaching memory limit ({} bytes)".format(rss))
+                return 'memory'
+
+        return None
+
     def _handle_sigusr2(self, signum: int, frame: object) -> None:
         self.running = False
 
     def idle_time_reached(self, time_item_last_processed: datetime.datetime) -> bool:
+        if self.max_idle_time is None:
+            return False
+
         idle_time = datetime.datetime.utcnow() - time_item_last_processed
 
-        return idle_time > datetime.timedelta(minutes=30)
+        return idle_time > datetime.timedelta(seconds=self.max_idle_time)
 
-    def process(self, backend: BaseBackend) -> bool:
-        self.log(logging.DEBUG, "Checking backend for items")
+    def export_queue_depth(self, backend: BackendWithPriorities) -> None:
+        REGISTRY.register(QueueDepthCollector(backend, self.queues))
 
-        self.set_process_title("Waiting for items")
+    def process(self, backend: BaseBackend) -> bool:
+        if self.round_robin is not None:
+            assert isinstance(backend, BackendWithQueueGroups)
+            return self.process_group(backend, self.round_robin)
 
-        self.configure_cancellation(timeout=None, sigkill_on_stop=True)
+        self.log(logging.DEBUG, "Checking backend for items")
 
-        job = backend.dequeue(self.queue, self.worker_num, 15)
+        job = self.next_job(backend)
         if job is None:
             return False
 
@@ -128,25 +358,284 @@ class Worker:
 
         self.set_process_title("Running job {}".format(job))
 
-        if job.run(queue=self.queue, worker_num=self.worker_num) and self.touch_filename:
-            with open(self.touch_filename, 'a'):
-                os.utime(self.touch_filename, None)
+        if job.run(queue=self.queue, worker_num=self.worker_num):
+            self.touch()
 
+        self.job_count += 1
+        # Report each job as processed as soon as it has run, even if it was
+        # prefetched, so that it isn't run again if the worker dies part way
+        # through the buffer.
         backend.processed_job(self.queue, self.worker_num, job)
 
-        # Emulate Django's request_finished signal and close all of our
-        # connections. Django assumes that making a DB connection is cheap, so
-        # it's probably safe to assume that too.
-        for x in connections:
-            try:
-                # Removed in recent versions
-                transaction.abort(x)
-            except AttributeError:
-                pass
-            connections[x].close()
+        close_connections()
+
+        return True
+
+    def process_group(
+        self,
+        backend: BackendWithQueueGroups,
+        round_robin: 'WeightedRoundRobin',
+    ) -> bool:
+        """
+        Run a single job from the worker's group of queues, taking it from the
+        first queue in weighted order which has one.
+        """
+        self.log(logging.DEBUG, "Checking backend for items")
+
+        self.set_process_title("Waiting for items")
+        self.configure_cancellation(timeout=None, sigkill_on_stop=True)
+
+        dequeued = backend.dequeue_any(round_robin.order(), self.worker_num, 15)
+        if dequeued is None:
+            round_robin.served(None)
+            return False
+
+        queue, job = dequeued
+        round_robin.served(queue)
+
+        self.configure_cancellation(
+            timeout=job.timeout,
+            sigkill_on_stop=job.sigkill_on_stop,
+        )
+
+        self.set_process_title("Running job {} from {}".format(job, queue))
+
+        if job.run(queue=queue, worker_num=self.worker_num):
+            self.touch()
+
+        self.job_count += 1
+        backend.processed_job(queue, self.worker_num, job)
+
+        close_connections()
+
+        return True
+
+    def start_jobs(self, backend: BaseBackend, executor: ThreadPoolExecutor) -> None:
+        """
+        Dequeue jobs for the free threads of the given executor and start
+        running them.
+        """
+        self.log(logging.DEBUG, "Checking backend for items")
+
+        if not self.running_jobs:
+            self.set_process_title("Waiting for items")
+            self.configure_cancellation(timeout=None, sigkill_on_stop=True)
+
+        count = self.threads - len(self.running_jobs)
+        if self.job_buffer:
+            jobs = self.take_buffered_jobs(count)
+        else:
+            # Jobs which are still running mustn't be dequeued again, and we
+            # only wait briefly for new jobs while they are, so as to notice
+            # them finishing.
+            jobs = self.buffer_excess_jobs(backend.bulk_dequeue(
+                self.queue,
+                self.worker_num,
+                1 if self.running_jobs else 15,
+                count,
+                recover=not self.running_jobs,
+            ), count)
+
+        now = time.monotonic()
+        for job in jobs:
+            future = executor.submit(self.run_in_thread, job)
+            deadline = None if job.timeout is None else now + job.timeout
+            self.running_jobs[future] = (job, now, deadline)
+
+        self.update_running_jobs([job for job, _, _ in self.running_jobs.values()])
+
+    def finish_jobs(self, backend: BaseBackend, timeout: float) -> bool:
+        """
+        Wait for up to the given number of seconds for any of the running jobs
+        to finish, then report those which have finished, or have timed out,
+        to the backend as processed.
+
+        Returns whether any jobs finished.
+        """
+        if not self.running_jobs:
+            return False
+
+        now = time.monotonic()
+        deadlines = [x for _, _, x in self.running_jobs.values() if x is not None]
+        if deadlines:
+            timeout = max(min(timeout, min(deadlines) - now), 0)
+
+        wait(self.running_jobs, timeout=timeout, return_when=FIRST_COMPLETED)
+
+        now = time.monotonic()
+        finished = []
+        for future, (job, started, deadline) in list(self.running_jobs.items()):
+            if future.done():
+                if app_settings.ENABLE_PROMETHEUS:
+                    job_duration.labels(self.queue).observe(now - started)
+            elif deadline is not None and now >= deadline:
+                self._handle_job_timeout(job)
+            else:
+                continue
+
+            del self.running_jobs[future]
+            finished.append(job)
+
+        if not finished:
+            return False
+
+        self.job_count += len(finished)
+        backend.bulk_processed_jobs(self.queue, self.worker_num, finished)
+
+        self.update_running_jobs([job for job, _, _ in self.running_jobs.values()])
+
+        return True
+
+    def buffer_excess_jobs(self, jobs: List[Job], count: int) -> List[Job]:
+        """
+        Return up to `count` of the given just dequeued jobs to start now,
+        keeping the rest in `job_buffer` until there's room for them.
+
+        Backends return all the jobs they recover at once, whatever the count.
+        Starting only as many as there's room for means that their timeouts
+        don't start until they do. The others are still recovered by the
+        backend if the worker exits before starting them.
+        """
+        self.job_buffer.extend(jobs[count:])
+        return jobs[:count]
+
+    def take_buffered_jobs(self, count: int) -> List[Job]:
+        return [self.job_buffer.popleft() for _ in range(min(count, len(self.job_buffer)))]
+
+    def update_running_jobs(self, jobs: List[Job]) -> None:
+        if not jobs:
+            return
+
+        # The master's timeouts apply to the whole process, so the timeouts of
+        # the jobs are enforced by the worker instead.
+        self.configure_cancellation(
+            timeout=None,
+            sigkill_on_stop=any(job.sigkill_on_stop for job in jobs),
+        )
+
+        self.set_process_title("Running {} jobs".format(len(jobs)))
+
+    async def astart_jobs(self, backend: BaseBackend, concurrency: int) -> None:
+        """
+        Dequeue jobs up to the given number running at once and start running
+        them as tasks, as `start_jobs` does with threads.
+        """
+        self.log(logging.DEBUG, "Checking backend for items")
+
+        if not self.running_tasks:
+            self.set_process_title("Waiting for items")
+            self.configure_cancellation(timeout=None, sigkill_on_stop=True)
+
+        count = concurrency - len(self.running_tasks)
+        if self.job_buffer:
+            jobs = self.take_buffered_jobs(count)
+        else:
+            jobs = self.buffer_excess_jobs(await backend.abulk_dequeue(
+                self.queue,
+                self.worker_num,
+                1 if self.running_tasks else 15,
+                count,
+                recover=not self.running_tasks,
+            ), count)
+
+        now = time.monotonic()
+        for job in jobs:
+            self.running_tasks[asyncio.ensure_future(self.arun_job(job))] = (job, now)
+
+        self.update_running_jobs([job for job, _ in self.running_tasks.values()])
+
+    async def afinish_jobs(self, backend: BaseBackend, timeout: float) -> bool:
+        """
+        Wait for up to the given number of seconds for any of the running tasks
+        to finish, then report their jobs to the backend as processed, as
+        `finish_jobs` does with threads.
+
+        Returns whether any jobs finished.
+        """
+        if not self.running_tasks:
+            return False
+
+        done, _ = await asyncio.wait(
+            list(self.running_tasks),
+            timeout=timeout,
+            return_when=asyncio.FIRST_COMPLETED,
+        )
+        if not done:
+            return False
+
+        now = time.monotonic()
+        finished = []
+        for task in done:
+            job, started = self.running_tasks.pop(task)
+            finished.append(job)
+
+            if app_settings.ENABLE_PROMETHEUS:
+                job_duration.labels(self.queue).observe(now - started)
+
+        self.job_count += len(finished)
+        await backend.abulk_processed_jobs(self.queue, self.worker_num, finished)
+
+        # Synchronous tasks are run in Django's thread for synchronous code,
+        # one at a time, so its connections are closed there.
+        await sync_to_async(close_connections)()
+
+        self.update_running_jobs([job for job, _ in self.running_tasks.values()])
 
         return True
 
+    async def arun_job(self, job: Job) -> None:
+        # Jobs which time out are cancelled here, rather than by the alarm.
+        try:
+            succeeded = await asyncio.wait_for(
+                job.arun(queue=self.queue, worker_num=self.worker_num),
+                timeout=job.timeout,
+            )
+        except asyncio.TimeoutError:
+            self.log(logging.ERROR, "Job {} has timed out".format(job))
+
+            if not asyncio.iscoroutinefunction(job.get_task_instance().fn):
+                # Only the await was cancelled: the task is still running in
+                # Django's thread for synchronous code, which the worker's
+                # other synchronous jobs would queue behind. As with threads,
+                # the worker starts no more jobs and is recycled once its
+                # other jobs have finished.
+                self.recycle_reason = 'timeout'
+            return
+
+        if succeeded:
+            self.touch()
+
+    def run_in_thread(self, job: Job) -> None:
+        if job.run(queue=self.queue, worker_num=self.worker_num):
+            self.touch()
+
+        # Database connections are per thread, so must be closed by the thread
+        # which used them.
+        close_connections()
+
+    def next_job(self, backend: BaseBackend) -> Optional[Job]:
+        if not self.job_buffer:
+            self.set_process_title("Waiting for items")
+
+            self.configure_cancellation(timeout=None, sigkill_on_stop=True)
+
+            if self.prefetch_count > 1:
+                self.job_buffer.extend(backend.bulk_dequeue(
+                    self.queue,
+                    self.worker_num,
+                    15,
+                    self.prefetch_count,
+                ))
+            else:
+                job = backend.dequeue(self.queue, self.worker_num, 15)
+                if job is not None:
+                    self.job_buffer.append(job)
+
+        if not self.job_buffer:
+            return None
+
+        return self.job_buffer.popleft()
+
     def configure_cancellation(self, timeout: Optional[int], sigkill_on_stop: bool) -> None:
         if sigkill_on_stop:
             # SIGUSR2 can be taken to just cause the process to die
@@ -167,6 +656,15 @@ class Worker:
             # Cancel any scheduled alarms
             signal.alarm(0)
 
+    def _handle_job_timeout(self, job: Job) -> None:
+        # Log for observability
+        self.log(logging.ERROR, "Job {} has timed out".format(job))
+
+        # Threads can't be stopped, so the job is given up on and the worker
+        # is recycled, once its other jobs have finished, to be rid of the
+        # job's thread.
+        self.recycle_reason = 'timeout'
+
     def _handle_alarm(self, signal_number: int, frame: object) -> None:
         # Log for observability
         self.log(logging.ERROR, "Alarm received: job has timed out")
@@ -178,6 +676,11 @@ class Worker:
         # TODO(python-upgrade): use signal.raise_signal on Python 3.8+
         os.kill(os.getpid(), signal.SIGALRM)
 
+    def touch(self) -> None:
+        if self.touch_filename:
+            with open(self.touch_filename, 'a'):
+                os.utime(self.touch_filename, None)
+
     def set_process_title(self, *titles: str) -> None:
         set_process_title(self.name, *titles)
 
@@ -186,3 +689,130 @@ class Worker:
             'queue': self.queue,
             'worker': self.worker_num,
         })
+
+
+class QueueDepthCollector(Collector):
+    """
+    Exports the number of jobs waiting at each priority of the given queues as
+    `queue_depth`, measured when the metrics are scraped. The lengths of each
+    queue are fetched together, rather than separately for each priority.
+    """
+
+    def __init__(
+        self,
+        backend: BackendWithPriorities,
+        queues: Sequence[QueueName],
+    ) -> None:
+        self.backend = backend
+        self.queues = queues
+
+    def describe(self) -> List[GaugeMetricFamily]:
+        # Saves the registry collecting the metric to find out its name.
+        return [self.metric()]
+
+    def collect(self) -> List[GaugeMetricFamily]:
+        metric = self.metric()
+        for queue in self.queues:
+            for priority, length in self.backend.length_by_priority(queue).items():
+                metric.add_metric([queue, str(priority)], length)
+        return [metric]
+
+    def metric(self) -> GaugeMetricFamily:
+        return GaugeMetricFamily(
+            'queue_depth',
+            "Number of jobs waiting in the queue",
+            labels=['queue', 'priority'],
+        )
+
+
+class WeightedRoundRobin:
+    """
+    Orders the queues of a group for each dequeue such that, while they all
+    have jobs waiting, each is served in proportion to its weight.
+
+    This is smooth weighted round robin (as nginx balances upstreams): before
+    each dequeue every queue earns its weight in credit, queues are tried in
+    order of their credit and the queue which is served pays the total of the
+    weights. Queues therefore can't be starved, however low their weight.
+
+    Queues which were tried before the one which was served had no jobs, so
+    lose any credit they had rather than building it up into a burst. Credit
+    is also bounded, so that a queue which is served while the others are
+    empty doesn't build up a debt.
+    """
+
+    def __init__(self, weights: Mapping[QueueName, int]) -> None:
+        if any(weight < 1 for weight in weights.values()):
+            raise ValueError("The weights of queues must be positive integers.")
+
+        self.weights = dict(weights)
+        self.total = sum(self.weights.values())
+        self.credits = dict.fromkeys(self.weights, 0)
+        self._order = list(self.weights)
+
+    def order(self) -> List[QueueName]:
+        for queue, weight in self.weights.items():
+            self.credits[queue] += weight
+
+        # Ties are broken by the configured order.
+        self._order = sorted(self.weights, key=lambda queue: -self.credits[queue])
+        return list(self._order)
+
+    def served(self, served_queue: Optional[QueueName]) -> None:
+        """
+        Record which queue (if any) was served from the last order.
+        """
+        for queue in self._order:
+            if queue == served_queue:
+                self.credits[queue] = max(self.credits[queue] - self.total, -self.total)
+                break
+
+            self.credits[queue] = min(self.credits[queue], 0)
+
+
+def current_rss() -> Optional[int]:
+    """
+    The resident set size of this process in bytes, or None where that can't
+    be found cheaply (i.e. other than on Linux).
+    """
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except OSError:
+        return None
+
+
+def close_connections() -> None:
+    if app_settings.REUSE_DB_CONNECTIONS:
+        close_old_connections()
+        return
+
+    # Emulate Django's request_finished signal and close all of our
+    # connections. Django assumes that making a DB connection is cheap, so
+    # it's probably safe to assume that too.
+    for x in connections:
+        try:
+            # Removed in recent versions
+            transaction.abort(x)
+        except AttributeError:
+            pass
+        connections[x].close()
+
+
+def close_old_connections() -> None:
+    # Emulate `django.db.close_old_connections`, which Django runs around each
+    # request, closing only the connections which have outlived CONN_MAX_AGE,
+    # have had errors and fail a check, or were left in a transaction (closing
+    # them rolls it back). Those which are kept are health checked before
+    # their next use if CONN_HEALTH_CHECKS is set.
+    for connection in connections.all():
+        if connection.connection is None:
+            continue
+
+        connection.close_if_unusable_or_obsolete()
+
+        if app_settings.ENABLE_PROMETHEUS:
+            db_connections.labels(
+                connection.alias,
+                'closed' if connection.connection is None else 'reused',
+            ).inc()
@@ -1,4 +1,14 @@
+from typing import Any, Callable
+from unittest import mock
+
 import redis
+import fakeredis
+
+from django_lightweight_queue.utils import get_path, get_backend
+from django_lightweight_queue.backends.base import BaseBackend
+from django_lightweight_queue.backends.redis_utils import (
+    get_shared_redis_client,
+)
 
 
 class RedisCleanupMixin(object):
@@ -19,3 +29,52 @@ class RedisCleanupMixin(object):
             self.client.delete(key)
 
         super(RedisCleanupMixin, self).tearDown()
+
+
+class FakeBackendMixin(object):
+    """
+    Provides `self.backend`, an instance of `backend_class` using fakeredis, as
+    the backend at the 'test-backend' path, for use with
+    `override_settings(LIGHTWEIGHT_QUEUE_BACKEND='test-backend')`.
+    """
+    backend_class = NotImplemented  # type: Callable[[], BaseBackend]
+
+    def setUp(self):
+        get_backend.cache_clear()
+        get_shared_redis_client.cache_clear()
+
+        # Clients, including those for asyncio, may be created as the tests
+        # run, so are faked throughout.
+        for path, fake in (
+            ('redis.StrictRedis', fakeredis.FakeStrictRedis),
+            ('redis.asyncio.StrictRedis', fakeredis.FakeAsyncRedis),
+        ):
+            redis_patch = mock.patch(path, fake)
+            redis_patch.start()
+            self.addCleanup(redis_patch.stop)
+
+        self.backend = self.backend_class()
+        self.client = self.backend.client
+
+        # Mock get_backend. Unfortunately due to the naming of the 'task'
+        # decorator class being the same as its containing module and it being
+        # exposed as the symbol at django_lightweight_queue.task, we cannot mock
+        # this in the normal way. Instead we mock get_path (which get_backend
+        # calls) and intercept the our dummy value.
+        def mocked_get_path(path: str) -> Any:
+            if path == 'test-backend':
+                return lambda: self.backend
+            return get_path(path)
+
+        get_path_patch = mock.patch(
+            'django_lightweight_queue.utils.get_path',
+            side_effect=mocked_get_path,
+        )
+        get_path_patch.start()
+        self.addCleanup(get_path_patch.stop)
+
+        super(FakeBackendMixin, self).setUp()
+
+    def tearDown(self):
+        super(FakeBackendMixin, self).tearDown()
+        get_backend.cache_clear()
@@ -0,0 +1,182 @@
+from typing import List, Tuple
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from django_lightweight_queue.types import QueueName, WorkerNumber
+from django_lightweight_queue.utils import (
+    get_queue_counts,
+    get_min_queue_counts,
+)
+from django_lightweight_queue.autoscaling import Autoscaler
+from django_lightweight_queue.backends.base import BackendWithPause
+
+QUEUE = QueueName('autoscaled-queue')
+OTHER_QUEUE = QueueName('other-queue')
+
+
+@override_settings(
+    LIGHTWEIGHT_QUEUE_WORKERS={QUEUE: 1, OTHER_QUEUE: 1},
+    LIGHTWEIGHT_QUEUE_MAX_WORKERS={QUEUE: 3},
+    LIGHTWEIGHT_QUEUE_AUTOSCALE_BACKLOG_PER_WORKER=10,
+    LIGHTWEIGHT_QUEUE_AUTOSCALE_INTERVAL=5,
+    LIGHTWEIGHT_QUEUE_AUTOSCALE_UP_COOLDOWN=30,
+    LIGHTWEIGHT_QUEUE_AUTOSCALE_DOWN_COOLDOWN=120,
+)
+class AutoscalerTests(SimpleTestCase):
+    longMessage = True
+
+    def setUp(self) -> None:
+        super().setUp()
+
+        self.backend = mock.Mock(spec=BackendWithPause)
+        self.backend.length.return_value = 0
+        self.backend.is_paused.return_value = False
+
+        get_backend_patch = mock.patch(
+            'django_lightweight_queue.autoscaling.get_backend',
+            return_value=self.backend,
+        )
+        get_backend_patch.start()
+        self.addCleanup(get_backend_patch.stop)
+
+        implied_queues_patch = mock.patch(
+            'django_lightweight_queue.utils._accepting_implied_queues',
+            new=False,
+        )
+        implied_queues_patch.start()
+        self.addCleanup(implied_queues_patch.stop)
+
+        self.now = 1000.0
+        self.logger = mock.Mock()
+
+    def autoscaler(self, worker_nums: List[int]) -> Autoscaler:
+        worker_names = [
+            (QUEUE, WorkerNumber(x)) for x in worker_nums
+        ] + [(OTHER_QUEUE, WorkerNumber(1))]
+        return Autoscaler(worker_names, self.logger, clock=lambda: self.now)
+
+    def update_at(
+        self,
+        autoscaler: Autoscaler,
+        now: float,
+        length: int,
+    ) -> List[Tuple[QueueName, WorkerNumber]]:
+        self.now = now
+        self.backend.length.return_value = length
+        return autoscaler.update()
+
+    def assertEnabled(self, autoscaler: Autoscaler, expected: List[int]) -> None:
+        self.assertEqual(
+            expected,
+            [x for x in (1, 2, 3) if autoscaler.is_enabled(QUEUE, WorkerNumber(x))],
+            "Wrong workers enabled",
+        )
+
+    def test_worker_counts(self) -> None:
+        self.assertEqual({QUEUE: 3, OTHER_QUEUE: 1}, get_queue_counts())
+        self.assertEqual({QUEUE: 1, OTHER_QUEUE: 1}, get_min_queue_counts())
+
+    def test_starts_at_minimum(self) -> None:
+        autoscaler = self.autoscaler([1, 2, 3])
+
+        self.assertEnabled(autoscaler, [1])
+        self.assertTrue(
+            autoscaler.is_enabled(OTHER_QUEUE, WorkerNumber(1)),
+            "Queues which aren't autoscaled should always be enabled",
+        )
+
+    def test_scales_up_to_backlog(self) -> None:
+        autoscaler = self.autoscaler([1, 2, 3])
+
+        self.assertEqual([], self.update_at(autoscaler, 1000, 15))
+        self.assertEnabled(autoscaler, [1, 2])
+
+        self.update_at(autoscaler, 1010, 100)
+        self.assertFalse(
+            autoscaler.is_enabled(QUEUE, WorkerNumber(3)),
+            "Should wait for the cooldown between adding workers",
+        )
+
+        self.update_at(autoscaler, 1030, 100)
+        self.assertEnabled(autoscaler, [1, 2, 3])
+
+    def test_samples_at_interval(self) -> None:
+        autoscaler = self.autoscaler([1, 2, 3])
+
+        self.update_at(autoscaler, 1000, 0)
+        self.update_at(autoscaler, 1004, 0)
+        self.update_at(autoscaler, 1005, 0)
+
+        self.assertEqual(2, self.backend.length.call_count)
+
+    def test_scales_down_once_idle(self) -> None:
+        autoscaler = self.autoscaler([1, 2, 3])
+        self.update_at(autoscaler, 1000, 100)
+
+        self.update_at(autoscaler, 1100, 0)
+        self.assertEqual(
+            [],
+            self.update_at(autoscaler, 1200, 0),
+            "Should wait for the queue to be idle for the cooldown",
+        )
+        self.assertEnabled(autoscaler, [1, 2, 3])
+
+        self.assertEqual([(QUEUE, 3)], self.update_at(autoscaler, 1220, 0))
+        self.assertEnabled(autoscaler, [1, 2])
+
+        self.assertEqual(
+            [],
+            self.update_at(autoscaler, 1300, 0),
+            "Should wait for the cooldown between removing workers",
+        )
+        self.assertEqual([(QUEUE, 2)], self.update_at(autoscaler, 1340, 0))
+        self.assertEnabled(autoscaler, [1])
+
+        self.assertEqual([], self.update_at(autoscaler, 2000, 0))
+
+    def test_backlog_resets_idle_time(self) -> None:
+        autoscaler = self.autoscaler([1, 2, 3])
+        self.update_at(autoscaler, 1000, 100)
+
+        self.update_at(autoscaler, 1100, 0)
+        self.update_at(autoscaler, 1200, 5)
+
+        self.assertEqual([], self.update_at(autoscaler, 1250, 0))
+        self.assertEnabled(autoscaler, [1, 2, 3])
+
+    def test_paused_queue_not_scaled_up(self) -> None:
+        autoscaler = self.autoscaler([1, 2, 3])
+        self.backend.is_paused.return_value = True
+
+        self.update_at(autoscaler, 1000, 100)
+
+        self.assertEnabled(autoscaler, [1])
+
+    def test_sampling_failure(self) -> None:
+        autoscaler = self.autoscaler([1, 2, 3])
+        self.backend.length.side_effect = ConnectionError
+
+        self.assertEqual([], self.update_at(autoscaler, 1000, 100))
+
+        self.assertEnabled(autoscaler, [1])
+        self.logger.exception.assert_called_once()
+
+    def test_only_returns_workers_of_this_machine(self) -> None:
+        # Another machine in the pool runs worker 2.
+        autoscaler = self.autoscaler([1, 3])
+        self.update_at(autoscaler, 1000, 100)
+
+        self.update_at(autoscaler, 1100, 0)
+        self.assertEqual([(QUEUE, 3)], self.update_at(autoscaler, 1220, 0))
+        self.assertEqual([], self.update_at(autoscaler, 1340, 0))
+        self.assertEnabled(autoscaler, [1])
+
+    def test_is_scaled(self) -> None:
+        autoscaler = self.autoscaler([1, 2, 3])
+
+        self.assertEqual(
+            [2, 3],
+            [x for x in (1, 2, 3) if autoscaler.is_scaled(QUEUE, WorkerNumber(x))],
+        )
+        self.assertFalse(autoscaler.is_scaled(OTHER_QUEUE, WorkerNumber(1)))
@@ -0,0 +1,164 @@
+from typing import Any
+from unittest import mock
+
+from django.http import HttpRequest, HttpResponse
+from django.test import SimpleTestCase, override_settings
+
+from django_lightweight_queue import task, batch, abatch
+from django_lightweight_queue.types import QueueName, WorkerNumber
+from django_lightweight_queue.batching import BatchEnqueueMiddleware
+from django_lightweight_queue.backends.redis import RedisBackend
+
+from . import settings
+from .mixins import FakeBackendMixin, RedisCleanupMixin
+
+QUEUE = QueueName('batch-queue')
+OTHER_QUEUE = QueueName('other-batch-queue')
+
+
+@task(str(QUEUE))
+def dummy_task(num: int) -> None:
+    pass
+
+
+@task(str(OTHER_QUEUE))
+def other_task(num: int) -> None:
+    pass
+
+
+@override_settings(LIGHTWEIGHT_QUEUE_BACKEND='test-backend')
+class BatchTests(FakeBackendMixin, RedisCleanupMixin, SimpleTestCase):
+    longMessage = True
+    backend_class = RedisBackend
+    prefix = settings.LIGHTWEIGHT_QUEUE_REDIS_PREFIX
+
+    def dequeued_args(self, queue: QueueName) -> Any:
+        return [
+            job.args
+            for job in self.backend.bulk_dequeue(queue, WorkerNumber(1), timeout=1, count=10)
+        ]
+
+    def test_batch(self) -> None:
+        with mock.patch.object(
+            self.backend,
+            'bulk_enqueue_many',
+            wraps=self.backend.bulk_enqueue_many,
+        ) as bulk_enqueue_many:
+            with batch():
+                dummy_task(1)
+                other_task(2)
+                dummy_task(3)
+
+                self.assertEqual(0, self.backend.length(QUEUE), "Should not enqueue until exit")
+
+        bulk_enqueue_many.assert_called_once_with({
+            QUEUE: [mock.ANY, mock.ANY],
+            OTHER_QUEUE: [mock.ANY],
+        })
+
+        self.assertEqual([[1], [3]], self.dequeued_args(QUEUE))
+        self.assertEqual([[2]], self.dequeued_args(OTHER_QUEUE))
+
+    def test_nested_batch(self) -> None:
+        with batch():
+            with batch():
+                dummy_task(1)
+
+            self.assertEqual(0, self.backend.length(QUEUE), "Should wait for outer batch")
+
+        self.assertEqual([[1]], self.dequeued_args(QUEUE))
+
+    def test_batch_enqueues_on_exception(self) -> None:
+        def fail_in_batch() -> None:
+            with batch():
+                dummy_task(1)
+                raise ValueError()
+
+        with self.assertRaises(ValueError):
+            fail_in_batch()
+
+        self.assertEqual([[1]], self.dequeued_args(QUEUE))
+
+    def test_batch_on_commit(self) -> None:
+        with mock.patch(
+            'django_lightweight_queue.batching.transaction.on_commit',
+        ) as on_commit:
+            with batch(on_commit=True):
+                dummy_task(1)
+
+        self.assertEqual(0, self.backend.length(QUEUE), "Should wait for the commit")
+
+        (callback,), _ = on_commit.call_args
+        callback()
+
+        self.assertEqual([[1]], self.dequeued_args(QUEUE))
+
+    def test_nested_batch_on_commit(self) -> None:
+        with mock.patch(
+            'django_lightweight_queue.batching.transaction.on_commit',
+        ) as on_commit:
+            with batch():
+                dummy_task(1)
+
+                with batch(on_commit=True, using='other'):
+                    dummy_task(2)
+
+                on_commit.assert_called_once_with(mock.ANY, using='other')
+
+        self.assertEqual(
+            [[1]],
+            self.dequeued_args(QUEUE),
+            "Should not enqueue the inner batch's jobs unless the transaction commits",
+        )
+
+        (callback,), _ = on_commit.call_args
+        callback()
+
+        self.assertEqual([[2]], self.dequeued_args(QUEUE))
+
+    def test_nested_batch_committed_within_outer_batch(self) -> None:
+        with mock.patch(
+            'django_lightweight_queue.batching.transaction.on_commit',
+        ) as on_commit:
+            with batch():
+                with batch(on_commit=True):
+                    dummy_task(1)
+
+                (callback,), _ = on_commit.call_args
+                callback()
+
+                self.assertEqual(0, self.backend.length(QUEUE), "Should join the outer batch")
+
+        self.assertEqual([[1]], self.dequeued_args(QUEUE))
+
+    def test_middleware(self) -> None:
+        def get_response(request: HttpRequest) -> HttpResponse:
+            dummy_task(1)
+            other_task(2)
+            self.assertEqual(0, self.backend.length(QUEUE), "Should not enqueue until exit")
+            return HttpResponse()
+
+        BatchEnqueueMiddleware(get_response)(HttpRequest())
+
+        self.assertEqual([[1]], self.dequeued_args(QUEUE))
+        self.assertEqual([[2]], self.dequeued_args(OTHER_QUEUE))
+
+    async def test_abatch(self) -> None:
+        with mock.patch.object(
+            self.backend,
+            'abulk_enqueue_many',
+            wraps=self.backend.abulk_enqueue_many,
+        ) as abulk_enqueue_many:
+            async with abatch():
+                await dummy_task.aenqueue(1)
+                other_task(2)
+
+                self.assertEqual(0, self.backend.length(QUEUE), "Should not enqueue until exit")
+
+        abulk_enqueue_many.assert_called_once_with({
+            QUEUE: [mock.ANY],
+            OTHER_QUEUE: [mock.ANY],
+        })
+
+        self.assertEqual([[1]], self.dequeued_args(QUEUE))
+        self.assertEqual([[2]], self.dequeued_args(OTHER_QUEUE))
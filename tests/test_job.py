@@ -2,7 +2,11 @@ import datetime
 import unittest
 from typing import Any, Dict, Tuple, Optional
 
-from django_lightweight_queue.job import Job
+from django.test import override_settings
+
+from django_lightweight_queue.job import Job, parse_time
+
+MSGPACK_SERIALIZER = 'django_lightweight_queue.serializers.MsgpackSerializer'
 
 
 class JobTests(unittest.TestCase):
@@ -73,3 +77,122 @@ class JobTests(unittest.TestCase):
             job2.identity_without_created(),
             "Identities should match",
         )
+
+    def test_json_bytes_round_trip(self) -> None:
+        job = self.create_job(kwargs={'a': [1, 2]}, timeout=5)
+
+        data = job.to_bytes()
+
+        self.assertEqual(job.to_json().encode('utf-8'), data)
+        self.assertEqual(data, Job.from_bytes(data).to_bytes())
+        self.assertEqual(job.to_json(), Job.from_bytes(data).to_json())
+
+    @override_settings(LIGHTWEIGHT_QUEUE_SERIALIZER=MSGPACK_SERIALIZER)
+    def test_msgpack_bytes_round_trip(self) -> None:
+        job = self.create_job(kwargs={'a': [1, 2]}, timeout=5, sigkill_on_stop=True)
+        job.priority = 2
+
+        data = job.to_bytes()
+
+        self.assertEqual(b'\x01', data[:1], "Should be tagged with the format")
+        self.assertLess(len(data), len(job.to_json()), "Should be more compact than JSON")
+
+        actual = Job.from_bytes(data)
+
+        self.assertEqual(data, actual.to_bytes())
+        self.assertEqual(job.to_json(), actual.to_json())
+        self.assertEqual(job.created_time, actual.created_time)
+
+    @override_settings(LIGHTWEIGHT_QUEUE_SERIALIZER=MSGPACK_SERIALIZER)
+    def test_reads_json_when_msgpack_configured(self) -> None:
+        data = self.create_job().to_json().encode('utf-8')
+
+        job = Job.from_bytes(data)
+
+        self.assertEqual(data, job.to_bytes(), "Should preserve the stored format")
+        self.assertEqual(['args'], job.args)
+
+    def test_from_bytes_unknown_format(self) -> None:
+        with self.assertRaises(ValueError):
+            Job.from_bytes(b'\xff')
+
+    def test_no_instance_dict(self) -> None:
+        self.assertFalse(hasattr(self.create_job(), '__dict__'))
+
+    def test_created_time_parsed_on_demand(self) -> None:
+        job = self.create_job(created_time=datetime.datetime(2018, 1, 2, 3, 4, 5, 60000))
+
+        actual = Job.from_json(job.to_json())
+
+        self.assertEqual('2018-01-02 03:04:05.060000', actual.created_time_str)
+        self.assertEqual(job.created_time, actual.created_time)
+
+    def test_parse_time_falls_back_to_strptime(self) -> None:
+        self.assertEqual(
+            datetime.datetime(2018, 1, 2, 3, 4, 5, 500000),
+            parse_time('2018-01-02 03:04:05.5'),
+        )
+
+    @override_settings(LIGHTWEIGHT_QUEUE_SERIALIZER=MSGPACK_SERIALIZER)
+    def test_msgpack_arguments_decoded_on_demand(self) -> None:
+        job = self.create_job(args=('a',), kwargs={'b': 1})
+
+        actual = Job.from_bytes(job.to_bytes())
+
+        self.assertEqual('path', actual.path)
+        self.assertEqual(job.created_time, actual.created_time)
+        self.assertIsNotNone(actual._load_arguments, "Should not have decoded the arguments")
+
+        self.assertEqual(['a'], actual.args)
+        self.assertEqual({'b': 1}, actual.kwargs)
+        self.assertIsNone(actual._load_arguments)
+
+    @override_settings(LIGHTWEIGHT_QUEUE_COMPRESSION_THRESHOLD=100)
+    def test_compresses_large_jobs(self) -> None:
+        job = self.create_job(args=(list(range(100)),))
+
+        data = job.to_bytes()
+
+        self.assertEqual(b'\x02z', data[:2], "Should be tagged as compressed with zlib")
+        self.assertLess(len(data), len(job.to_json()))
+
+        actual = Job.from_bytes(data)
+
+        self.assertEqual(data, actual.to_bytes())
+        self.assertEqual(job.to_json(), actual.to_json())
+
+    @override_settings(LIGHTWEIGHT_QUEUE_COMPRESSION_THRESHOLD=1000)
+    def test_does_not_compress_small_jobs(self) -> None:
+        job = self.create_job()
+
+        self.assertEqual(job.to_json().encode('utf-8'), job.to_bytes())
+
+    def test_from_bytes_unknown_compression_codec(self) -> None:
+        with self.assertRaises(ValueError):
+            Job.from_bytes(b'\x02?')
+
+    def test_identity(self) -> None:
+        job1 = self.create_job(created_time=datetime.datetime(2018, 1, 1))
+        job2 = self.create_job(created_time=datetime.datetime(2018, 2, 2))
+        job3 = self.create_job(args=('other',))
+
+        self.assertEqual(16, len(job1.identity))
+        self.assertEqual(job1.identity, job2.identity, "Identities should match")
+        self.assertNotEqual(job1.identity, job3.identity, "Identities should differ")
+
+        job3.args = ('args',)
+        self.assertEqual(job1.identity, job3.identity, "Should update when args change")
+
+    @override_settings(LIGHTWEIGHT_QUEUE_SERIALIZER=MSGPACK_SERIALIZER)
+    def test_msgpack_stores_identity(self) -> None:
+        job = self.create_job()
+
+        actual = Job.from_bytes(job.to_bytes())
+
+        self.assertEqual(job.identity, actual.identity)
+        self.assertIsNotNone(actual._load_arguments, "Should not have decoded the arguments")
+        self.assertEqual(
+            Job.from_json(job.to_json()).identity,
+            actual.identity,
+            "Identity should not depend on the format",
+        )
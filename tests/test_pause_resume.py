@@ -12,6 +12,9 @@ from django_lightweight_queue.types import QueueName
 from django_lightweight_queue.utils import get_backend
 from django_lightweight_queue.backends.base import BackendWithPauseResume
 from django_lightweight_queue.backends.redis import RedisBackend
+from django_lightweight_queue.backends.redis_utils import (
+    get_shared_redis_client,
+)
 from django_lightweight_queue.management.commands.queue_pause import (
     TIME_FORMAT,
     parse_duration_to_time,
@@ -35,6 +38,7 @@ class PauseResumeTests(SimpleTestCase):
 
     def setUp(self) -> None:
         get_backend.cache_clear()
+        get_shared_redis_client.cache_clear()
 
         redis_patch = mock.patch(
             'redis.StrictRedis',
@@ -0,0 +1,539 @@
+import io
+import asyncio
+import datetime
+import threading
+import unittest.mock
+from typing import Any, Dict, List, Tuple, Optional
+
+import fakeredis
+
+from django.test import SimpleTestCase, override_settings
+from django.core.management import call_command
+
+from django_lightweight_queue.job import Job
+from django_lightweight_queue.types import QueueName, WorkerNumber
+from django_lightweight_queue.utils import get_backend
+from django_lightweight_queue.compression import decompress
+from django_lightweight_queue.backends.redis import RedisBackend
+from django_lightweight_queue.backends.redis_utils import (
+    PauseStateCache,
+    get_shared_redis_client,
+)
+
+from . import settings
+from .mixins import RedisCleanupMixin
+
+
+class RedisTests(RedisCleanupMixin, SimpleTestCase):
+    longMessage = True
+    prefix = settings.LIGHTWEIGHT_QUEUE_REDIS_PREFIX
+
+    def create_job(
+        self,
+        path: str = 'path',
+        args: Tuple[Any, ...] = ('args',),
+        kwargs: Optional[Dict[str, Any]] = None,
+        timeout: Optional[int] = None,
+        sigkill_on_stop: bool = False,
+        created_time: Optional[datetime.datetime] = None,
+        priority: int = 0,
+        unique: bool = False,
+    ) -> Job:
+        if created_time is None:
+            created_time = self.start_time
+
+        job = Job(path, args, kwargs or {}, timeout, sigkill_on_stop, priority, unique=unique)
+        job.created_time = created_time
+
+        return job
+
+    def enqueue_job(self, queue: QueueName, *args: Any, **kwargs: Any) -> Job:
+        job = self.create_job(*args, **kwargs)
+        self.backend.enqueue(job, queue)
+        return job
+
+    def setUp(self) -> None:
+        get_backend.cache_clear()
+        get_shared_redis_client.cache_clear()
+
+        # Clients for other servers are created lazily
+        redis_patch = unittest.mock.patch('redis.StrictRedis', fakeredis.FakeStrictRedis)
+        redis_patch.start()
+        self.addCleanup(redis_patch.stop)
+
+        self.backend = RedisBackend()
+        self.client = self.backend.client
+
+        super(RedisTests, self).setUp()
+
+        self.start_time = datetime.datetime.utcnow()
+
+    def tearDown(self) -> None:
+        get_backend.cache_clear()
+        super().tearDown()
+
+    def test_bulk_dequeue(self) -> None:
+        QUEUE = QueueName('job-queue')
+
+        for num in range(5):
+            self.enqueue_job(QUEUE, args=[num])
+
+        jobs = self.backend.bulk_dequeue(QUEUE, WorkerNumber(0), timeout=1, count=3)
+
+        self.assertEqual(
+            [[0], [1], [2]],
+            [x.args for x in jobs],
+            "Should have dequeued the oldest jobs, in order",
+        )
+        self.assertEqual(2, self.backend.length(QUEUE))
+
+        jobs = self.backend.bulk_dequeue(QUEUE, WorkerNumber(0), timeout=1, count=3)
+
+        self.assertEqual(
+            [[3], [4]],
+            [x.args for x in jobs],
+            "Should have dequeued the remaining jobs",
+        )
+        self.assertEqual(0, self.backend.length(QUEUE))
+
+    def test_deduplicate_preserves_order(self) -> None:
+        QUEUE = QueueName('job-queue')
+
+        self.enqueue_job(QUEUE, args=['args1'])
+        self.enqueue_job(QUEUE, args=['args2'])
+        self.enqueue_job(QUEUE, args=['args1'])
+        self.enqueue_job(QUEUE, args=['args3'])
+        self.enqueue_job(QUEUE, args=['args2'])
+
+        result = self.backend.deduplicate(QUEUE)
+        self.assertEqual(
+            (5, 3),
+            result,
+            "Should remove duplicate entries from queue",
+        )
+
+        args = []
+        while True:
+            job = self.backend.dequeue(QUEUE, WorkerNumber(0), timeout=1)
+            if job is None:
+                break
+            args.append(job.args)
+
+        self.assertEqual(
+            [['args1'], ['args2'], ['args3']],
+            args,
+            "Jobs should be dequeued in their original order",
+        )
+
+    def test_deduplicate_across_chunks(self) -> None:
+        QUEUE = QueueName('job-queue')
+
+        for _ in range(3):
+            for num in range(5):
+                self.enqueue_job(QUEUE, args=[num])
+
+        with unittest.mock.patch(
+            'django_lightweight_queue.backends.redis_utils.CHUNK_SIZE',
+            new=2,
+        ):
+            result = self.backend.deduplicate(QUEUE)
+
+        self.assertEqual((15, 5), result)
+
+        self.assertEqual(
+            [[4], [3], [2], [1], [0]],
+            [
+                Job.from_json(x.decode()).args
+                for x in self.client.lrange(self.backend._key(QUEUE), 0, -1)
+            ],
+            "Wrong jobs remaining in queue",
+        )
+
+    @override_settings(
+        LIGHTWEIGHT_QUEUE_BACKEND='django_lightweight_queue.backends.redis.RedisBackend',
+    )
+    def test_deduplicate_command_reports_throughput(self) -> None:
+        QUEUE = QueueName('job-queue')
+
+        self.enqueue_job(QUEUE)
+        self.enqueue_job(QUEUE)
+
+        buffer = io.StringIO()
+        call_command('queue_deduplicate', QUEUE, stdout=buffer)
+
+        self.assertIn("from 2 jobs to 1 job(s)", buffer.getvalue())
+        self.assertIn("Processed 2 jobs in", buffer.getvalue())
+
+    def test_paused_worker_makes_no_redis_commands(self) -> None:
+        QUEUE = QueueName('the-queue')
+
+        self.enqueue_job(QUEUE)
+
+        now = datetime.datetime.now(datetime.timezone.utc)
+        self.backend.pause(QUEUE, now + datetime.timedelta(minutes=5))
+
+        # Learn the pause state
+        self.backend.dequeue(QUEUE, WorkerNumber(1), 0)
+
+        with unittest.mock.patch.object(
+            self.client,
+            'execute_command',
+            wraps=self.client.execute_command,
+        ) as mock_execute_command:
+            job = self.backend.dequeue(QUEUE, WorkerNumber(1), 0)
+
+        self.assertIsNone(job, "Should have indicated no work was done")
+        mock_execute_command.assert_not_called()
+
+    @override_settings(LIGHTWEIGHT_QUEUE_PAUSE_STATE_MAX_AGE=0)
+    def test_unannounced_resume_noticed(self) -> None:
+        QUEUE = QueueName('the-queue')
+
+        job = self.enqueue_job(QUEUE)
+
+        now = datetime.datetime.now(datetime.timezone.utc)
+        self.backend.pause(QUEUE, now + datetime.timedelta(minutes=5))
+
+        self.assertIsNone(self.backend.dequeue(QUEUE, WorkerNumber(1), 0))
+
+        # Resume without telling the workers
+        self.client.delete(self.backend._pause_key(QUEUE))
+
+        result = self.backend.dequeue(QUEUE, WorkerNumber(1), 1)
+        # Plain assert to placate mypy
+        assert result is not None, "Should have re-checked the pause state"
+        self.assertEqual(job.to_json(), result.to_json())
+
+    @override_settings(LIGHTWEIGHT_QUEUE_SHARDS={'sharded-queue': 3})
+    def test_sharded_queue(self) -> None:
+        QUEUE = QueueName('sharded-queue')
+
+        jobs = [self.enqueue_job(QUEUE, args=(x,)) for x in range(6)]
+
+        shards = self.backend._shards(QUEUE)
+        self.assertEqual(
+            [2, 2, 2],
+            [self.client.llen(shard.key) for shard in shards],
+            "Jobs should be spread over the shards",
+        )
+        self.assertEqual(6, self.backend.length(QUEUE))
+
+        job = self.backend.dequeue(QUEUE, WorkerNumber(2), timeout=1)
+        # Plain assert to placate mypy
+        assert job is not None
+        self.assertEqual(jobs[1].to_json(), job.to_json(), "Should take from own shard first")
+
+        dequeued = [
+            self.backend.dequeue(QUEUE, WorkerNumber(2), timeout=1)
+            for _ in range(5)
+        ]
+        self.assertEqual(
+            sorted(x.to_json() for x in jobs if x is not jobs[1]),
+            sorted(x.to_json() for x in dequeued if x is not None),
+            "Should take jobs from the other shards once own shard is empty",
+        )
+        self.assertEqual(0, self.backend.length(QUEUE))
+
+    @override_settings(LIGHTWEIGHT_QUEUE_SHARDS={'sharded-queue': [{}, {'DATABASE': 1}]})
+    def test_sharded_queue_across_servers(self) -> None:
+        QUEUE = QueueName('sharded-queue')
+
+        other_client = self.backend._shards(QUEUE)[1].client
+        self.assertIsNot(self.client, other_client)
+        self.addCleanup(other_client.flushdb)
+
+        self.backend.bulk_enqueue([self.create_job(args=(x,)) for x in range(4)], QUEUE)
+
+        self.assertEqual(2, other_client.llen(self.backend._shards(QUEUE)[1].key))
+        self.assertEqual(4, self.backend.length(QUEUE))
+
+        self.backend.clear(QUEUE)
+
+        self.assertEqual(0, self.backend.length(QUEUE))
+
+    @override_settings(LIGHTWEIGHT_QUEUE_SHARDS={'sharded-queue': 2})
+    def test_deduplicate_sharded_queue(self) -> None:
+        QUEUE = QueueName('sharded-queue')
+
+        for _ in range(2):
+            self.enqueue_job(QUEUE, args=('a',))
+            self.enqueue_job(QUEUE, args=('b',))
+
+        self.assertEqual((4, 2), self.backend.deduplicate(QUEUE))
+        self.assertEqual(2, self.backend.length(QUEUE))
+
+    @override_settings(LIGHTWEIGHT_QUEUE_PRIORITIES={'priority-queue': 3})
+    def test_priorities(self) -> None:
+        QUEUE = QueueName('priority-queue')
+
+        low = self.enqueue_job(QUEUE, args=('low',))
+        high = self.enqueue_job(QUEUE, args=('high',), priority=2)
+        medium = self.enqueue_job(QUEUE, args=('medium',), priority=1)
+        too_high = self.enqueue_job(QUEUE, args=('too-high',), priority=5)
+
+        self.assertEqual(4, self.backend.length(QUEUE))
+        self.assertEqual({0: 1, 1: 1, 2: 2}, self.backend.length_by_priority(QUEUE))
+
+        job = self.backend.dequeue(QUEUE, WorkerNumber(1), timeout=1)
+        # Plain assert to placate mypy
+        assert job is not None
+        self.assertEqual(high.to_json(), job.to_json(), "Should take the highest priority first")
+
+        self.assertEqual(
+            [x.to_json() for x in (too_high, medium, low)],
+            [
+                x.to_json()
+                for x in self.backend.bulk_dequeue(QUEUE, WorkerNumber(1), timeout=1, count=5)
+            ],
+            "Should take jobs in priority order",
+        )
+        self.assertEqual(0, self.backend.length(QUEUE))
+
+    @override_settings(
+        LIGHTWEIGHT_QUEUE_PRIORITIES={'priority-queue': 2},
+        LIGHTWEIGHT_QUEUE_PRIORITY_AGING={'priority-queue': 60},
+    )
+    def test_priority_aging(self) -> None:
+        QUEUE = QueueName('priority-queue')
+
+        starved = self.enqueue_job(
+            QUEUE,
+            args=('starved',),
+            created_time=self.start_time - datetime.timedelta(minutes=5),
+        )
+        high = self.enqueue_job(QUEUE, args=('high',), priority=1)
+
+        job = self.backend.dequeue(QUEUE, WorkerNumber(1), timeout=1)
+        # Plain assert to placate mypy
+        assert job is not None
+        self.assertEqual(
+            starved.to_json(),
+            job.to_json(),
+            "Should take jobs which have waited too long first",
+        )
+
+        job = self.backend.dequeue(QUEUE, WorkerNumber(1), timeout=1)
+        # Plain assert to placate mypy
+        assert job is not None
+        self.assertEqual(high.to_json(), job.to_json())
+
+    @override_settings(LIGHTWEIGHT_QUEUE_PRIORITIES={'priority-queue': 2})
+    def test_deduplicate_keeps_highest_priority(self) -> None:
+        QUEUE = QueueName('priority-queue')
+
+        self.enqueue_job(QUEUE, args=('a',))
+        self.enqueue_job(QUEUE, args=('a',), priority=1)
+
+        self.assertEqual((2, 1), self.backend.deduplicate(QUEUE))
+        self.assertEqual({0: 0, 1: 1}, self.backend.length_by_priority(QUEUE))
+
+        self.backend.clear(QUEUE)
+        self.assertEqual(0, self.backend.length(QUEUE))
+
+    @override_settings(
+        LIGHTWEIGHT_QUEUE_SERIALIZER='django_lightweight_queue.serializers.MsgpackSerializer',
+    )
+    def test_msgpack_serializer(self) -> None:
+        QUEUE = QueueName('job-queue')
+
+        historic = self.create_job(args=('historic',))
+        self.client.lpush(self.backend._key(QUEUE), historic.to_json().encode('utf-8'))
+
+        job = self.enqueue_job(QUEUE, args=('new',))
+
+        stored = self.client.lindex(self.backend._key(QUEUE), 0)
+        # Plain assert to placate mypy
+        assert stored is not None, "Should have stored the job"
+        self.assertEqual(
+            b'\x01',
+            stored[:1],
+            "Should have stored the job with msgpack",
+        )
+        self.assertEqual(
+            [historic.to_json(), job.to_json()],
+            [
+                x.to_json()
+                for x in self.backend.bulk_dequeue(QUEUE, WorkerNumber(1), timeout=1, count=5)
+            ],
+        )
+
+    def test_unique_jobs(self) -> None:
+        QUEUE = QueueName('job-queue')
+
+        first = self.create_job(unique=True)
+        self.backend.bulk_enqueue(
+            [
+                first,
+                self.create_job(unique=True, created_time=datetime.datetime(2018, 1, 1)),
+                self.create_job(args=('other',), unique=True),
+            ],
+            QUEUE,
+        )
+        self.enqueue_job(QUEUE, unique=True)
+
+        self.assertEqual(2, self.backend.length(QUEUE), "Should not have pushed the duplicates")
+        self.assertEqual(
+            [first.to_json(), self.create_job(args=('other',), unique=True).to_json()],
+            [
+                x.to_json()
+                for x in self.backend.bulk_dequeue(QUEUE, WorkerNumber(1), timeout=1, count=5)
+            ],
+        )
+
+        again = self.enqueue_job(QUEUE, unique=True)
+
+        job = self.backend.dequeue(QUEUE, WorkerNumber(1), timeout=1)
+        # Plain assert to placate mypy
+        assert job is not None, "Should run the job again once it's been dequeued"
+        self.assertEqual(again.to_json(), job.to_json())
+
+    @override_settings(LIGHTWEIGHT_QUEUE_OFFLOAD_THRESHOLD=1000)
+    def test_unique_job_with_offloaded_arguments(self) -> None:
+        QUEUE = QueueName('job-queue')
+
+        self.enqueue_job(QUEUE, args=(list(range(1000)),), unique=True)
+        self.enqueue_job(QUEUE, args=(list(range(1000)),), unique=True)
+
+        self.assertEqual(1, self.backend.length(QUEUE))
+        self.assertEqual(
+            1,
+            len(self.client.keys(self.backend._arguments_key(QUEUE) + ':*')),
+            "Should have deleted the arguments of the duplicate",
+        )
+
+    @override_settings(LIGHTWEIGHT_QUEUE_OFFLOAD_THRESHOLD=1000)
+    def test_offloaded_arguments(self) -> None:
+        QUEUE = QueueName('job-queue')
+
+        small = self.enqueue_job(QUEUE)
+        large = self.enqueue_job(QUEUE, args=(list(range(1000)),))
+
+        side_keys = self.client.keys(self.backend._arguments_key(QUEUE) + ':*')
+        self.assertEqual(1, len(side_keys), "Should only have offloaded the large job")
+
+        jobs = self.backend.bulk_dequeue(QUEUE, WorkerNumber(1), timeout=1, count=2)
+        self.assertEqual([None, side_keys[0].decode()], [x.arguments_ref for x in jobs])
+        self.assertIn("<arguments at", repr(jobs[1]))
+
+        self.assertEqual(list(small.args), jobs[0].args)
+        self.assertEqual(list(large.args), jobs[1].args)
+
+        self.backend.bulk_processed_jobs(QUEUE, WorkerNumber(1), jobs)
+
+        self.assertEqual(
+            [],
+            self.client.keys(self.backend._arguments_key(QUEUE) + ':*'),
+            "Should have deleted the offloaded arguments",
+        )
+
+    @override_settings(
+        LIGHTWEIGHT_QUEUE_OFFLOAD_THRESHOLD=1000,
+        LIGHTWEIGHT_QUEUE_SERIALIZER='django_lightweight_queue.serializers.MsgpackSerializer',
+    )
+    def test_offloaded_arguments_with_msgpack_serializer(self) -> None:
+        QUEUE = QueueName('job-queue')
+
+        self.enqueue_job(QUEUE, args=(b'\x00' * 2000,), kwargs={'key': b'value'})
+
+        side_key, = self.client.keys(self.backend._arguments_key(QUEUE) + ':*')
+        stored = self.client.get(side_key)
+        # Plain assert to placate mypy
+        assert stored is not None, "Should have offloaded the arguments"
+        self.assertEqual(
+            b'\x01',
+            decompress(stored)[:1],
+            "Should have stored the arguments with msgpack",
+        )
+
+        job = self.backend.dequeue(QUEUE, WorkerNumber(1), timeout=1)
+        # Plain assert to placate mypy
+        assert job is not None, "Should have dequeued the job"
+        self.assertEqual([b'\x00' * 2000], job.args)
+        self.assertEqual({'key': b'value'}, job.kwargs)
+
+    def test_dequeue_any(self) -> None:
+        FIRST = QueueName('first-queue')
+        SECOND = QueueName('second-queue')
+
+        second = self.enqueue_job(SECOND, args=('second',))
+
+        self.assertEqual(
+            (SECOND, second.to_json()),
+            self.dequeued_any([FIRST, SECOND]),
+            "Should take a job from whichever queue has one",
+        )
+
+        first = self.enqueue_job(FIRST, args=('first',))
+        second = self.enqueue_job(SECOND, args=('second',))
+
+        self.assertEqual(
+            (SECOND, second.to_json()),
+            self.dequeued_any([SECOND, FIRST]),
+            "Should prefer the queues in the given order",
+        )
+        self.assertEqual((FIRST, first.to_json()), self.dequeued_any([SECOND, FIRST]))
+
+        self.assertIsNone(self.backend.dequeue_any([FIRST, SECOND], WorkerNumber(1), timeout=1))
+
+    def dequeued_any(self, queues: List[QueueName]) -> Tuple[QueueName, str]:
+        dequeued = self.backend.dequeue_any(queues, WorkerNumber(1), timeout=1)
+        # Plain assert to placate mypy
+        assert dequeued is not None
+        queue, job = dequeued
+        return queue, job.to_json()
+
+    @override_settings(LIGHTWEIGHT_QUEUE_PRIORITIES={'priority-queue': 2})
+    def test_abulk_dequeue(self) -> None:
+        QUEUE = QueueName('priority-queue')
+
+        low = self.enqueue_job(QUEUE, args=('low',), unique=True)
+        high = self.enqueue_job(QUEUE, args=('high',), priority=1)
+        self.enqueue_job(QUEUE, args=('low',), unique=True)
+
+        with unittest.mock.patch('redis.asyncio.StrictRedis', fakeredis.FakeAsyncRedis):
+            jobs = asyncio.run(
+                self.backend.abulk_dequeue(QUEUE, WorkerNumber(1), timeout=1, count=5),
+            )
+
+        self.assertEqual(
+            [high.to_json(), low.to_json()],
+            [x.to_json() for x in jobs],
+            "Should take jobs in priority order",
+        )
+        self.assertEqual(0, self.backend.length(QUEUE))
+
+    def test_abulk_dequeue_checks_pause_state_off_the_event_loop(self) -> None:
+        QUEUE = QueueName('the-queue')
+
+        self.enqueue_job(QUEUE)
+
+        now = datetime.datetime.now(datetime.timezone.utc)
+        self.backend.pause(QUEUE, now + datetime.timedelta(minutes=5))
+
+        checked_in_threads = []
+        is_paused = PauseStateCache.is_paused
+
+        def record_thread(cache: PauseStateCache, pause_key: str) -> bool:
+            checked_in_threads.append(threading.get_ident())
+            return is_paused(cache, pause_key)
+
+        with unittest.mock.patch(
+            'redis.asyncio.StrictRedis',
+            fakeredis.FakeAsyncRedis,
+        ), unittest.mock.patch.object(
+            PauseStateCache,
+            'is_paused',
+            autospec=True,
+            side_effect=record_thread,
+        ):
+            jobs = asyncio.run(
+                self.backend.abulk_dequeue(QUEUE, WorkerNumber(1), timeout=0, count=5),
+            )
+
+        self.assertEqual([], jobs, "Should not take jobs from a paused queue")
+        self.assertTrue(checked_in_threads, "Should have checked the pause state")
+        self.assertNotIn(
+            threading.get_ident(),
+            checked_in_threads,
+            "Should not have blocked the event loop's thread",
+        )
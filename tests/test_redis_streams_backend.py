@@ -0,0 +1,237 @@
+import datetime
+import unittest.mock
+from typing import Any, Dict, Tuple, Optional
+
+import fakeredis
+
+from django.test import SimpleTestCase, override_settings
+
+from django_lightweight_queue.job import Job
+from django_lightweight_queue.types import QueueName, WorkerNumber
+from django_lightweight_queue.backends.redis_utils import (
+    get_shared_redis_client,
+)
+from django_lightweight_queue.backends.redis_streams import (
+    GROUP_NAME,
+    RedisStreamsBackend,
+)
+
+from . import settings
+from .mixins import RedisCleanupMixin
+
+QUEUE = QueueName('the-queue')
+
+
+class RedisStreamsTests(RedisCleanupMixin, SimpleTestCase):
+    longMessage = True
+    prefix = settings.LIGHTWEIGHT_QUEUE_REDIS_PREFIX
+
+    def create_job(
+        self,
+        path: str = 'path',
+        args: Tuple[Any, ...] = ('args',),
+        kwargs: Optional[Dict[str, Any]] = None,
+        timeout: Optional[int] = 60,
+        sigkill_on_stop: bool = False,
+        unique: bool = False,
+        created_time: Optional[datetime.datetime] = None,
+    ) -> Job:
+        if created_time is None:
+            created_time = self.start_time
+
+        job = Job(path, args, kwargs or {}, timeout, sigkill_on_stop, unique=unique)
+        job.created_time = created_time
+
+        return job
+
+    def enqueue_job(self, queue: QueueName, *args: Any, **kwargs: Any) -> Job:
+        job = self.create_job(*args, **kwargs)
+        self.backend.enqueue(job, queue)
+        return job
+
+    def new_backend(self) -> RedisStreamsBackend:
+        with unittest.mock.patch('redis.StrictRedis', fakeredis.FakeStrictRedis):
+            return RedisStreamsBackend()
+
+    def assertJobs(self, expected: Any, actual: Any, msg: Optional[str] = None) -> None:
+        self.assertEqual(
+            [x.to_json() for x in expected],
+            [x.to_json() for x in actual],
+            msg,
+        )
+
+    def setUp(self) -> None:
+        get_shared_redis_client.cache_clear()
+
+        self.backend = self.new_backend()
+        self.client = self.backend.client
+
+        super(RedisStreamsTests, self).setUp()
+
+        self.start_time = datetime.datetime.utcnow()
+
+    def test_dequeue_and_processed_job(self) -> None:
+        job = self.enqueue_job(QUEUE)
+
+        self.assertEqual(1, self.backend.length(QUEUE))
+
+        result = self.backend.dequeue(QUEUE, WorkerNumber(1), timeout=1)
+
+        # Plain assert to placate mypy
+        assert result is not None, "Should have dequeued the job"
+        self.assertJobs([job], [result])
+        self.assertEqual(0, self.backend.length(QUEUE), "Job should be in progress")
+
+        self.backend.processed_job(QUEUE, WorkerNumber(1), result)
+
+        self.assertEqual(
+            0,
+            self.client.xlen(self.backend._key(QUEUE)),
+            "Processed job should have been removed from the stream",
+        )
+        self.assertIsNone(self.backend.dequeue(QUEUE, WorkerNumber(1), timeout=1))
+
+    def test_bulk_dequeue(self) -> None:
+        jobs = [self.enqueue_job(QUEUE, args=(x,)) for x in range(5)]
+
+        first = self.backend.bulk_dequeue(QUEUE, WorkerNumber(1), timeout=1, count=3)
+        self.assertJobs(jobs[:3], first, "Should dequeue the oldest jobs first")
+
+        self.backend.bulk_processed_jobs(QUEUE, WorkerNumber(1), first)
+
+        second = self.backend.bulk_dequeue(QUEUE, WorkerNumber(1), timeout=1, count=3)
+        self.assertJobs(jobs[3:], second)
+
+    def test_restarted_worker_resumes_its_jobs(self) -> None:
+        jobs = [self.enqueue_job(QUEUE, args=(x,)) for x in range(3)]
+
+        self.backend.bulk_dequeue(QUEUE, WorkerNumber(1), timeout=1, count=2)
+
+        restarted = self.new_backend()
+
+        self.assertJobs(
+            jobs[:2],
+            restarted.bulk_dequeue(QUEUE, WorkerNumber(1), timeout=1, count=5),
+            "Should have picked up the unacknowledged jobs first",
+        )
+        self.assertJobs(
+            jobs[2:],
+            restarted.bulk_dequeue(QUEUE, WorkerNumber(1), timeout=1, count=5),
+        )
+
+    def test_reclaims_jobs_from_other_workers(self) -> None:
+        job = self.enqueue_job(QUEUE)
+
+        self.backend.dequeue(QUEUE, WorkerNumber(1), timeout=1)
+
+        other_worker = self.new_backend()
+        with override_settings(LIGHTWEIGHT_QUEUE_STREAMS_RECLAIM_IDLE_TIME=0):
+            result = other_worker.dequeue(QUEUE, WorkerNumber(2), timeout=1)
+
+        # Plain assert to placate mypy
+        assert result is not None, "Should have reclaimed the job"
+        self.assertJobs([job], [result])
+
+        other_worker.processed_job(QUEUE, WorkerNumber(2), result)
+        self.assertEqual(0, self.client.xlen(self.backend._key(QUEUE)))
+
+    def test_does_not_reclaim_recent_jobs(self) -> None:
+        self.enqueue_job(QUEUE)
+
+        self.backend.dequeue(QUEUE, WorkerNumber(1), timeout=1)
+
+        other_worker = self.new_backend()
+        self.assertIsNone(other_worker.dequeue(QUEUE, WorkerNumber(2), timeout=1))
+
+    def test_processed_job_renews_claim_on_held_jobs(self) -> None:
+        self.enqueue_job(QUEUE, args=(1,))
+        self.enqueue_job(QUEUE, args=(2,))
+
+        first, _ = self.backend.bulk_dequeue(QUEUE, WorkerNumber(1), timeout=1, count=2)
+
+        key = self.backend._key(QUEUE)
+        _, second_id = [
+            x['message_id']
+            for x in self.client.xpending_range(key, GROUP_NAME, '-', '+', 2)
+        ]
+
+        # As though the second job had been waiting behind the first for a
+        # long time.
+        self.client.xclaim(key, GROUP_NAME, '1', 0, [second_id], idle=10 ** 7, justid=True)
+
+        self.backend.processed_job(QUEUE, WorkerNumber(1), first)
+
+        pending, = self.client.xpending_range(key, GROUP_NAME, '-', '+', 2)
+        self.assertEqual(second_id, pending['message_id'])
+        self.assertLess(
+            pending['time_since_delivered'],
+            60 * 1000,
+            "Should have reset the idle time of the job still held",
+        )
+
+    def test_rejects_jobs_which_could_be_reclaimed_while_running(self) -> None:
+        for timeout in (None, 60 * 60):
+            with self.subTest(timeout=timeout):
+                with self.assertRaises(ValueError):
+                    self.enqueue_job(QUEUE, timeout=timeout)
+
+        self.assertEqual(0, self.backend.length(QUEUE))
+
+    def test_rejects_unique_jobs(self) -> None:
+        with self.assertRaises(ValueError):
+            self.backend.bulk_enqueue(
+                [self.create_job(), self.create_job(args=('other',), unique=True)],
+                QUEUE,
+            )
+
+        self.assertEqual(0, self.backend.length(QUEUE), "Should not enqueue any jobs")
+
+    def test_clear(self) -> None:
+        self.enqueue_job(QUEUE)
+        self.enqueue_job(QUEUE)
+
+        self.backend.dequeue(QUEUE, WorkerNumber(1), timeout=1)
+
+        self.backend.clear(QUEUE)
+
+        self.assertEqual(0, self.backend.length(QUEUE))
+        self.assertEqual(
+            [],
+            self.new_backend().bulk_dequeue(QUEUE, WorkerNumber(1), timeout=1, count=5),
+            "Should not see the in progress job after clearing",
+        )
+
+    def test_deduplicate(self) -> None:
+        in_progress = self.enqueue_job(QUEUE, args=('a',))
+        self.backend.dequeue(QUEUE, WorkerNumber(1), timeout=1)
+
+        self.enqueue_job(QUEUE, args=('a',))
+        self.enqueue_job(QUEUE, args=('b',))
+        self.enqueue_job(QUEUE, args=('a',))
+        self.enqueue_job(QUEUE, args=('b',))
+
+        result = self.backend.deduplicate(QUEUE)
+
+        self.assertEqual((4, 2), result)
+        self.assertEqual(2, self.backend.length(QUEUE))
+
+        self.backend.processed_job(QUEUE, WorkerNumber(1), in_progress)
+
+        self.assertJobs(
+            [self.create_job(args=('a',)), self.create_job(args=('b',))],
+            self.backend.bulk_dequeue(QUEUE, WorkerNumber(1), timeout=1, count=5),
+            "Should keep the undelivered duplicate of the in progress job",
+        )
+
+    def test_pause(self) -> None:
+        self.enqueue_job(QUEUE)
+
+        now = datetime.datetime.now(datetime.timezone.utc)
+        self.backend.pause(QUEUE, now + datetime.timedelta(minutes=5))
+
+        self.assertTrue(self.backend.is_paused(QUEUE))
+        self.assertIsNone(self.backend.dequeue(QUEUE, WorkerNumber(1), timeout=0))
+
+        self.backend.resume(QUEUE)
+
+        self.assertIsNotNone(self.backend.dequeue(QUEUE, WorkerNumber(1), timeout=1))
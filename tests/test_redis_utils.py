@@ -0,0 +1,75 @@
+from unittest import mock
+
+import fakeredis
+
+from django.test import SimpleTestCase, override_settings
+
+from django_lightweight_queue.types import QueueName
+from django_lightweight_queue.backends.redis import RedisBackend
+from django_lightweight_queue.backends.redis_utils import (
+    get_redis_client,
+    get_connection_options,
+    get_shared_redis_client,
+)
+from django_lightweight_queue.backends.reliable_redis import (
+    ReliableRedisBackend,
+)
+
+
+@override_settings(
+    LIGHTWEIGHT_QUEUE_REDIS_OVERRIDES={
+        'other-server-queue': {'HOST': 'other-redis', 'PORT': 6380},
+        'same-server-queue': {'PORT': 6379},
+    },
+)
+class RedisClientTests(SimpleTestCase):
+    longMessage = True
+
+    def setUp(self) -> None:
+        super().setUp()
+
+        get_shared_redis_client.cache_clear()
+        self.addCleanup(get_shared_redis_client.cache_clear)
+
+        redis_patch = mock.patch('redis.StrictRedis', fakeredis.FakeStrictRedis)
+        redis_patch.start()
+        self.addCleanup(redis_patch.stop)
+
+    def test_backends_share_client(self) -> None:
+        self.assertIs(
+            RedisBackend()._client(QueueName('a-queue')),
+            ReliableRedisBackend()._client(QueueName('another-queue')),
+            "Backends using the same server should share a client",
+        )
+
+    def test_override_for_same_server_shares_client(self) -> None:
+        self.assertIs(
+            get_redis_client(),
+            get_redis_client(QueueName('same-server-queue')),
+            "Queues using the same server should share a client",
+        )
+
+    def test_override_for_other_server(self) -> None:
+        self.assertIsNot(
+            get_redis_client(),
+            get_redis_client(QueueName('other-server-queue')),
+            "Queues using different servers should have different clients",
+        )
+
+        options = dict(get_connection_options(QueueName('other-server-queue')))
+        self.assertEqual('other-redis', options['host'])
+        self.assertEqual(6380, options['port'])
+
+    @override_settings(LIGHTWEIGHT_QUEUE_REDIS_PARSER_CLASS='redis.connection.PythonParser')
+    def test_parser_class(self) -> None:
+        import redis.connection
+
+        self.assertIs(
+            redis.connection.PythonParser,
+            get_redis_client().connection_pool.connection_kwargs['parser_class'],
+        )
+
+    @override_settings(LIGHTWEIGHT_QUEUE_REDIS_OVERRIDES={'bad-queue': {'HOTS': 'typo'}})
+    def test_rejects_unexpected_override(self) -> None:
+        with self.assertRaisesRegex(ValueError, r'\bHOTS\b'):
+            get_redis_client(QueueName('bad-queue'))
@@ -1,7 +1,7 @@
 import time
 import datetime
 import unittest
-import itertools
+import threading
 import contextlib
 import unittest.mock
 from typing import Any, Dict, Tuple, Mapping, Iterator, Optional
@@ -12,6 +12,9 @@ from django.test import SimpleTestCase, override_settings
 
 from django_lightweight_queue.job import Job
 from django_lightweight_queue.types import QueueName
+from django_lightweight_queue.backends.redis_utils import (
+    get_shared_redis_client,
+)
 from django_lightweight_queue.backends.reliable_redis import (
     ReliableRedisBackend,
 )
@@ -32,11 +35,13 @@ class ReliableRedisTests(RedisCleanupMixin, SimpleTestCase):
         timeout: Optional[int] = None,
         sigkill_on_stop: bool = False,
         created_time: Optional[datetime.datetime] = None,
+        priority: int = 0,
+        unique: bool = False,
     ) -> Job:
         if created_time is None:
             created_time = self.start_time
 
-        job = Job(path, args, kwargs or {}, timeout, sigkill_on_stop)
+        job = Job(path, args, kwargs or {}, timeout, sigkill_on_stop, priority, unique=unique)
         job.created_time = created_time
 
         return job
@@ -57,6 +62,8 @@ class ReliableRedisTests(RedisCleanupMixin, SimpleTestCase):
             yield
 
     def setUp(self) -> None:
+        get_shared_redis_client.cache_clear()
+
         with unittest.mock.patch('redis.StrictRedis', fakeredis.FakeStrictRedis):
             self.backend = ReliableRedisBackend()
         self.client = self.backend.client
@@ -268,6 +275,35 @@ class ReliableRedisTests(RedisCleanupMixin, SimpleTestCase):
             "Third job dequeued should be the third job enqueued",
         )
 
+    def test_deduplicate_resumes_interrupted_deduplication(self):
+        QUEUE = 'job-queue'
+        main_queue_key = self.backend._key(QUEUE)
+
+        self.enqueue_job(QUEUE, args=['args1'])
+        self.enqueue_job(QUEUE, args=['args1'])
+        self.client.rename(main_queue_key, main_queue_key + ':deduplicating')
+
+        self.enqueue_job(QUEUE, args=['args2'])
+
+        result = self.backend.deduplicate(QUEUE)
+        self.assertEqual(
+            (2, 1),
+            result,
+            "Should have deduplicated the interrupted jobs",
+        )
+
+        job = self.backend.dequeue(QUEUE, 0, timeout=1)
+        self.assertEqual(
+            ['args1'],
+            job.args,
+            "Jobs being deduplicated should be ahead of those enqueued meanwhile",
+        )
+        self.assertEqual(
+            1,
+            self.backend.length(QUEUE),
+            "Should have kept the job enqueued meanwhile",
+        )
+
     def test_startup_recovers_orphaned_job(self):
         QUEUE = 'the-queue'
 
@@ -330,6 +366,469 @@ class ReliableRedisTests(RedisCleanupMixin, SimpleTestCase):
             "The queue job should be the original one",
         )
 
+    def test_bulk_startup_recovers_orphaned_jobs_across_queues(self):
+        QUEUE = 'the-queue'
+        OTHER_QUEUE = 'other-queue'
+        UNRELATED_QUEUE = 'unrelated-queue'
+
+        for queue in (QUEUE, OTHER_QUEUE, UNRELATED_QUEUE):
+            self.enqueue_job(queue)
+            self.backend.dequeue(queue, worker_number=3, timeout=1)
+
+        with self.mock_workers({QUEUE: 1, OTHER_QUEUE: 1, UNRELATED_QUEUE: 1}):
+            self.backend.bulk_startup([QUEUE, OTHER_QUEUE])
+
+        self.assertEqual(
+            1,
+            self.backend.length(QUEUE),
+            "Queue should have recovered entry after running startup",
+        )
+        self.assertEqual(
+            1,
+            self.backend.length(OTHER_QUEUE),
+            "Other queue should have recovered entry after running startup",
+        )
+        self.assertEqual(
+            0,
+            self.backend.length(UNRELATED_QUEUE),
+            "Queues not being started should be left alone",
+        )
+        self.assertEqual(
+            1,
+            self.client.llen(self.backend._processing_key(UNRELATED_QUEUE, 3)),
+            "Processing queues of queues not being started should be left alone",
+        )
+
+    def test_recover_worker_jobs(self):
+        QUEUE = 'the-queue'
+
+        orig_job = self.enqueue_job(QUEUE, args=('taken',))
+        self.backend.dequeue(QUEUE, worker_number=3, timeout=1)
+        waiting_job = self.enqueue_job(QUEUE, args=('waiting',))
+
+        self.backend.recover_worker_jobs(QUEUE, 3)
+
+        self.assertEqual(
+            0,
+            self.client.llen(self.backend._processing_key(QUEUE, 3)),
+            "Should have emptied the worker's processing queue",
+        )
+        self.assertEqual(
+            [orig_job.to_json(), waiting_job.to_json()],
+            [
+                job.to_json()
+                for job in self.backend.bulk_dequeue(QUEUE, 1, timeout=1, count=2)
+            ],
+            "Should have returned the job to the front of the queue",
+        )
+
+    def test_dequeue_recovers_job_from_processing_queue(self):
+        QUEUE = 'the-queue'
+
+        self.enqueue_job(QUEUE)
+        orig_job = self.backend.dequeue(QUEUE, worker_number=3, timeout=1)
+
+        # Simulate the worker having crashed before acknowledging the job, with
+        # another job having been enqueued since.
+        self.enqueue_job(QUEUE, args=('other',))
+
+        actual_job = self.backend.dequeue(QUEUE, worker_number=3, timeout=1)
+
+        self.assertEqual(
+            orig_job.as_dict(),
+            actual_job.as_dict(),
+            "Should have returned the job from the processing queue",
+        )
+        self.assertEqual(
+            1,
+            self.backend.length(QUEUE),
+            "Should not have taken a new job from the main queue",
+        )
+
+    def test_processed_job_removes_job_from_processing_queue(self):
+        QUEUE = 'the-queue'
+
+        self.enqueue_job(QUEUE)
+        job = self.backend.dequeue(QUEUE, worker_number=3, timeout=1)
+
+        self.backend.processed_job(QUEUE, 3, job)
+
+        self.assertEqual(
+            0,
+            self.client.llen(self.backend._processing_key(QUEUE, 3)),
+            "Processing queue should be empty after the job is processed",
+        )
+
+    def test_processed_job_leaves_unexpected_jobs_in_processing_queue(self):
+        QUEUE = 'the-queue'
+        processing_queue_key = self.backend._processing_key(QUEUE, 3)
+
+        self.enqueue_job(QUEUE)
+        job = self.backend.dequeue(QUEUE, worker_number=3, timeout=1)
+
+        other_job = self.create_job(args=('other',))
+        self.client.rpush(processing_queue_key, other_job.to_json())
+
+        self.backend.processed_job(QUEUE, 3, job)
+
+        self.assertEqual(
+            [other_job.to_json().encode()],
+            self.client.lrange(processing_queue_key, 0, -1),
+            "Only the processed job should have been removed",
+        )
+
+    def test_bulk_dequeue_moves_jobs_to_processing_queue(self):
+        QUEUE = 'the-queue'
+
+        for num in range(5):
+            self.enqueue_job(QUEUE, args=[num])
+
+        jobs = self.backend.bulk_dequeue(QUEUE, 3, timeout=1, count=3)
+
+        self.assertEqual(
+            [[0], [1], [2]],
+            [x.args for x in jobs],
+            "Should have dequeued the oldest jobs, in order",
+        )
+        self.assertEqual(2, self.backend.length(QUEUE))
+        self.assertEqual(
+            3,
+            self.client.llen(self.backend._processing_key(QUEUE, 3)),
+            "Dequeued jobs should be in the processing queue",
+        )
+
+        self.backend.bulk_processed_jobs(QUEUE, 3, jobs[:2])
+
+        self.assertEqual(
+            [jobs[2].to_json().encode()],
+            self.client.lrange(self.backend._processing_key(QUEUE, 3), 0, -1),
+            "Only the unprocessed job should remain in the processing queue",
+        )
+
+    def test_bulk_dequeue_recovers_jobs_from_processing_queue(self):
+        QUEUE = 'the-queue'
+
+        for num in range(5):
+            self.enqueue_job(QUEUE, args=[num])
+
+        orig_jobs = self.backend.bulk_dequeue(QUEUE, 3, timeout=1, count=3)
+        # Simulate the worker having crashed after processing the first job
+        self.backend.processed_job(QUEUE, 3, orig_jobs[0])
+
+        jobs = self.backend.bulk_dequeue(QUEUE, 3, timeout=1, count=3)
+
+        self.assertEqual(
+            [x.as_dict() for x in orig_jobs[1:]],
+            [x.as_dict() for x in jobs],
+            "Should have returned the unprocessed jobs from the processing queue",
+        )
+        self.assertEqual(
+            2,
+            self.backend.length(QUEUE),
+            "Should not have taken new jobs from the main queue",
+        )
+
+    def test_bulk_dequeue_waits_for_a_job(self):
+        QUEUE = 'the-queue'
+
+        jobs = self.backend.bulk_dequeue(QUEUE, 3, timeout=1, count=3)
+
+        self.assertEqual([], jobs)
+
+    @override_settings(LIGHTWEIGHT_QUEUE_SHARDS={'sharded-queue': 2})
+    def test_sharded_queue(self):
+        QUEUE = 'sharded-queue'
+
+        jobs = [self.enqueue_job(QUEUE, args=(x,)) for x in range(4)]
+
+        own_key, other_key = [shard.key for shard in self.backend._shards(QUEUE)]
+        self.assertEqual(2, self.client.llen(own_key))
+        self.assertEqual(2, self.client.llen(other_key))
+        self.assertEqual(4, self.backend.length(QUEUE))
+
+        first = self.backend.bulk_dequeue(QUEUE, 1, timeout=1, count=5)
+        self.assertEqual(
+            [jobs[0].to_json(), jobs[2].to_json()],
+            [x.to_json() for x in first],
+            "Should take from own shard first",
+        )
+        self.backend.bulk_processed_jobs(QUEUE, 1, first)
+
+        stolen = self.backend.dequeue(QUEUE, 1, timeout=1)
+        # Plain assert to placate mypy
+        assert stolen is not None, "Should take jobs from the other shard"
+        self.assertEqual(jobs[1].to_json(), stolen.to_json())
+        self.assertEqual(
+            [stolen.to_json().encode()],
+            self.client.lrange(self.backend._processing_key(QUEUE, 1), 0, -1),
+            "Stolen job should be in our processing queue",
+        )
+
+        self.backend.clear(QUEUE)
+        self.assertEqual(0, self.backend.length(QUEUE))
+
+    @override_settings(LIGHTWEIGHT_QUEUE_SHARDS={'sharded-queue': [{}, {'DATABASE': 1}]})
+    def test_sharded_queue_across_servers_rejected(self):
+        with self.assertRaises(ValueError):
+            self.backend.length('sharded-queue')
+
+    @override_settings(LIGHTWEIGHT_QUEUE_PRIORITIES={'priority-queue': 2})
+    def test_priorities(self):
+        QUEUE = 'priority-queue'
+
+        low = self.enqueue_job(QUEUE, args=('low',))
+        high = self.enqueue_job(QUEUE, args=('high',), priority=1)
+
+        self.assertEqual(2, self.backend.length(QUEUE))
+        self.assertEqual({0: 1, 1: 1}, self.backend.length_by_priority(QUEUE))
+
+        job = self.backend.dequeue(QUEUE, 1, timeout=1)
+        # Plain assert to placate mypy
+        assert job is not None
+        self.assertEqual(high.to_json(), job.to_json(), "Should take the highest priority first")
+
+        self.backend.processed_job(QUEUE, 1, job)
+
+        self.assertEqual(
+            [low.to_json()],
+            [x.to_json() for x in self.backend.bulk_dequeue(QUEUE, 1, timeout=1, count=5)],
+        )
+
+        self.backend.clear(QUEUE)
+        self.assertEqual(0, self.backend.length(QUEUE))
+
+    @override_settings(LIGHTWEIGHT_QUEUE_PRIORITIES={'priority-queue': 2})
+    def test_enqueue_wakes_waiting_worker(self):
+        QUEUE = 'priority-queue'
+
+        job = self.create_job(priority=1)
+
+        timer = threading.Timer(0.1, self.backend.enqueue, args=(job, QUEUE))
+        timer.start()
+        self.addCleanup(timer.cancel)
+
+        start = time.monotonic()
+        result = self.backend.dequeue(QUEUE, 1, 10)
+
+        # Plain assert to placate mypy
+        assert result is not None, "Should have taken the enqueued job"
+        self.assertEqual(job.to_json(), result.to_json())
+        self.assertLess(
+            time.monotonic() - start,
+            5,
+            "Should have stopped waiting when the job was enqueued",
+        )
+
+    @override_settings(LIGHTWEIGHT_QUEUE_QUEUE_GROUPS={
+        'group': {'first-queue': 1, 'second-queue': 1},
+    })
+    def test_dequeue_any(self):
+        FIRST = 'first-queue'
+        SECOND = 'second-queue'
+
+        first = self.enqueue_job(FIRST, args=('first',))
+        second = self.enqueue_job(SECOND, args=('second',))
+
+        queue, job = self.backend.dequeue_any([SECOND, FIRST], 1, timeout=1)
+        self.assertEqual(
+            (SECOND, second.to_json()),
+            (queue, job.to_json()),
+            "Should prefer the queues in the given order",
+        )
+        self.assertEqual(
+            [second.to_json()],
+            [
+                Job.from_bytes(x).to_json()
+                for x in self.client.lrange(self.backend._processing_key(SECOND, 1), 0, -1)
+            ],
+            "Should have moved the job to the processing queue of its queue",
+        )
+
+        queue, job = self.backend.dequeue_any([FIRST, SECOND], 1, timeout=1)
+        self.assertEqual(
+            (SECOND, second.to_json()),
+            (queue, job.to_json()),
+            "Should recover the job from its processing queue until it is processed",
+        )
+
+        self.backend.processed_job(SECOND, 1, job)
+
+        queue, job = self.backend.dequeue_any([SECOND, FIRST], 1, timeout=1)
+        self.assertEqual((FIRST, first.to_json()), (queue, job.to_json()))
+
+    @override_settings(LIGHTWEIGHT_QUEUE_QUEUE_GROUPS={
+        'group': {'first-queue': 1, 'second-queue': 1},
+    })
+    def test_enqueue_wakes_worker_of_group(self):
+        job = self.create_job()
+
+        timer = threading.Timer(0.1, self.backend.enqueue, args=(job, 'second-queue'))
+        timer.start()
+        self.addCleanup(timer.cancel)
+
+        start = time.monotonic()
+        result = self.backend.dequeue_any(['first-queue', 'second-queue'], 1, 10)
+
+        # Plain assert to placate mypy
+        assert result is not None, "Should have taken the enqueued job"
+        self.assertEqual(('second-queue', job.to_json()), (result[0], result[1].to_json()))
+        self.assertLess(
+            time.monotonic() - start,
+            5,
+            "Should have stopped waiting when the job was enqueued",
+        )
+
+    @override_settings(LIGHTWEIGHT_QUEUE_PRIORITIES={'priority-queue': 2})
+    def test_startup_recovers_orphaned_job_to_its_priority(self):
+        QUEUE = 'priority-queue'
+
+        self.enqueue_job(QUEUE, priority=1)
+        orig_job = self.backend.dequeue(QUEUE, worker_number=3, timeout=1)
+
+        with self.mock_workers({QUEUE: 1}):
+            self.backend.startup(QUEUE)
+
+        self.assertEqual({0: 0, 1: 1}, self.backend.length_by_priority(QUEUE))
+
+        actual_job = self.backend.dequeue(QUEUE, worker_number=1, timeout=1)
+
+        self.assertEqual(orig_job.as_dict(), actual_job.as_dict())
+
+    @override_settings(LIGHTWEIGHT_QUEUE_COMPRESSION_THRESHOLD=100)
+    def test_compressed_job(self):
+        QUEUE = 'the-queue'
+
+        job = self.enqueue_job(QUEUE, args=(list(range(100)),))
+
+        self.assertLess(
+            len(self.client.lindex(self.backend._key(QUEUE), 0)),
+            len(job.to_json()),
+            "Should have stored the job compressed",
+        )
+
+        result = self.backend.dequeue(QUEUE, 1, timeout=1)
+        # Plain assert to placate mypy
+        assert result is not None
+        self.assertEqual(job.to_json(), result.to_json())
+
+        self.backend.processed_job(QUEUE, 1, result)
+
+        self.assertEqual(
+            0,
+            self.client.llen(self.backend._processing_key(QUEUE, 1)),
+            "Should have removed the compressed job from the processing queue",
+        )
+
+    @override_settings(LIGHTWEIGHT_QUEUE_PRIORITIES={'the-queue': 2})
+    async def test_abulk_enqueue_many(self):
+        QUEUE = 'the-queue'
+        OTHER_QUEUE = 'other-queue'
+
+        with unittest.mock.patch('redis.asyncio.StrictRedis', fakeredis.FakeAsyncRedis):
+            await self.backend.abulk_enqueue_many({
+                QUEUE: [self.create_job(args=('low',)), self.create_job(args=('high',), priority=1)],
+                OTHER_QUEUE: [self.create_job(args=('other',))],
+            })
+
+        self.assertEqual({0: 1, 1: 1}, self.backend.length_by_priority(QUEUE))
+        self.assertEqual(1, self.backend.length(OTHER_QUEUE))
+
+        jobs = self.backend.bulk_dequeue(QUEUE, 1, timeout=1, count=2)
+        self.assertEqual([['high'], ['low']], [x.args for x in jobs])
+
+    @override_settings(LIGHTWEIGHT_QUEUE_OFFLOAD_THRESHOLD=1000)
+    def test_offloaded_arguments(self):
+        QUEUE = 'the-queue'
+
+        job = self.enqueue_job(QUEUE, args=(list(range(1000)),))
+
+        (side_key,) = self.client.keys(self.backend._arguments_key(QUEUE) + ':*')
+        self.assertLess(
+            len(self.client.lindex(self.backend._key(QUEUE), 0)),
+            1000,
+            "Should have stored only a reference to the arguments",
+        )
+
+        result = self.backend.dequeue(QUEUE, 1, timeout=1)
+        # Plain assert to placate mypy
+        assert result is not None
+        self.assertEqual(side_key.decode(), result.arguments_ref)
+        self.assertEqual(list(job.args), result.args)
+
+        self.backend.processed_job(QUEUE, 1, result)
+
+        self.assertEqual(
+            0,
+            self.client.llen(self.backend._processing_key(QUEUE, 1)),
+            "Should have removed the job from the processing queue",
+        )
+        self.assertFalse(
+            self.client.exists(side_key),
+            "Should have deleted the offloaded arguments",
+        )
+
+    def test_unique_jobs(self):
+        QUEUE = 'the-queue'
+
+        job = self.enqueue_job(QUEUE, unique=True)
+        self.enqueue_job(QUEUE, unique=True, created_time=datetime.datetime(2018, 1, 1))
+
+        self.assertEqual(1, self.backend.length(QUEUE), "Should not have pushed the duplicate")
+
+        result = self.backend.dequeue(QUEUE, 1, timeout=1)
+        # Plain assert to placate mypy
+        assert result is not None
+        self.assertEqual(job.to_json(), result.to_json())
+
+        again = self.enqueue_job(QUEUE, unique=True)
+        self.assertEqual(
+            1,
+            self.backend.length(QUEUE),
+            "Should push the job again once it's been dequeued",
+        )
+
+        self.backend.processed_job(QUEUE, 1, result)
+        result = self.backend.dequeue(QUEUE, 1, timeout=1)
+        # Plain assert to placate mypy
+        assert result is not None
+        self.assertEqual(again.to_json(), result.to_json())
+
+    def test_startup_recovers_unique_job(self):
+        QUEUE = 'the-queue'
+
+        self.enqueue_job(QUEUE, unique=True)
+        orig_job = self.backend.dequeue(QUEUE, worker_number=3, timeout=1)
+
+        with self.mock_workers({QUEUE: 1}):
+            self.backend.startup(QUEUE)
+
+        self.enqueue_job(QUEUE, unique=True)
+
+        actual_job = self.backend.dequeue(QUEUE, worker_number=1, timeout=1)
+        self.assertEqual(orig_job.as_dict(), actual_job.as_dict())
+        self.backend.processed_job(QUEUE, 1, actual_job)
+
+        self.assertIsNone(
+            self.backend.dequeue(QUEUE, worker_number=1, timeout=1),
+            "Recovered job should still be unique",
+        )
+
+    def test_startup_drops_recovered_duplicate(self):
+        QUEUE = 'the-queue'
+
+        self.enqueue_job(QUEUE, unique=True)
+        self.backend.dequeue(QUEUE, worker_number=3, timeout=1)
+        self.enqueue_job(QUEUE, unique=True)
+
+        with self.mock_workers({QUEUE: 1}):
+            self.backend.startup(QUEUE)
+
+        self.assertEqual(
+            1,
+            self.backend.length(QUEUE),
+            "Should not restore a job identical to one enqueued since",
+        )
+
     def test_pause(self):
         QUEUE = 'the-queue'
 
@@ -339,16 +838,44 @@ class ReliableRedisTests(RedisCleanupMixin, SimpleTestCase):
         five_minutes_time = now + datetime.timedelta(minutes=5)
         self.backend.pause(QUEUE, five_minutes_time)
 
-        with unittest.mock.patch(
-            'time.time',
-            side_effect=itertools.count(time.time(), 1),
-        ), unittest.mock.patch(
-            'time.sleep',
-        ) as mock_sleep:
-            job = self.backend.dequeue(QUEUE, 2, 2)
+        start = time.monotonic()
+        job = self.backend.dequeue(QUEUE, 2, 1)
 
         self.assertIsNone(job, "Should have indicated no work was done")
-        self.assertTrue(mock_sleep.called)
+        self.assertGreaterEqual(
+            time.monotonic() - start,
+            1,
+            "Should have waited for the timeout",
+        )
+        self.assertEqual(1, self.backend.length(QUEUE), "Should not have taken the job")
+
+    def test_resume_wakes_paused_worker(self):
+        QUEUE = 'the-queue'
+
+        job = self.enqueue_job(QUEUE)
+
+        now = datetime.datetime.now(datetime.timezone.utc)
+        five_minutes_time = now + datetime.timedelta(minutes=5)
+        self.backend.pause(QUEUE, five_minutes_time)
+
+        timer = threading.Timer(0.1, self.backend.resume, args=(QUEUE,))
+        timer.start()
+        self.addCleanup(timer.cancel)
+
+        start = time.monotonic()
+        result = self.backend.dequeue(QUEUE, 2, 10)
+
+        self.assertIsNone(result, "Should have indicated no work was done")
+        self.assertLess(
+            time.monotonic() - start,
+            5,
+            "Should have stopped waiting when the queue was resumed",
+        )
+
+        result = self.backend.dequeue(QUEUE, 2, 1)
+        # Plain assert to placate mypy
+        assert result is not None, "Should take the job once resumed"
+        self.assertEqual(job.to_json(), result.to_json())
 
     def test_clear(self):
         QUEUE = 'the-queue'
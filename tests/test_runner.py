@@ -0,0 +1,122 @@
+import gc
+import time
+import signal
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from django_lightweight_queue.types import QueueName, WorkerNumber
+from django_lightweight_queue.runner import (
+    fork_worker,
+    RECYCLE_REASONS,
+    recover_worker_jobs,
+)
+from django_lightweight_queue.worker import RECYCLE_EXIT_CODES
+from django_lightweight_queue.backends.base import BackendWithWorkerRecovery
+
+QUEUE = QueueName('forked-queue')
+OTHER_QUEUE = QueueName('other-queue')
+GROUP = QueueName('forked-group')
+
+
+class ForkWorkerTests(SimpleTestCase):
+    longMessage = True
+
+    def setUp(self) -> None:
+        super().setUp()
+
+        # The worker is replaced in the forked process too, as it is a copy of
+        # this one.
+        worker_patch = mock.patch('django_lightweight_queue.runner.Worker')
+        self.Worker = worker_patch.start()
+        self.addCleanup(worker_patch.stop)
+
+    def test_exit_code(self) -> None:
+        self.Worker.return_value.run.side_effect = SystemExit(3)
+
+        worker = fork_worker(QUEUE, WorkerNumber(1), 9300, None)
+
+        self.assertEqual(3, worker.wait())
+        self.assertEqual(3, worker.poll(), "Should remember the exit code")
+
+        for reason, exit_code in RECYCLE_EXIT_CODES.items():
+            with self.subTest(reason=reason):
+                self.Worker.return_value.run.side_effect = SystemExit(exit_code)
+
+                worker = fork_worker(QUEUE, WorkerNumber(1), 9300, None)
+
+                self.assertEqual(reason, RECYCLE_REASONS[worker.wait()])
+
+        with self.subTest("finished"):
+            self.Worker.return_value.run.side_effect = None
+
+            worker = fork_worker(QUEUE, WorkerNumber(1), 9300, None)
+
+            self.assertEqual(0, worker.wait())
+
+        with self.subTest("crashed"), mock.patch(
+            'django_lightweight_queue.runner.traceback',
+        ):
+            self.Worker.return_value.run.side_effect = ValueError
+
+            worker = fork_worker(QUEUE, WorkerNumber(1), 9300, None)
+
+            self.assertEqual(1, worker.wait())
+
+    def test_master_not_frozen(self) -> None:
+        self.Worker.return_value.run.side_effect = SystemExit(0)
+
+        worker = fork_worker(QUEUE, WorkerNumber(1), 9300, None)
+        worker.wait()
+
+        self.assertEqual(
+            0,
+            gc.get_freeze_count(),
+            "Should only have frozen the master's objects while forking",
+        )
+
+    def test_killed_worker(self) -> None:
+        self.Worker.return_value.run.side_effect = lambda: time.sleep(10)
+
+        worker = fork_worker(QUEUE, WorkerNumber(1), 9300, None)
+        self.assertIsNone(worker.poll(), "Should still be running")
+
+        worker.send_signal(signal.SIGKILL)
+
+        self.assertEqual(-signal.SIGKILL, worker.wait())
+
+
+@override_settings(
+    LIGHTWEIGHT_QUEUE_QUEUE_GROUPS={GROUP: {QUEUE: 1, OTHER_QUEUE: 1}},
+)
+class RecoverWorkerJobsTests(SimpleTestCase):
+    longMessage = True
+
+    def setUp(self) -> None:
+        super().setUp()
+
+        self.backend = mock.Mock(spec=BackendWithWorkerRecovery)
+
+        get_backend_patch = mock.patch(
+            'django_lightweight_queue.runner.get_backend',
+            return_value=self.backend,
+        )
+        get_backend_patch.start()
+        self.addCleanup(get_backend_patch.stop)
+
+        self.logger = mock.Mock()
+
+    def test_recovers_jobs_of_each_queue_in_group(self) -> None:
+        recover_worker_jobs(GROUP, WorkerNumber(3), self.logger)
+
+        self.assertEqual(
+            [mock.call(QUEUE, 3), mock.call(OTHER_QUEUE, 3)],
+            self.backend.recover_worker_jobs.call_args_list,
+        )
+
+    def test_failure_is_logged(self) -> None:
+        self.backend.recover_worker_jobs.side_effect = ConnectionError
+
+        recover_worker_jobs(QUEUE, WorkerNumber(3), self.logger)
+
+        self.logger.exception.assert_called_once()
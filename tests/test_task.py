@@ -10,7 +10,11 @@ from django.test import SimpleTestCase, override_settings
 from django_lightweight_queue import task
 from django_lightweight_queue.types import QueueName, WorkerNumber
 from django_lightweight_queue.utils import get_path, get_backend
+from django_lightweight_queue.backends.base import BaseBackend
 from django_lightweight_queue.backends.redis import RedisBackend
+from django_lightweight_queue.backends.redis_utils import (
+    get_shared_redis_client,
+)
 
 from . import settings
 
@@ -41,6 +45,7 @@ class TaskTests(SimpleTestCase):
         super().setUp()
 
         get_backend.cache_clear()
+        get_shared_redis_client.cache_clear()
 
         with mock.patch('redis.StrictRedis', fakeredis.FakeStrictRedis):
             self.backend = RedisBackend()
@@ -62,6 +67,10 @@ class TaskTests(SimpleTestCase):
         get_path_patch.start()
         self.addCleanup(get_path_patch.stop)
 
+        async_redis_patch = mock.patch('redis.asyncio.StrictRedis', fakeredis.FakeAsyncRedis)
+        async_redis_patch.start()
+        self.addCleanup(async_redis_patch.stop)
+
     def tearDown(self) -> None:
         super().tearDown()
         get_backend.cache_clear()
@@ -112,6 +121,57 @@ class TaskTests(SimpleTestCase):
             job.as_dict(),
         )
 
+    @override_settings(LIGHTWEIGHT_QUEUE_PRIORITIES={QUEUE: 2})
+    def test_enqueues_job_priority_override(self) -> None:
+        dummy_task(1)
+        dummy_task(2, django_lightweight_queue_priority=1)
+
+        job = self.backend.dequeue(QUEUE, WorkerNumber(0), 1)
+        # Plain assert to placate mypy
+        assert job is not None, "Failed to get a job after enqueuing one"
+
+        self.assertEqual([2], job.args, "Should have taken the higher priority job first")
+        self.assertEqual(1, job.as_dict()['priority'])
+
+        job = self.backend.dequeue(QUEUE, WorkerNumber(0), 1)
+        # Plain assert to placate mypy
+        assert job is not None, "Failed to get a job after enqueuing one"
+
+        self.assertEqual([1], job.args)
+        self.assertEqual(0, job.priority)
+
+    def test_enqueues_unique_job(self) -> None:
+        dummy_task(42, django_lightweight_queue_unique=True)
+        dummy_task(42, django_lightweight_queue_unique=True)
+
+        job = self.backend.dequeue(QUEUE, WorkerNumber(0), 1)
+        # Plain assert to placate mypy
+        assert job is not None, "Failed to get a job after enqueuing one"
+
+        self.assertTrue(job.as_dict()['unique'])
+        self.assertIsNone(
+            self.backend.dequeue(QUEUE, WorkerNumber(0), 1),
+            "Should not run the duplicate job",
+        )
+
+    async def test_aenqueue(self) -> None:
+        await dummy_task.aenqueue(42, django_lightweight_queue_priority=1)
+
+        job = self.backend.dequeue(QUEUE, WorkerNumber(0), 1)
+        # Plain assert to placate mypy
+        assert job is not None, "Failed to get a job after enqueuing one"
+        self.assertEqual([42], job.args)
+        self.assertEqual(1, job.priority)
+
+    async def test_aenqueue_without_async_support(self) -> None:
+        with mock.patch.object(RedisBackend, 'aenqueue', BaseBackend.aenqueue):
+            await dummy_task.aenqueue(42)
+
+        job = self.backend.dequeue(QUEUE, WorkerNumber(0), 1)
+        # Plain assert to placate mypy
+        assert job is not None, "Failed to get a job after enqueuing one"
+        self.assertEqual([42], job.args)
+
     def test_bulk_enqueues_jobs(self) -> None:
         self.assertEqual(0, self.backend.length(QUEUE))
 
@@ -0,0 +1,753 @@
+import signal
+import asyncio
+import logging
+import datetime
+import threading
+from typing import Any, List
+from unittest import mock
+from concurrent.futures import ThreadPoolExecutor
+
+import redis
+import fakeredis
+from prometheus_client import CollectorRegistry
+
+from django.test import SimpleTestCase, override_settings
+
+from django_lightweight_queue import task
+from django_lightweight_queue.job import Job
+from django_lightweight_queue.types import QueueName, WorkerNumber
+from django_lightweight_queue.utils import (
+    get_path,
+    get_backend,
+    get_queue_counts,
+    get_worker_numbers,
+)
+from django_lightweight_queue.worker import (
+    Worker,
+    close_connections,
+    RECYCLE_EXIT_CODES,
+    WeightedRoundRobin,
+    QueueDepthCollector,
+)
+from django_lightweight_queue.backends.redis_utils import (
+    get_shared_redis_client,
+)
+from django_lightweight_queue.backends.reliable_redis import (
+    ReliableRedisBackend,
+)
+
+from . import settings
+from .mixins import RedisCleanupMixin
+
+QUEUE = QueueName('threaded-queue')
+
+# Both jobs must be running at the same time to get past the barrier.
+barrier = threading.Barrier(2, timeout=5)
+release = threading.Event()
+
+
+@task(str(QUEUE), atomic=False)
+def wait_for_other_job() -> None:
+    barrier.wait()
+
+
+@task(str(QUEUE), atomic=False)
+def wait_for_release() -> None:
+    release.wait(timeout=5)
+
+
+@task(str(QUEUE), atomic=False)
+def do_nothing(value: int) -> None:
+    pass
+
+
+@override_settings(
+    LIGHTWEIGHT_QUEUE_BACKEND='test-backend',
+    LIGHTWEIGHT_QUEUE_THREADS={QUEUE: 2},
+)
+class ThreadedWorkerTests(RedisCleanupMixin, SimpleTestCase):
+    longMessage = True
+    prefix = settings.LIGHTWEIGHT_QUEUE_REDIS_PREFIX
+
+    def setUp(self) -> None:
+        get_backend.cache_clear()
+        get_shared_redis_client.cache_clear()
+
+        with mock.patch('redis.StrictRedis', fakeredis.FakeStrictRedis):
+            self.backend = ReliableRedisBackend()
+        self.client = self.backend.client
+
+        # See TaskTests for why get_path is mocked rather than get_backend.
+        def mocked_get_path(path: str) -> Any:
+            if path == 'test-backend':
+                return lambda: self.backend
+            return get_path(path)
+
+        get_path_patch = mock.patch(
+            'django_lightweight_queue.utils.get_path',
+            side_effect=mocked_get_path,
+        )
+        get_path_patch.start()
+        self.addCleanup(get_path_patch.stop)
+
+        # The worker configures signal handling as it runs jobs.
+        for signum in (signal.SIGUSR2, signal.SIGALRM):
+            self.addCleanup(signal.signal, signum, signal.getsignal(signum))
+
+        super().setUp()
+
+        barrier.reset()
+        release.clear()
+
+        self.worker = Worker(QUEUE, None, WorkerNumber(1), '')  # type: ignore[arg-type]
+        self.executor = ThreadPoolExecutor(max_workers=self.worker.threads)
+        self.addCleanup(self.executor.shutdown)
+        # Before the executor is shut down, so that jobs left waiting finish.
+        self.addCleanup(release.set)
+
+    def tearDown(self) -> None:
+        super().tearDown()
+        get_backend.cache_clear()
+
+    def assertProcessingQueueEmpty(self) -> None:
+        self.assertEqual(
+            0,
+            self.client.llen(self.backend._processing_key(QUEUE, WorkerNumber(1))),
+            "Should have removed the jobs from the processing queue",
+        )
+
+    def test_runs_jobs_concurrently(self) -> None:
+        jobs = [
+            Job('tests.test_worker.wait_for_other_job', (), {}),
+            Job('tests.test_worker.wait_for_other_job', (), {}),
+        ]
+        self.backend.bulk_enqueue(jobs, QUEUE)
+
+        self.worker.start_jobs(self.backend, self.executor)
+        self.assertEqual(2, len(self.worker.running_jobs))
+
+        while self.worker.running_jobs:
+            self.worker.finish_jobs(self.backend, timeout=5)
+
+        self.assertFalse(barrier.broken, "Jobs should have run at the same time")
+        self.assertEqual(2, self.worker.job_count)
+        self.assertProcessingQueueEmpty()
+
+    def test_refills_free_threads(self) -> None:
+        slow = Job('tests.test_worker.wait_for_release', (), {})
+        fast = [Job('tests.test_worker.do_nothing', (x,), {}) for x in range(2)]
+        self.backend.bulk_enqueue([slow, *fast], QUEUE)
+
+        with mock.patch.object(
+            self.backend,
+            'bulk_processed_jobs',
+            wraps=self.backend.bulk_processed_jobs,
+        ) as bulk_processed_jobs:
+            self.worker.start_jobs(self.backend, self.executor)
+            self.assertTrue(self.worker.finish_jobs(self.backend, timeout=5))
+
+            self.worker.start_jobs(self.backend, self.executor)
+            self.assertEqual(
+                [slow.to_json(), fast[1].to_json()],
+                [job.to_json() for job, _, _ in self.worker.running_jobs.values()],
+                "Should have started the next job without dequeuing the slow one again",
+            )
+
+            self.assertTrue(self.worker.finish_jobs(self.backend, timeout=5))
+            release.set()
+            self.assertTrue(self.worker.finish_jobs(self.backend, timeout=5))
+
+        self.assertEqual(
+            [[fast[0].to_json()], [fast[1].to_json()], [slow.to_json()]],
+            [
+                [job.to_json() for job in jobs]
+                for (_, _, jobs), _ in bulk_processed_jobs.call_args_list
+            ],
+            "Should have reported each job as processed as soon as it finished",
+        )
+        self.assertProcessingQueueEmpty()
+
+    def test_starts_recovered_jobs_as_threads_become_free(self) -> None:
+        jobs = [Job('tests.test_worker.do_nothing', (x,), {}, timeout=60) for x in range(3)]
+        self.backend.bulk_enqueue(jobs, QUEUE)
+        # As though a previous worker had dequeued them and then crashed.
+        self.backend.bulk_dequeue(QUEUE, WorkerNumber(1), timeout=1, count=3)
+
+        self.worker.start_jobs(self.backend, self.executor)
+
+        self.assertEqual(2, len(self.worker.running_jobs), "Should only start a job per thread")
+        self.assertEqual(
+            [jobs[2].to_json()],
+            [job.to_json() for job in self.worker.job_buffer],
+        )
+
+        self.assertTrue(self.worker.finish_jobs(self.backend, timeout=5))
+        self.worker.start_jobs(self.backend, self.executor)
+        self.assertIn(
+            jobs[2].to_json(),
+            [job.to_json() for job, _, _ in self.worker.running_jobs.values()],
+            "Should have started the held back job",
+        )
+        self.assertFalse(self.worker.job_buffer)
+
+        while self.worker.running_jobs:
+            self.worker.finish_jobs(self.backend, timeout=5)
+
+        self.assertEqual(3, self.worker.job_count)
+        self.assertProcessingQueueEmpty()
+
+    @override_settings(LIGHTWEIGHT_QUEUE_PREFETCH_COUNTS={QUEUE: 3})
+    def test_reports_prefetched_jobs_as_processed_individually(self) -> None:
+        worker = Worker(QUEUE, None, WorkerNumber(1), '')  # type: ignore[arg-type]
+        self.backend.bulk_enqueue(
+            [Job('tests.test_worker.do_nothing', (x,), {}) for x in range(3)],
+            QUEUE,
+        )
+
+        self.assertTrue(worker.process(self.backend))
+
+        self.assertEqual(2, len(worker.job_buffer))
+        self.assertEqual(
+            2,
+            self.client.llen(self.backend._processing_key(QUEUE, WorkerNumber(1))),
+            "Should have reported the first job as processed as soon as it ran",
+        )
+
+        while worker.job_buffer:
+            worker.process(self.backend)
+
+        self.assertProcessingQueueEmpty()
+
+    def test_job_timeout(self) -> None:
+        timed_out = Job('tests.test_worker.wait_for_release', (), {}, timeout=0)
+        other = Job('tests.test_worker.do_nothing', (1,), {})
+        self.backend.bulk_enqueue([timed_out, other], QUEUE)
+        self.backend.enqueue(Job('tests.test_worker.do_nothing', (2,), {}), QUEUE)
+
+        with mock.patch.object(self.worker, 'log') as log:
+            self.worker.run_in_threads(self.backend, self.executor)
+
+        self.assertEqual(
+            ["Job {} has timed out".format(Job.from_json(timed_out.to_json()))],
+            [message for (level, message), _ in log.call_args_list if level == logging.ERROR],
+        )
+        self.assertEqual('timeout', self.worker.recycle_reason)
+        self.assertEqual(2, self.worker.job_count, "Should not start any more jobs")
+        self.assertEqual(1, self.backend.length(QUEUE))
+        self.assertProcessingQueueEmpty()
+
+
+ASYNC_QUEUE = QueueName('async-queue')
+
+running_async_jobs = 0
+async_results = []
+async_release = False
+
+
+@task(str(ASYNC_QUEUE))
+async def wait_for_other_async_job() -> None:
+    global running_async_jobs
+    running_async_jobs += 1
+
+    for _ in range(100):
+        if running_async_jobs == 2:
+            return
+        await asyncio.sleep(0.01)
+
+    raise AssertionError("Jobs should have run at the same time")
+
+
+@task(str(ASYNC_QUEUE))
+async def sleep_for_a_minute() -> None:
+    await asyncio.sleep(60)
+
+
+@task(str(ASYNC_QUEUE), atomic=False)
+def wait_for_release_synchronously() -> None:
+    release.wait(timeout=5)
+
+
+class ThreadRecordingMiddleware:
+    def __init__(self) -> None:
+        # The threads in which the middleware's hooks were called.
+        self.threads = []  # type: List[int]
+
+    def process_job(self, job: Job, queue: QueueName, worker_num: WorkerNumber) -> None:
+        self.threads.append(threading.get_ident())
+
+
+@task(str(ASYNC_QUEUE))
+async def record_result(value: int) -> None:
+    async_results.append(value)
+
+
+@task(str(ASYNC_QUEUE))
+async def wait_for_async_release() -> None:
+    for _ in range(500):
+        if async_release:
+            return
+        await asyncio.sleep(0.01)
+
+
+@override_settings(
+    LIGHTWEIGHT_QUEUE_BACKEND='test-backend',
+    LIGHTWEIGHT_QUEUE_ASYNC_CONCURRENCY={ASYNC_QUEUE: 2},
+)
+class AsyncWorkerTests(RedisCleanupMixin, SimpleTestCase):
+    longMessage = True
+    prefix = settings.LIGHTWEIGHT_QUEUE_REDIS_PREFIX
+
+    def setUp(self) -> None:
+        global running_async_jobs, async_release
+        running_async_jobs = 0
+        async_results.clear()
+        async_release = False
+        release.clear()
+        self.addCleanup(release.set)
+
+        get_backend.cache_clear()
+        get_shared_redis_client.cache_clear()
+
+        # Clients for asyncio are created as the worker runs.
+        for path, fake in (
+            ('redis.StrictRedis', fakeredis.FakeStrictRedis),
+            ('redis.asyncio.StrictRedis', fakeredis.FakeAsyncRedis),
+        ):
+            redis_patch = mock.patch(path, fake)
+            redis_patch.start()
+            self.addCleanup(redis_patch.stop)
+
+        self.backend = ReliableRedisBackend()
+        self.client = self.backend.client
+
+        # See TaskTests for why get_path is mocked rather than get_backend.
+        def mocked_get_path(path: str) -> Any:
+            if path == 'test-backend':
+                return lambda: self.backend
+            return get_path(path)
+
+        get_path_patch = mock.patch(
+            'django_lightweight_queue.utils.get_path',
+            side_effect=mocked_get_path,
+        )
+        get_path_patch.start()
+        self.addCleanup(get_path_patch.stop)
+
+        # The worker configures signal handling as it runs jobs.
+        for signum in (signal.SIGUSR2, signal.SIGALRM):
+            self.addCleanup(signal.signal, signum, signal.getsignal(signum))
+
+        super().setUp()
+
+        self.worker = Worker(ASYNC_QUEUE, None, WorkerNumber(1), '')  # type: ignore[arg-type]
+
+    def tearDown(self) -> None:
+        super().tearDown()
+        get_backend.cache_clear()
+
+    def assertProcessingQueueEmpty(self) -> None:
+        self.assertEqual(
+            0,
+            self.client.llen(self.backend._processing_key(ASYNC_QUEUE, WorkerNumber(1))),
+            "Should have removed the jobs from the processing queue",
+        )
+
+    async def run_jobs(self) -> None:
+        await self.worker.astart_jobs(self.backend, 2)
+        while self.worker.running_tasks:
+            await self.worker.afinish_jobs(self.backend, timeout=5)
+
+    def test_runs_jobs_concurrently(self) -> None:
+        self.backend.bulk_enqueue(
+            [
+                Job('tests.test_worker.wait_for_other_async_job', (), {}),
+                Job('tests.test_worker.wait_for_other_async_job', (), {}),
+            ],
+            ASYNC_QUEUE,
+        )
+
+        with mock.patch.object(self.worker, 'touch') as touch:
+            asyncio.run(self.run_jobs())
+
+        self.assertEqual(2, touch.call_count, "Both jobs should have succeeded")
+        self.assertEqual(2, self.worker.job_count)
+        self.assertProcessingQueueEmpty()
+
+    def test_refills_free_tasks(self) -> None:
+        slow = Job('tests.test_worker.wait_for_async_release', (), {})
+        fast = [Job('tests.test_worker.record_result', (x,), {}) for x in range(2)]
+        self.backend.bulk_enqueue([slow, *fast], ASYNC_QUEUE)
+
+        async def run() -> None:
+            global async_release
+
+            await self.worker.astart_jobs(self.backend, 2)
+            self.assertTrue(await self.worker.afinish_jobs(self.backend, timeout=5))
+
+            await self.worker.astart_jobs(self.backend, 2)
+            self.assertEqual(
+                [slow.to_json(), fast[1].to_json()],
+                [job.to_json() for job, _ in self.worker.running_tasks.values()],
+                "Should have started the next job without dequeuing the slow one again",
+            )
+
+            self.assertTrue(await self.worker.afinish_jobs(self.backend, timeout=5))
+            async_release = True
+            self.assertTrue(await self.worker.afinish_jobs(self.backend, timeout=5))
+
+        with mock.patch.object(
+            self.backend,
+            'abulk_processed_jobs',
+            wraps=self.backend.abulk_processed_jobs,
+        ) as abulk_processed_jobs:
+            asyncio.run(run())
+
+        self.assertEqual(
+            [[fast[0].to_json()], [fast[1].to_json()], [slow.to_json()]],
+            [
+                [job.to_json() for job in jobs]
+                for (_, _, jobs), _ in abulk_processed_jobs.call_args_list
+            ],
+            "Should have reported each job as processed as soon as it finished",
+        )
+        self.assertProcessingQueueEmpty()
+
+    def test_job_timeout_cancels_job(self) -> None:
+        self.backend.enqueue(
+            Job('tests.test_worker.sleep_for_a_minute', (), {}, timeout=0),
+            ASYNC_QUEUE,
+        )
+
+        with self.assertLogs('dlq.worker', logging.ERROR):
+            asyncio.run(self.run_jobs())
+
+        self.assertEqual(1, self.worker.job_count)
+        self.assertIsNone(
+            self.worker.recycle_reason,
+            "Async tasks are cancelled, so shouldn't need the worker recycled",
+        )
+        self.assertProcessingQueueEmpty()
+
+    def test_synchronous_job_timeout_recycles_worker(self) -> None:
+        self.backend.bulk_enqueue(
+            [
+                Job('tests.test_worker.wait_for_release_synchronously', (), {}, timeout=0),
+                Job('tests.test_worker.record_result', (1,), {}),
+            ],
+            ASYNC_QUEUE,
+        )
+        self.backend.enqueue(Job('tests.test_worker.record_result', (2,), {}), ASYNC_QUEUE)
+
+        with self.assertLogs('dlq.worker', logging.ERROR):
+            asyncio.run(self.worker.arun(self.backend))
+
+        self.assertEqual('timeout', self.worker.recycle_reason)
+        self.assertEqual([1], async_results, "Should not start any more jobs")
+        self.assertEqual(1, self.backend.length(ASYNC_QUEUE))
+        self.assertProcessingQueueEmpty()
+
+    def test_synchronous_middleware_runs_outside_event_loop(self) -> None:
+        middleware = ThreadRecordingMiddleware()
+        self.backend.enqueue(Job('tests.test_worker.record_result', (1,), {}), ASYNC_QUEUE)
+
+        with mock.patch(
+            'django_lightweight_queue.job.get_middleware',
+            return_value=[middleware],
+        ):
+            asyncio.run(self.run_jobs())
+
+        self.assertEqual([1], async_results)
+        self.assertEqual(1, len(middleware.threads))
+        self.assertNotEqual(
+            threading.get_ident(),
+            middleware.threads[0],
+            "Should not have run the hook in the event loop's thread",
+        )
+
+    def test_stopped_worker_exits(self) -> None:
+        self.worker.running = False
+
+        with self.assertLogs('dlq.worker', logging.DEBUG) as cm:
+            self.worker.run()
+
+        self.assertEqual(
+            1,
+            sum('Exiting' in x for x in cm.output),
+            "Should only have exited once",
+        )
+
+    def test_run_async_task_synchronously(self) -> None:
+        job = Job('tests.test_worker.record_result', (42,), {})
+
+        self.assertTrue(job.run(queue=ASYNC_QUEUE, worker_num=WorkerNumber(1)))
+        self.assertEqual([42], async_results)
+
+
+@override_settings(
+    LIGHTWEIGHT_QUEUE_MAX_JOBS_PER_WORKER={QUEUE: 2},
+    LIGHTWEIGHT_QUEUE_MAX_WORKER_IDLE_TIME={QUEUE: 60},
+)
+class RecyclingTests(SimpleTestCase):
+    longMessage = True
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.worker = Worker(QUEUE, None, WorkerNumber(1), '')  # type: ignore[arg-type]
+
+    def test_job_limit(self) -> None:
+        now = datetime.datetime.utcnow()
+
+        self.worker.job_count = 1
+        self.assertFalse(self.worker.should_exit(now))
+
+        self.worker.job_count = 2
+        self.assertTrue(self.worker.should_exit(now))
+        self.assertEqual('jobs', self.worker.recycle_reason)
+
+    def test_idle_time_limit(self) -> None:
+        self.assertTrue(self.worker.should_exit(
+            datetime.datetime.utcnow() - datetime.timedelta(seconds=61),
+        ))
+        self.assertEqual('idle', self.worker.recycle_reason)
+
+    def test_memory_limit(self) -> None:
+        now = datetime.datetime.utcnow()
+
+        with override_settings(LIGHTWEIGHT_QUEUE_MAX_WORKER_RSS={QUEUE: 1}):
+            worker = Worker(QUEUE, None, WorkerNumber(1), '')  # type: ignore[arg-type]
+
+        with mock.patch(
+            'django_lightweight_queue.worker.current_rss',
+            return_value=None,
+        ):
+            self.assertFalse(worker.should_exit(now), "Should skip unknown sizes")
+
+        self.assertTrue(worker.should_exit(now))
+        self.assertEqual('memory', worker.recycle_reason)
+
+    def test_exit_code(self) -> None:
+        self.worker.recycle_reason = 'memory'
+
+        with self.assertRaises(SystemExit) as cm:
+            self.worker.finish()
+
+        self.assertEqual(RECYCLE_EXIT_CODES['memory'], cm.exception.code)
+
+    def test_timeout_exit_code(self) -> None:
+        self.worker.recycle_reason = 'timeout'
+
+        # `os._exit` doesn't return.
+        with mock.patch('logging.shutdown'), mock.patch(
+            'os._exit',
+            side_effect=SystemExit,
+        ) as os_exit, self.assertRaises(SystemExit):
+            self.worker.finish()
+
+        os_exit.assert_called_once_with(RECYCLE_EXIT_CODES['timeout'])
+
+    def test_stopped_worker_is_not_recycled(self) -> None:
+        self.worker.running = False
+
+        self.assertTrue(self.worker.should_exit(datetime.datetime.utcnow()))
+        self.worker.finish()
+
+
+@override_settings(LIGHTWEIGHT_QUEUE_REUSE_DB_CONNECTIONS=True)
+class ConnectionReuseTests(SimpleTestCase):
+    def test_closes_only_old_connections(self) -> None:
+        unopened = mock.Mock(connection=None)
+        opened = mock.Mock()
+
+        with mock.patch('django_lightweight_queue.worker.connections') as connections:
+            connections.all.return_value = [unopened, opened]
+            close_connections()
+
+        unopened.close_if_unusable_or_obsolete.assert_not_called()
+        opened.close_if_unusable_or_obsolete.assert_called_once_with()
+        opened.close.assert_not_called()
+
+
+GROUP = QueueName('queue-group')
+BUSY_QUEUE = QueueName('busy-queue')
+QUIET_QUEUE = QueueName('quiet-queue')
+
+group_results = []
+
+
+@task(str(BUSY_QUEUE), atomic=False)
+def record_busy_result(value: int) -> None:
+    group_results.append((BUSY_QUEUE, value))
+
+
+@task(str(QUIET_QUEUE), atomic=False)
+def record_quiet_result(value: int) -> None:
+    group_results.append((QUIET_QUEUE, value))
+
+
+class WeightedRoundRobinTests(SimpleTestCase):
+    def test_serves_in_proportion_to_weights(self) -> None:
+        round_robin = WeightedRoundRobin({BUSY_QUEUE: 3, QUIET_QUEUE: 1})
+
+        served = []
+        for _ in range(8):
+            queue = round_robin.order()[0]
+            round_robin.served(queue)
+            served.append(queue)
+
+        self.assertEqual(6, served.count(BUSY_QUEUE))
+        self.assertEqual(2, served.count(QUIET_QUEUE))
+        self.assertNotEqual(
+            [BUSY_QUEUE] * 3,
+            served[1:4],
+            "Should interleave the queues",
+        )
+
+    def test_queue_without_jobs_doesnt_build_up_a_burst(self) -> None:
+        round_robin = WeightedRoundRobin({BUSY_QUEUE: 1, QUIET_QUEUE: 1})
+
+        # Only the busy queue has jobs for a while.
+        for _ in range(10):
+            round_robin.order()
+            round_robin.served(BUSY_QUEUE)
+
+        served = []
+        for _ in range(4):
+            queue = round_robin.order()[0]
+            round_robin.served(queue)
+            served.append(queue)
+
+        self.assertEqual([QUIET_QUEUE, BUSY_QUEUE] * 2, served)
+
+    def test_rejects_non_positive_weights(self) -> None:
+        with self.assertRaises(ValueError):
+            WeightedRoundRobin({BUSY_QUEUE: 0})
+
+
+@override_settings(
+    LIGHTWEIGHT_QUEUE_BACKEND='test-backend',
+    LIGHTWEIGHT_QUEUE_QUEUE_GROUPS={GROUP: {BUSY_QUEUE: 3, QUIET_QUEUE: 1}},
+    LIGHTWEIGHT_QUEUE_WORKERS={GROUP: 2, BUSY_QUEUE: 1},
+)
+class QueueGroupTests(RedisCleanupMixin, SimpleTestCase):
+    longMessage = True
+    prefix = settings.LIGHTWEIGHT_QUEUE_REDIS_PREFIX
+
+    def setUp(self) -> None:
+        group_results.clear()
+
+        get_backend.cache_clear()
+        get_shared_redis_client.cache_clear()
+
+        with mock.patch('redis.StrictRedis', fakeredis.FakeStrictRedis):
+            self.backend = ReliableRedisBackend()
+        self.client = self.backend.client
+
+        # See TaskTests for why get_path is mocked rather than get_backend.
+        def mocked_get_path(path: str) -> Any:
+            if path == 'test-backend':
+                return lambda: self.backend
+            return get_path(path)
+
+        get_path_patch = mock.patch(
+            'django_lightweight_queue.utils.get_path',
+            side_effect=mocked_get_path,
+        )
+        get_path_patch.start()
+        self.addCleanup(get_path_patch.stop)
+
+        # The worker configures signal handling as it runs jobs.
+        for signum in (signal.SIGUSR2, signal.SIGALRM):
+            self.addCleanup(signal.signal, signum, signal.getsignal(signum))
+
+        super().setUp()
+
+        self.worker = Worker(GROUP, None, WorkerNumber(1), '')  # type: ignore[arg-type]
+
+    def tearDown(self) -> None:
+        super().tearDown()
+        get_backend.cache_clear()
+
+    def test_worker_counts(self) -> None:
+        with mock.patch('django_lightweight_queue.utils._accepting_implied_queues', new=False):
+            counts = get_queue_counts()
+            worker_numbers = get_worker_numbers(QUIET_QUEUE)
+
+        self.assertEqual(2, counts[GROUP])
+        self.assertNotIn(BUSY_QUEUE, counts, "Queues in groups shouldn't have their own workers")
+        self.assertEqual([1, 2], list(worker_numbers))
+
+    def test_serves_all_queues_by_weight(self) -> None:
+        self.backend.bulk_enqueue(
+            [Job('tests.test_worker.record_busy_result', (x,), {}) for x in range(6)],
+            BUSY_QUEUE,
+        )
+        self.backend.bulk_enqueue(
+            [Job('tests.test_worker.record_quiet_result', (x,), {}) for x in range(2)],
+            QUIET_QUEUE,
+        )
+
+        for _ in range(8):
+            self.assertTrue(self.worker.process(self.backend))
+
+        self.assertEqual(
+            [BUSY_QUEUE, BUSY_QUEUE, QUIET_QUEUE, BUSY_QUEUE],
+            [queue for queue, _ in group_results[:4]],
+            "Should interleave the queues by weight",
+        )
+        self.assertEqual(
+            [0, 1, 2, 3, 4, 5],
+            [value for queue, value in group_results if queue == BUSY_QUEUE],
+        )
+        self.assertEqual(8, self.worker.job_count)
+
+        for queue in (BUSY_QUEUE, QUIET_QUEUE):
+            self.assertEqual(
+                0,
+                self.client.llen(self.backend._processing_key(queue, WorkerNumber(1))),
+                "Should have removed the jobs from the processing queues",
+            )
+
+    @override_settings(LIGHTWEIGHT_QUEUE_PRIORITIES={BUSY_QUEUE: 2})
+    def test_queue_depth(self) -> None:
+        self.backend.bulk_enqueue(
+            [
+                Job('tests.test_worker.record_busy_result', (1,), {}),
+                Job('tests.test_worker.record_busy_result', (2,), {}, priority=1),
+                Job('tests.test_worker.record_busy_result', (3,), {}, priority=1),
+            ],
+            BUSY_QUEUE,
+        )
+
+        registry = CollectorRegistry()
+        registry.register(QueueDepthCollector(self.backend, self.worker.queues))
+
+        with mock.patch.object(
+            redis.client.Pipeline,
+            'execute',
+            autospec=True,
+            side_effect=redis.client.Pipeline.execute,
+        ) as execute:
+            metrics = {
+                (sample.labels['queue'], sample.labels['priority']): sample.value
+                for metric in registry.collect()
+                for sample in metric.samples
+            }
+
+        self.assertEqual(
+            {
+                (BUSY_QUEUE, '0'): 1,
+                (BUSY_QUEUE, '1'): 2,
+                (QUIET_QUEUE, '0'): 0,
+            },
+            metrics,
+        )
+        self.assertEqual(
+            2,
+            execute.call_count,
+            "Should have fetched the lengths of each queue in a single round trip",
+        )
+
+    def test_rejects_concurrency(self) -> None:
+        with override_settings(LIGHTWEIGHT_QUEUE_THREADS={GROUP: 2}):
+            with self.assertRaises(ValueError):
+                Worker(GROUP, None, WorkerNumber(1), '')  # type: ignore[arg-type]